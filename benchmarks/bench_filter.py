@@ -0,0 +1,191 @@
+"""Benchmarks for the number of queries issued by Filter.retrieve and
+Filter.group.
+
+These benchmarks need a local MySQL database, such as the pdm_test_db
+created by the integration tests. Run them from the repository root::
+
+    > python3 benchmarks/bench_filter.py pdm_test_db -u pdm_anon -p pdm_anon
+
+For each method, the number of queries and the elapsed time are reported
+for the batched implementation and for a reference implementation that
+issues one query per value, and the results of both are compared.
+"""
+
+import argparse
+import time
+
+from sqlalchemy import event
+
+from pdm_utils.classes.alchemyhandler import AlchemyHandler
+from pdm_utils.classes.filter import Filter
+from pdm_utils.functions import basic
+from pdm_utils.functions import querying as q
+
+
+class QueryCounter:
+    """Counts the queries an Engine sends to the MySQL server."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self.increment)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, "before_cursor_execute", self.increment)
+
+    def increment(self, *args):
+        self.count += 1
+
+
+def reference_retrieve(db_filter, raw_columns):
+    """
+    Reproduces Filter.retrieve with one SELECT DISTINCT per value per column.
+    :param db_filter: connected Filter with values
+    :type db_filter: Filter
+    :param raw_columns: columns to retrieve
+    :type raw_columns: list
+    :return: distinct values for each Filter value
+    :rtype: dict
+    """
+    columns = db_filter.get_columns(raw_columns)
+    key = db_filter.key
+
+    values = {}
+    for value in db_filter.values:
+        compare_value = value
+        if key.type.python_type == bytes and value is not None:
+            compare_value = value.encode("utf-8")
+
+        values[value] = {}
+        for column in columns:
+            query = q.build_distinct(db_filter.graph, column,
+                                     where=[(key == compare_value)])
+            value_data = q.first_column(db_filter.engine, query)
+            if column.type.python_type == bytes:
+                value_data = basic.convert_to_decoded(value_data)
+            values[value][column.name] = value_data
+
+    return values
+
+
+def reference_group(db_filter, raw_column):
+    """
+    Reproduces Filter.group with one query per group.
+    :param db_filter: connected Filter with values
+    :type db_filter: Filter
+    :param raw_column: column to group by
+    :return: Filter values for each group
+    :rtype: dict
+    """
+    column = db_filter.get_column(raw_column)
+    groups = db_filter.transpose(column)
+
+    group_results = {}
+    for group in groups:
+        if column.type.python_type == bytes:
+            group_clauses = [(column == group.encode("utf_8"))]
+        else:
+            group_clauses = [(column == group)]
+        group_results[group] = db_filter.build_values(where=group_clauses)
+
+    return group_results
+
+
+def normalize(results):
+    """
+    Converts nested result lists to sets, so results can be compared
+    regardless of row order.
+    """
+    if isinstance(results, dict):
+        return {key: normalize(value) for key, value in results.items()}
+    return set(results)
+
+
+def compare(name, batched, reference, db_filter):
+    """
+    Times and counts the queries of a batched and a reference call, and
+    checks that they return the same results.
+    :param name: label for the printed report
+    :param batched: function of no arguments using the batched method
+    :param reference: function of no arguments using the reference method
+    :param db_filter: Filter whose engine is monitored
+    :return: whether the results of both calls are the same
+    :rtype: bool
+    """
+    with QueryCounter(db_filter.engine) as counter:
+        start = time.perf_counter()
+        batched_results = batched()
+        batched_time = time.perf_counter() - start
+    batched_count = counter.count
+
+    with QueryCounter(db_filter.engine) as counter:
+        start = time.perf_counter()
+        reference_results = reference()
+        reference_time = time.perf_counter() - start
+    reference_count = counter.count
+
+    same = normalize(batched_results) == normalize(reference_results)
+    print(f"{name:<30}  {batched_count:>8}  {reference_count:>10}  "
+          f"{batched_time:>8.3f}  {reference_time:>10.3f}  {str(same):>5}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database", type=str,
+                        help="name of the local MySQL database")
+    parser.add_argument("-u", "--username", type=str, default=None,
+                        help="MySQL username")
+    parser.add_argument("-p", "--password", type=str, default=None,
+                        help="MySQL password")
+    args = parser.parse_args()
+
+    alchemist = AlchemyHandler(database=args.database,
+                               username=args.username,
+                               password=args.password)
+    alchemist.connect()
+
+    pham_filter = Filter(alchemist=alchemist)
+    pham_filter.key = "gene.PhamID"
+    pham_filter.values = pham_filter.build_values()
+
+    gene_filter = Filter(alchemist=alchemist)
+    gene_filter.key = "gene.GeneID"
+    gene_filter.values = gene_filter.build_values()
+
+    phage_filter = Filter(alchemist=alchemist)
+    phage_filter.key = "phage.PhageID"
+    phage_filter.values = phage_filter.build_values()
+
+    print(f"{len(pham_filter.values)} phams, {len(gene_filter.values)} "
+          f"genes, {len(phage_filter.values)} phages")
+    print(f"{'method':<30}  {'queries':>8}  {'ref queries':>10}  "
+          f"{'seconds':>8}  {'ref seconds':>10}  {'same':>5}")
+
+    columns = ["gene.Notes", "gene.PhageID"]
+    compare("retrieve (phams)",
+            lambda: pham_filter.retrieve(columns),
+            lambda: reference_retrieve(pham_filter, columns),
+            pham_filter)
+    compare("retrieve (phages)",
+            lambda: phage_filter.retrieve(["phage.Cluster",
+                                           "phage.HostGenus"]),
+            lambda: reference_retrieve(phage_filter, ["phage.Cluster",
+                                                      "phage.HostGenus"]),
+            phage_filter)
+    compare("group (genes by pham)",
+            lambda: gene_filter.group("gene.PhamID"),
+            lambda: reference_group(gene_filter, "gene.PhamID"),
+            gene_filter)
+    compare("group (phages by cluster)",
+            lambda: phage_filter.group("phage.Cluster"),
+            lambda: reference_group(phage_filter, "phage.Cluster"),
+            phage_filter)
+
+
+if __name__ == "__main__":
+    main()
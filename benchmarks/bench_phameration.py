@@ -0,0 +1,521 @@
+"""Benchmarks for the pure-python parts of the phameration pipeline.
+
+These benchmarks build synthetic genes, translations and phams and do
+not need a MySQL database, MMseqs2 or BLAST. Run them from the
+repository root::
+
+    > python3 benchmarks/bench_phameration.py
+
+Each function is timed (best of --repeats) and its peak memory measured
+with tracemalloc at each scale, and its scaling exponent is fitted over
+the scales (1.0 is linear, 2.0 quadratic). The results are compared with
+the baseline stored in benchmarks/baselines/phameration.json, and the
+script exits with status 1 if a function's exponent or peak memory has
+grown past it. Absolute times depend on the machine, so they are not
+compared. After an intended change, store new baseline results with::
+
+    > python3 benchmarks/bench_phameration.py --save-baseline
+
+The blastp chunk scheduling benchmark estimates each chunk's run time
+from its total residues, since every chunk is searched against the same
+database, and simulates handing the chunks out to a pool of workers in
+order.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pdm_utils.functions import phameration
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "baselines", "phameration.json")
+
+
+def synthesize_phams(num_phams, seed=1, max_size=8, churn=0.05):
+    """
+    Builds a synthetic pair of old/new pham dictionaries resembling two
+    consecutive rounds of phameration.  A `churn` fraction of the new
+    phams are split, joined, or grown with previously unphamerated genes.
+    :param num_phams: number of old phams to generate
+    :type num_phams: int
+    :param seed: random seed, so runs are reproducible
+    :type seed: int
+    :param max_size: maximum number of genes in a synthetic pham
+    :type max_size: int
+    :param churn: fraction of phams that change between rounds
+    :type churn: float
+    :return: old_phams, new_phams, old_colors, new_genes
+    """
+    rng = random.Random(seed)
+
+    old_phams = dict()
+    old_colors = dict()
+    gene_count = 0
+    for pham_id in range(1, num_phams + 1):
+        size = rng.randint(1, max_size)
+        old_phams[pham_id] = {f"Phage{pham_id}_CDS_{i}" for i in range(size)}
+        gene_count += size
+        if size > 1:
+            old_colors[pham_id] = "#ABCDEF"
+        else:
+            old_colors[pham_id] = "#FFFFFF"
+
+    new_genes = set()
+    new_phams = dict()
+    pending = list()
+    new_id = 1
+    for pham_id, genes in old_phams.items():
+        roll = rng.random()
+        genes = set(genes)
+        if roll < churn / 3 and len(genes) > 1:
+            # Split
+            genes = sorted(genes)
+            new_phams[new_id] = set(genes[:len(genes) // 2])
+            new_phams[new_id + 1] = set(genes[len(genes) // 2:])
+            new_id += 2
+            continue
+        elif roll < 2 * churn / 3:
+            # Join with the next pham
+            pending.append(genes)
+            if len(pending) < 2:
+                continue
+            genes = pending.pop() | pending.pop()
+        elif roll < churn:
+            # Addition of new genes
+            gene_count += 1
+            new_gene = f"New_CDS_{gene_count}"
+            new_genes.add(new_gene)
+            genes.add(new_gene)
+        new_phams[new_id] = genes
+        new_id += 1
+
+    for genes in pending:
+        new_phams[new_id] = genes
+        new_id += 1
+
+    # Clustering output order has nothing to do with the old pham order
+    items = list(new_phams.items())
+    rng.shuffle(items)
+    new_phams = dict(items)
+
+    return old_phams, new_phams, old_colors, new_genes
+
+
+def time_call(func, *args):
+    """
+    Times a single call of func(*args).
+    :param func: the function to time
+    :param args: positional arguments for func
+    :return: elapsed seconds
+    :rtype: float
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def synthesize_genes(num_genes, seed=1, duplication=0.4):
+    """
+    Builds synthetic translation_groups and genes_and_translations
+    dictionaries, in which a duplication fraction of the genes share
+    their translation with an earlier gene.
+    :param num_genes: number of genes to generate
+    :type num_genes: int
+    :param seed: random seed, so runs are reproducible
+    :type seed: int
+    :param duplication: fraction of genes with a duplicated translation
+    :type duplication: float
+    :return: translation_groups, genes_and_translations
+    """
+    rng = random.Random(seed)
+
+    translation_groups = dict()
+    genes_and_translations = dict()
+    translations = list()
+    for i in range(num_genes):
+        geneid = f"Phage{i // 100}_CDS_{i % 100 + 1}"
+        if len(translations) > 0 and rng.random() < duplication:
+            translation = rng.choice(translations)
+        else:
+            length = int(rng.lognormvariate(math.log(150), 0.7))
+            length = min(max(length, 30), 4000)
+            translation = "M" * length + str(len(translations))
+            translations.append(translation)
+            translation_groups[translation] = list()
+
+        translation_groups[translation].append(geneid)
+        genes_and_translations[geneid] = translation
+
+    return translation_groups, genes_and_translations
+
+
+def synthesize_clusters(translation_groups, seed=1):
+    """
+    Builds synthetic pre-phams of non-redundant genes, and hmm phams that
+    join some of them, as the mmseqs workflow would.
+    :param translation_groups: translations and their geneids
+    :type translation_groups: dict
+    :param seed: random seed, so runs are reproducible
+    :type seed: int
+    :return: pre_phams, hmm_phams, consensus_lookup
+    """
+    rng = random.Random(seed)
+
+    representatives = [x[0] for x in translation_groups.values()]
+    rng.shuffle(representatives)
+
+    pre_phams = dict()
+    index = 0
+    while index < len(representatives):
+        size = min(int(rng.lognormvariate(0.5, 1.0)) + 1, 500)
+        pre_phams[len(pre_phams) + 1] = representatives[index:index + size]
+        index += size
+
+    consensus_lookup = dict()
+    for name, geneids in pre_phams.items():
+        for geneid in geneids:
+            consensus_lookup[geneid] = name
+
+    # Consensus sequences are named after their pre-pham representative
+    consensuses = [x[0] for x in pre_phams.values()]
+    hmm_phams = dict()
+    index = 0
+    while index < len(consensuses):
+        size = rng.choice([1, 1, 1, 2, 3])
+        hmm_phams[len(hmm_phams) + 1] = consensuses[index:index + size]
+        index += size
+
+    return pre_phams, hmm_phams, consensus_lookup
+
+
+class Dataset:
+    """Synthetic inputs for each benchmarked function at one scale."""
+
+    def __init__(self, num_genes, tmp_dir):
+        self.num_genes = num_genes
+
+        self.translation_groups, self.genes_and_translations = \
+            synthesize_genes(num_genes)
+        self.pre_phams, self.hmm_phams, self.consensus_lookup = \
+            synthesize_clusters(self.translation_groups)
+        self.merged_phams = phameration.merge_pre_and_hmm_phams(
+                    self.hmm_phams, self.pre_phams, self.consensus_lookup)
+
+        # Phams hold about 4.5 genes on average
+        self.pham_data = synthesize_phams(max(num_genes * 2 // 9, 1))
+
+        self.mmseqs_file = os.path.join(tmp_dir, f"clusters{num_genes}.tsv")
+        with open(self.mmseqs_file, "w") as fh:
+            for geneids in self.pre_phams.values():
+                for geneid in geneids:
+                    fh.write(f"{geneids[0]}\t{geneid}\n")
+
+        self.mcl_file = os.path.join(tmp_dir, f"mcl{num_genes}.txt")
+        with open(self.mcl_file, "w") as fh:
+            for geneids in self.merged_phams.values():
+                fh.write("\t".join(geneids) + "\n")
+
+
+# Each benchmark builds the arguments for one call from a Dataset. The
+# arguments are rebuilt for every call, since some functions change them.
+BENCHMARKS = [
+    ("parse_mmseqs_clusters", phameration.parse_mmseqs_clusters,
+     lambda data: (data.mmseqs_file,)),
+    ("parse_mcl_output", phameration.parse_mcl_output,
+     lambda data: (data.mcl_file,)),
+    ("merge_pre_and_hmm_phams", phameration.merge_pre_and_hmm_phams,
+     lambda data: (data.hmm_phams, data.pre_phams, data.consensus_lookup)),
+    ("reintroduce_duplicates", phameration.reintroduce_duplicates,
+     lambda data: (dict(data.merged_phams), data.translation_groups,
+                   data.genes_and_translations)),
+    ("preserve_phams", phameration.preserve_phams,
+     lambda data: data.pham_data),
+    ("chunk_translations", phameration.chunk_translations,
+     lambda data: (data.translation_groups, 500, 16)),
+]
+
+
+def measure_memory(func, *args):
+    """
+    Measures the peak memory allocated by a single call of func(*args).
+    :param func: the function to measure
+    :param args: positional arguments for func
+    :return: peak allocated bytes
+    :rtype: int
+    """
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def fit_exponent(timings):
+    """
+    Fits the empirical scaling exponent of a function (1.0 is linear,
+    2.0 quadratic) by least squares on the log-log timings.
+    :param timings: seconds for each scale
+    :type timings: dict
+    :return: exponent, or None with fewer than two scales
+    :rtype: float
+    """
+    points = [(math.log(int(x)), math.log(max(y, 1e-9)))
+              for x, y in timings.items()]
+    if len(points) < 2:
+        return None
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    return covariance / variance
+
+
+def run_suite(scales, repeats=3, names=None):
+    """
+    Times each benchmarked function and measures its peak memory at each
+    scale, and fits its scaling exponent.
+    :param scales: numbers of genes to benchmark
+    :type scales: list
+    :param repeats: best-of repeats per scale
+    :type repeats: int
+    :param names: functions to benchmark, or None for all of them
+    :type names: list
+    :return: results, keyed by function name
+    :rtype: dict
+    """
+    benchmarks = [x for x in BENCHMARKS if names is None or x[0] in names]
+    results = {name: {"Seconds": dict(), "PeakBytes": dict()}
+               for name, _, _ in benchmarks}
+
+    print(f"{'function':<24}  {'genes':>8}  {'seconds':>8}  "
+          f"{'us/gene':>8}  {'peak MiB':>8}  {'B/gene':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in scales:
+            data = Dataset(scale, tmp_dir)
+            for name, func, setup in benchmarks:
+                best = min(time_call(func, *setup(data))
+                           for _ in range(repeats))
+                peak = measure_memory(func, *setup(data))
+                results[name]["Seconds"][str(scale)] = best
+                results[name]["PeakBytes"][str(scale)] = peak
+                print(f"{name:<24}  {scale:>8}  {best:>8.3f}  "
+                      f"{1e6 * best / scale:>8.2f}  "
+                      f"{peak / 1024 ** 2:>8.1f}  {peak / scale:>8.0f}")
+            del data
+
+    for name, result in results.items():
+        result["Exponent"] = fit_exponent(result["Seconds"])
+
+    return results
+
+
+def compare_to_baseline(results, baseline, exponent_tolerance=0.25,
+                        memory_tolerance=1.5):
+    """
+    Finds functions whose scaling exponent or memory use per gene has
+    grown past the stored baseline. Absolute times depend on the machine,
+    so they are reported but not compared.
+    :param results: results of run_suite
+    :type results: dict
+    :param baseline: stored results of an earlier run_suite
+    :type baseline: dict
+    :param exponent_tolerance: largest allowed rise of the exponent
+    :type exponent_tolerance: float
+    :param memory_tolerance: largest allowed ratio of peak memory
+    :type memory_tolerance: float
+    :return: descriptions of the regressions found
+    :rtype: list
+    """
+    regressions = list()
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+
+        exponent = result["Exponent"]
+        if exponent is not None and expected["Exponent"] is not None and \
+                exponent > expected["Exponent"] + exponent_tolerance:
+            regressions.append(f"{name}: scaling exponent {exponent:.2f} "
+                               f"(baseline {expected['Exponent']:.2f})")
+
+        for scale, peak in result["PeakBytes"].items():
+            expected_peak = expected["PeakBytes"].get(scale)
+            if expected_peak and peak > expected_peak * memory_tolerance:
+                regressions.append(f"{name}: {peak / 1024 ** 2:.1f} MiB "
+                                   f"peak at {scale} genes (baseline "
+                                   f"{expected_peak / 1024 ** 2:.1f} MiB)")
+
+    return regressions
+
+
+def synthesize_translations(num_translations, seed=1):
+    """
+    Builds a synthetic translation_groups dictionary with a phage-like
+    protein length distribution: mostly short proteins and a long tail
+    of large structural proteins.
+    :param num_translations: number of non-redundant translations
+    :type num_translations: int
+    :param seed: random seed, so runs are reproducible
+    :type seed: int
+    :return: translation_groups
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+
+    translation_groups = dict()
+    for i in range(num_translations):
+        length = int(rng.lognormvariate(math.log(150), 0.7))
+        length = min(max(length, 30), 4000)
+        translation_groups["M" * length + str(i)] = [f"Phage_CDS_{i}"]
+
+    return translation_groups
+
+
+def reference_chunk_translations(translation_groups, chunksize=500):
+    """
+    Reproduces the fixed-size chunking that chunk_translations replaced:
+    chunksize translations per chunk in dictionary order, with a smaller
+    leftover chunk last.
+    :param translation_groups: translations and their geneids
+    :type translation_groups: dict
+    :param chunksize: how many translations will be in a chunk?
+    :type chunksize: int
+    :return: chunks
+    :rtype: dict
+    """
+    chunks = dict()
+    keys = list(translation_groups.keys())
+    for i, index in enumerate(range(0, len(keys), chunksize)):
+        chunks[i] = tuple((x, translation_groups[x][0])
+                          for x in keys[index:index + chunksize])
+
+    return chunks
+
+
+def simulate_makespan(chunks, workers):
+    """
+    Simulates dispatching chunks in order to the first free worker, as
+    parallelize does, and returns the time the last chunk finishes.
+    :param chunks: chunks of translations and their geneids
+    :type chunks: dict
+    :param workers: number of worker processes
+    :type workers: int
+    :return: makespan, in estimated cost units
+    :rtype: int
+    """
+    free_at = [0] * workers
+    for chunk in chunks.values():
+        start = heapq.heappop(free_at)
+        cost = phameration.estimate_chunk_cost(chunk)
+        heapq.heappush(free_at, start + cost)
+
+    return max(free_at)
+
+
+def bench_chunk_scheduling(num_translations, worker_counts, chunksize=500):
+    """
+    Compares the simulated blastp makespan of fixed-size chunks with that
+    of length-balanced, longest-first chunks.
+    :param num_translations: number of non-redundant translations
+    :type num_translations: int
+    :param worker_counts: numbers of worker processes to simulate
+    :type worker_counts: list
+    :param chunksize: average number of translations in a chunk
+    :type chunksize: int
+    :return: makespans of both schedules for each worker count
+    :rtype: dict
+    """
+    translation_groups = synthesize_translations(num_translations)
+    residues = sum(len(x) for x in translation_groups)
+    fixed = reference_chunk_translations(translation_groups, chunksize)
+
+    makespans = dict()
+
+    print(f"{'workers':>8}  {'fixed':>8}  {'balanced':>8}  "
+          f"{'improved':>8}  {'efficiency':>10}")
+    for workers in worker_counts:
+        balanced = phameration.chunk_translations(translation_groups,
+                                                  chunksize, workers)
+        fixed_span = simulate_makespan(fixed, workers)
+        balanced_span = simulate_makespan(balanced, workers)
+        ideal_span = residues / workers
+        makespans[workers] = (fixed_span, balanced_span)
+
+        # Makespans are reported relative to a perfect split of the work
+        print(f"{workers:>8}  {fixed_span / ideal_span:>8.3f}  "
+              f"{balanced_span / ideal_span:>8.3f}  "
+              f"{1 - balanced_span / fixed_span:>8.1%}  "
+              f"{ideal_span / balanced_span:>10.1%}")
+
+    return makespans
+
+
+def main():
+    parser = argparse.ArgumentParser(
+                    description=__doc__,
+                    formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+",
+                        default=[10000, 100000, 1000000],
+                        help="numbers of genes to benchmark")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="best-of repeats per scale")
+    parser.add_argument("--functions", type=str, nargs="+", default=None,
+                        choices=[x[0] for x in BENCHMARKS],
+                        help="functions to benchmark (default: all)")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH,
+                        help="JSON file of stored baseline results")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--translations", type=int, default=150000,
+                        help="number of translations to chunk for blastp")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[4, 8, 16, 32, 64],
+                        help="numbers of blastp processes to simulate")
+    args = parser.parse_args()
+
+    results = run_suite(args.scales, args.repeats, args.functions)
+
+    print(f"\n{'function':<24}  {'exponent':>8}  {'baseline':>8}")
+    baseline = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as fh:
+            baseline = json.load(fh)
+    for name, result in results.items():
+        expected = baseline.get(name, {}).get("Exponent")
+        expected = "" if expected is None else f"{expected:.2f}"
+        exponent = result["Exponent"]
+        exponent = "" if exponent is None else f"{exponent:.2f}"
+        print(f"{name:<24}  {exponent:>8}  {expected:>8}")
+
+    print("\nblastp chunk scheduling (makespan relative to a perfect split)")
+    bench_chunk_scheduling(args.translations, args.workers)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as fh:
+            json.dump(baseline, fh, indent=2, sort_keys=True)
+        print(f"\nStored baseline results in {args.baseline}")
+        return
+
+    regressions = compare_to_baseline(results, baseline)
+    if len(regressions) > 0:
+        print("\nRegressions against the stored baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
@@ -24,6 +24,9 @@ setuptools.setup(
         'tabulate==0.8.3',
         'urllib3==1.25.8'
     ],
+    extras_require={
+        'mcl': ['scipy']
+    },
     project_urls={
         'Documentation': 'https://pdm-utils.readthedocs.io/en/latest/',
         'Source': 'https://github.com/SEA-PHAGES/pdm_utils/',
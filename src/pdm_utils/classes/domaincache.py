@@ -0,0 +1,157 @@
+"""Represents a persistent cache of rpsblast conserved domain results."""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+from pdm_utils.functions import basic
+
+# Default maximum size of cached result data (bytes).
+DEFAULT_MAX_SIZE = 1024 ** 3
+
+# SQLite limits the number of host parameters in a single statement.
+LOOKUP_CHUNK_SIZE = 500
+
+CREATE_TABLE = (
+    "CREATE TABLE IF NOT EXISTS domain_result ("
+    "Hash TEXT NOT NULL, "
+    "CDDVersion TEXT NOT NULL, "
+    "Evalue REAL NOT NULL, "
+    "Data TEXT NOT NULL, "
+    "Size INTEGER NOT NULL, "
+    "LastUsed REAL NOT NULL, "
+    "PRIMARY KEY (Hash, CDDVersion, Evalue))")
+CREATE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS last_used ON domain_result (LastUsed)")
+
+
+class DomainCache:
+    """A content-addressed SQLite store of find_domains search results.
+
+    Results are keyed by the SHA-256 hash of a translation, the version
+    of the CDD that was searched and the evalue cutoff, so a cache can be
+    shared between databases and survives a reset of their domain data.
+    Once the stored data grows past max_size bytes, the least recently
+    used results are evicted.
+    """
+
+    def __init__(self, path, cdd_version, evalue, max_size=DEFAULT_MAX_SIZE):
+        self.path = str(path)
+        self.cdd_version = cdd_version
+        self.evalue = float(evalue)
+        self.max_size = max_size
+
+        self.connection = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        """Connect to the cache file, creating it if needed."""
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(CREATE_TABLE)
+        self.connection.execute(CREATE_INDEX)
+        self.connection.commit()
+
+    def close(self):
+        """Commit any changes and close the connection to the cache file."""
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def get_many(self, translations):
+        """Retrieve cached results for a list of translations.
+
+        :param translations: Translations to look up.
+        :type translations: list
+        :returns:
+            Dictionary where key = translation and value = list of
+            rpsblast result dictionaries, for every translation in the cache.
+        :rtype: dict
+        """
+        hashes = {hash_translation(x): x for x in translations}
+        results = {}
+        for chunk in basic.partition_list(list(hashes.keys()),
+                                          LOOKUP_CHUNK_SIZE):
+            query = ("SELECT Hash, Data FROM domain_result "
+                     "WHERE CDDVersion = ? AND Evalue = ? AND Hash IN "
+                     f"({', '.join(['?'] * len(chunk))})")
+            rows = self.connection.execute(
+                            query, [self.cdd_version, self.evalue] + chunk)
+            for hash, data in rows:
+                results[hashes[hash]] = json.loads(data)
+
+            # Record use, so that recently used results aren't evicted
+            update = ("UPDATE domain_result SET LastUsed = ? "
+                      "WHERE CDDVersion = ? AND Evalue = ? AND Hash IN "
+                      f"({', '.join(['?'] * len(chunk))})")
+            self.connection.execute(
+                    update, [time.time(), self.cdd_version, self.evalue] + chunk)
+        self.connection.commit()
+
+        self.hits += len(results)
+        self.misses += len(hashes) - len(results)
+        return results
+
+    def put_many(self, search_results):
+        """Store search results.
+
+        :param search_results:
+            List of dictionaries, one dict per translation, with
+            keys = "Translation" and "Data".
+        :type search_results: list
+        """
+        now = time.time()
+        rows = []
+        for result in search_results:
+            data = json.dumps(result["Data"])
+            rows.append((hash_translation(result["Translation"]),
+                         self.cdd_version, self.evalue, data, len(data), now))
+
+        self.connection.executemany(
+                    "INSERT OR REPLACE INTO domain_result "
+                    "(Hash, CDDVersion, Evalue, Data, Size, LastUsed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+
+    def get_size(self):
+        """Get the total size (bytes) of the cached result data."""
+        size = self.connection.execute(
+                    "SELECT COALESCE(SUM(Size), 0) FROM domain_result")\
+                    .fetchone()[0]
+        return size
+
+    def evict(self):
+        """Remove least recently used results until the cache fits within
+        max_size.
+
+        :returns: Number of results removed.
+        :rtype: int
+        """
+        excess = self.get_size() - self.max_size
+        if excess <= 0:
+            return 0
+
+        rows = self.connection.execute(
+                    "SELECT Hash, CDDVersion, Evalue, Size FROM domain_result "
+                    "ORDER BY LastUsed")
+        evicted = []
+        for hash, cdd_version, evalue, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((hash, cdd_version, evalue))
+            excess -= size
+        rows.close()
+
+        self.connection.executemany(
+                    "DELETE FROM domain_result WHERE Hash = ? AND "
+                    "CDDVersion = ? AND Evalue = ?", evicted)
+        self.connection.commit()
+        return len(evicted)
+
+
+def hash_translation(translation):
+    """Compute the content address of a translation."""
+    return hashlib.sha256(translation.encode("utf-8")).hexdigest()
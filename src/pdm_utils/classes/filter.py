@@ -583,6 +583,9 @@ class Filter:
         """
         self.check()
 
+        if not self._values:
+            return {}
+
         column = self.get_column(raw_column)
 
         groups = self.transpose(column)
@@ -591,17 +594,27 @@ class Filter:
         if filter:
             where_clauses = self.build_where_clauses()
 
+        # MySQL compares strings case-insensitively, so rows are matched to
+        # the distinct groups the same way.
+        group_lookup = {}
         group_results = {}
         for group in groups:
+            group_lookup.setdefault(fold_value(group), group)
+            group_results.update({group: {}})
+
+        pairs = self.build_pairs(column, where=where_clauses)
+        for value, column_value in pairs:
+            if self._key.type.python_type == bytes and not raw_bytes:
+                value = basic.convert_to_decoded(value)[0]
             if column.type.python_type == bytes:
-                group_clauses = where_clauses + \
-                                            [(column == group.encode("utf_8"))]
-            else:
-                group_clauses = where_clauses + [(column == group)]
+                column_value = basic.convert_to_decoded(column_value)[0]
+
+            group = group_lookup.get(fold_value(column_value))
+            if group is not None:
+                group_results[group].update({value: None})
 
-            values = self.build_values(where=group_clauses,
-                                       raw_bytes=raw_bytes)
-            group_results.update({group: values})
+        for group in group_results.keys():
+            group_results[group] = list(group_results[group].keys())
 
         return group_results
 
@@ -627,29 +640,81 @@ class Filter:
         if filter:
             where_clauses = self.build_where_clauses()
 
+        # MySQL compares strings case-insensitively, so rows are matched to
+        # the Filter values the same way.
+        value_lookup = {}
         values = {}
         for value in self._values:
-            compare_value = value
-            if self._key.type.python_type == bytes and value is not None:
-                compare_value = value.encode("utf-8")
-
-            value_clauses = where_clauses + [(self._key == compare_value)]
+            value_lookup.setdefault(fold_value(value), []).append(value)
             values.update({value: {}})
 
-            # For each column for each value, add the respective data to a dict
-            for i in range(len(columns)):
-                query = q.build_distinct(self._graph, columns[i],
-                                         where=value_clauses)
-                value_data = q.first_column(self._engine, query)
+        # For each column, add the respective data for every value to a dict
+        for column in columns:
+            for value in values.keys():
+                values[value].update({column.name: {}})
 
+            pairs = self.build_pairs(column, where=where_clauses)
+            for key_value, column_value in pairs:
+                if self._key.type.python_type == bytes:
+                    key_value = basic.convert_to_decoded(key_value)[0]
                 if not raw_bytes:
-                    if columns[i].type.python_type == bytes:
-                        value_data = basic.convert_to_decoded(value_data)
+                    if column.type.python_type == bytes:
+                        column_value = basic.convert_to_decoded(
+                                                        column_value)[0]
+
+                for value in value_lookup.get(fold_value(key_value), []):
+                    values[value][column.name].update({column_value: None})
 
-                values[value].update({columns[i].name: value_data})
+            for value in values.keys():
+                values[value][column.name] = list(
+                                            values[value][column.name].keys())
 
         return values
 
+    def build_pairs(self, column, where=None, limit=8000):
+        """Queries for distinct pairs of Filter key and Column values.
+
+        The Filter values are queried in chunked IN clauses, so the number
+        of queries does not grow with the number of Filter values.
+
+        :param column: SQLAlchemy Column object.
+        :type column: Column
+        :param where: MySQL WHERE clause_related SQLAlchemy object(s).
+        :type where: BinaryExpression
+        :type where: list
+        :param limit: SQLAlchemy IN clause query length limiter.
+        :type limit: int
+        :returns: Distinct (key value, column value) tuples.
+        :rtype: list[tuple]
+        """
+        self.check()
+
+        if where is None:
+            base_clauses = []
+        elif isinstance(where, list):
+            base_clauses = where
+        else:
+            base_clauses = [where]
+
+        pairs = []
+
+        in_values = [value for value in self._values if value is not None]
+        if in_values:
+            query = q.build_distinct(self._graph, [self._key, column],
+                                     where=base_clauses)
+            pairs.extend(q.execute(self._engine, query, in_column=self._key,
+                                   values=in_values, limit=limit,
+                                   return_dict=False))
+
+        # NULL never matches an IN clause.
+        if len(in_values) < len(self._values):
+            query = q.build_distinct(self._graph, [self._key, column],
+                                     where=(base_clauses +
+                                            [self._key.is_(None)]))
+            pairs.extend(q.execute(self._engine, query, return_dict=False))
+
+        return [tuple(pair) for pair in pairs]
+
     def get_column(self, raw_column):
         """Converts a column input, string or Column, to a Column.
 
@@ -759,3 +824,15 @@ class Filter:
                       (result_row[0], "", "")
                       + " " + "|")
         print("|" + "_"*57 + "|")
+
+
+def fold_value(value):
+    """Converts a value to the form MySQL uses to compare it.
+
+    :param value: Value from a MySQL column or a Filter.
+    :returns: Lowercased value, if the value is a string.
+    """
+    if isinstance(value, str):
+        return value.lower()
+
+    return value
@@ -0,0 +1,169 @@
+"""Represents a record of the time and memory used by each stage of a
+pipeline."""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import resource
+import sys
+import time
+
+# ru_maxrss is reported in bytes on MacOS, and in kibibytes on Linux.
+if sys.platform == "darwin":
+    MAXRSS_UNIT = 1
+else:
+    MAXRSS_UNIT = 1024
+
+
+class StageReport:
+    """Records wall time, CPU time, peak memory, input and output sizes,
+    and the exit status of each external tool, for each stage of a
+    pipeline run.
+
+    CPU time includes the time used by child processes (external tools
+    and parallelize workers) that finished during the stage. Peak RSS is
+    a high-water mark: the largest resident set size reached by the
+    pipeline, and separately by any one child process, at the end of the
+    stage.
+    """
+
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline
+        self.start = datetime.now()
+        self.stages = []
+
+        self._open = []
+        self._start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, inputs=None):
+        """Record a stage of the pipeline while the context is open.
+
+        :param name: Name of the stage.
+        :type name: str
+        :param inputs: Sizes of the stage's inputs, keyed by unit.
+        :type inputs: dict
+        """
+        stage = {"Stage": name, "Inputs": inputs, "Outputs": None,
+                 "Tools": []}
+        self.stages.append(stage)
+        self._open.append(stage)
+
+        wall_time = time.perf_counter()
+        cpu_time = get_cpu_time()
+        try:
+            yield stage
+        finally:
+            self._open.pop()
+            stage["WallTime"] = time.perf_counter() - wall_time
+            stage["CPUTime"] = get_cpu_time() - cpu_time
+            stage["PeakRSS"], stage["ChildPeakRSS"] = get_peak_rss()
+
+    def set_outputs(self, **outputs):
+        """Record the sizes of the current stage's outputs, keyed by unit."""
+        self._open[-1]["Outputs"] = outputs
+
+    def record_tool(self, tool, returncode):
+        """Record the exit status of an external tool run by the current
+        stage.
+
+        :param tool: Name of the tool.
+        :type tool: str
+        :param returncode: Exit status of the tool.
+        :type returncode: int
+        """
+        self._open[-1]["Tools"].append({"Tool": tool,
+                                        "ReturnCode": returncode})
+
+    def get_failed_tools(self):
+        """Get the tools that exited with a non-zero status.
+
+        :returns: List of (stage name, tool name, exit status) tuples.
+        :rtype: list
+        """
+        failed = []
+        for stage in self.stages:
+            for tool in stage["Tools"]:
+                if tool["ReturnCode"] != 0:
+                    failed.append((stage["Stage"], tool["Tool"],
+                                   tool["ReturnCode"]))
+        return failed
+
+    def to_dict(self):
+        """Get the report as a JSON-serializable dictionary."""
+        return {"Pipeline": self.pipeline,
+                "Start": self.start.isoformat(timespec="seconds"),
+                "WallTime": time.perf_counter() - self._start_time,
+                "Stages": self.stages}
+
+    def write(self, path):
+        """Write the report to a JSON file.
+
+        :param path: Path of the JSON file.
+        :type path: str
+        """
+        with open(path, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    def format_table(self):
+        """Format the report as a plain-text table, one line per stage."""
+        lines = [f"{'stage':<16}  {'wall (s)':>9}  {'cpu (s)':>9}  "
+                 f"{'rss (MiB)':>9}  {'child rss':>9}  {'inputs':<22}  "
+                 f"{'outputs':<22}  tools"]
+        for stage in self.stages:
+            tools = ", ".join(f"{x['Tool']}={x['ReturnCode']}"
+                              for x in stage["Tools"])
+            lines.append(f"{stage['Stage']:<16}  "
+                         f"{stage.get('WallTime', 0):>9.2f}  "
+                         f"{stage.get('CPUTime', 0):>9.2f}  "
+                         f"{stage.get('PeakRSS', 0) / 1024 ** 2:>9.1f}  "
+                         f"{stage.get('ChildPeakRSS', 0) / 1024 ** 2:>9.1f}  "
+                         f"{format_sizes(stage['Inputs']):<22}  "
+                         f"{format_sizes(stage['Outputs']):<22}  {tools}")
+
+        return "\n".join(lines)
+
+
+def get_cpu_time():
+    """Get the CPU time (seconds) used by this process and its finished
+    child processes."""
+    cpu_time = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu_time += usage.ru_utime + usage.ru_stime
+    return cpu_time
+
+
+def get_peak_rss():
+    """Get the peak resident set size (bytes) of this process, and of the
+    largest of its finished child processes."""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_rss * MAXRSS_UNIT, child_rss * MAXRSS_UNIT
+
+
+def get_path_size(path):
+    """Get the size (bytes) of a file, or of an MMseqs2 or BLAST database
+    made of the files that share its path as a prefix."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    directory, prefix = os.path.split(path)
+    directory = directory or "."
+    if not os.path.isdir(directory):
+        return 0
+
+    size = 0
+    for filename in os.listdir(directory):
+        file_path = os.path.join(directory, filename)
+        if filename.startswith(prefix) and os.path.isfile(file_path):
+            size += os.path.getsize(file_path)
+    return size
+
+
+def format_sizes(sizes):
+    """Format a dictionary of sizes keyed by unit, e.g. '10 genes'."""
+    if not sizes:
+        return ""
+    return ", ".join(f"{value} {unit}" for unit, value in sizes.items())
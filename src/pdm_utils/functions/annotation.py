@@ -1,12 +1,18 @@
 """Functions to retrieve phage genome annotation data."""
 
+import json
 import re
+from pathlib import Path
 
 from sqlalchemy import select
 
 from pdm_utils.functions import basic
+from pdm_utils.functions import mysqldb_basic
 from pdm_utils.functions import querying
 
+GET_GENE_POSITIONS = "SELECT PhageID, GeneID, Start FROM gene"
+COUNT_GENES = "SELECT COUNT(*) FROM gene"
+
 
 # ANNOTATION RETRIEVAL
 # -----------------------------------------------------------------------------
@@ -51,38 +57,103 @@ def get_distinct_annotations_from_genes(alchemist, geneids):
     return annotations
 
 
-def get_phams_from_genes(alchemist, geneids):
+def get_gene_data(alchemist, geneids, limit=8000):
+    """Retrieve the pham and annotation of genes, with chunked IN queries.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param geneids: GeneIDs of the genes to retrieve data for.
+    :type geneids: list[str]
+    :param limit: SQLAlchemy IN clause query length limiter.
+    :type limit: int
+    :returns: Dictionary where key = lowercase GeneID and
+              value = (PhamID, decoded Notes).
+    :rtype: dict
+    """
+    if not geneids:
+        return {}
+
     gene_obj = alchemist.metadata.tables["gene"]
 
     geneid_obj = gene_obj.c.GeneID
     phamid_obj = gene_obj.c.PhamID
+    notes_obj = gene_obj.c.Notes
 
-    pham_query = select([phamid_obj])
+    gene_query = select([geneid_obj, phamid_obj, notes_obj])
 
-    phams = []
-    for gene in geneids:
-        pham = alchemist.engine.execute(pham_query.where(geneid_obj == gene))\
-                                                                    .scalar()
-        phams.append(pham)
+    rows = querying.execute(alchemist.engine, gene_query,
+                            in_column=geneid_obj, values=list(set(geneids)),
+                            limit=limit, return_dict=False)
 
-    return phams
+    # MySQL compares GeneIDs case-insensitively.
+    gene_data = {}
+    for geneid, pham, note in rows:
+        if note is not None:
+            note = note.decode("utf-8")
+        gene_data[geneid.lower()] = (pham, note)
 
+    return gene_data
+
+
+def get_pham_gene_data(alchemist, phams, limit=8000):
+    """Retrieve the genes and annotations of phams, with chunked IN queries.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param phams: PhamIDs of the phams to retrieve data for.
+    :type phams: list[int]
+    :param limit: SQLAlchemy IN clause query length limiter.
+    :type limit: int
+    :returns: Dictionary where key = PhamID and
+              value = list of (GeneID, decoded Notes) tuples.
+    :rtype: dict
+    """
+    pham_data = {}
+    pham_lookup = {}
+    for pham in phams:
+        pham_data[pham] = []
+        pham_lookup[str(pham)] = pham
+
+    if not phams:
+        return pham_data
 
-def get_annotations_from_genes(alchemist, geneids):
     gene_obj = alchemist.metadata.tables["gene"]
 
     geneid_obj = gene_obj.c.GeneID
+    phamid_obj = gene_obj.c.PhamID
     notes_obj = gene_obj.c.Notes
 
-    notes_query = select([notes_obj])
+    gene_query = select([phamid_obj, geneid_obj, notes_obj])
 
-    annotations = []
-    for gene in geneids:
-        note = alchemist.engine.execute(notes_query.where(geneid_obj == gene))\
-                                                                    .scalar()
+    rows = querying.execute(alchemist.engine, gene_query,
+                            in_column=phamid_obj, values=list(pham_data.keys()),
+                            limit=limit, return_dict=False)
 
+    for pham, geneid, note in rows:
         if note is not None:
             note = note.decode("utf-8")
+        pham_data[pham_lookup[str(pham)]].append((geneid, note))
+
+    return pham_data
+
+
+def get_phams_from_genes(alchemist, geneids):
+    gene_data = get_gene_data(alchemist, geneids)
+
+    phams = []
+    for gene in geneids:
+        pham = gene_data.get(gene.lower(), (None, None))[0]
+        phams.append(pham)
+
+    return phams
+
+
+def get_annotations_from_genes(alchemist, geneids):
+    gene_data = get_gene_data(alchemist, geneids)
+
+    annotations = []
+    for gene in geneids:
+        note = gene_data.get(gene.lower(), (None, None))[1]
         annotations.append(note)
 
     return annotations
@@ -117,11 +188,40 @@ def get_count_annotations_in_pham(alchemist, pham, incounts=None):
     return count_annotations
 
 
-def get_relative_gene(alchemist, geneid, pos):
-    gene_obj = alchemist.metadata.tables["gene"]
+def get_count_annotations_in_phams(alchemist, phams):
+    """Count the annotations of the genes in each of a list of phams.
 
-    geneid_obj = gene_obj.c.GeneID
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param phams: PhamIDs of the phams to count annotations for.
+    :type phams: list[int]
+    :returns: Dictionary where key = PhamID and
+              value = dictionary of annotation counts.
+    :rtype: dict
+    """
+    pham_data = get_pham_gene_data(alchemist, phams)
+
+    pham_counts = {}
+    for pham, genes in pham_data.items():
+        annotations = [note for geneid, note in genes]
+
+        annotation_counts = {}
+        basic.increment_histogram(annotations, annotation_counts)
+        pham_counts[pham] = annotation_counts
+
+    return pham_counts
 
+
+def build_relative_geneid(geneid, pos):
+    """Build the GeneID of the gene pos genes away from a gene.
+
+    :param geneid: GeneID formatted as {PhageID}_CDS_{number}.
+    :type geneid: str
+    :param pos: Number of genes away from the gene.
+    :type pos: int
+    :returns: GeneID of the relative gene.
+    :rtype: str
+    """
     geneid_format = re.compile("[\w\W]+_CDS_[0-9]+")
     if not re.match(geneid_format, geneid) is None:
         parsed_geneid = re.split("_", geneid)
@@ -133,26 +233,159 @@ def get_relative_gene(alchemist, geneid, pos):
     rel_gene_pos = gene_num + pos
 
     rel_geneid = "_".join(parsed_geneid[:2] + [str(rel_gene_pos)])
+    return rel_geneid
+
+
+def get_relative_gene(alchemist, geneid, pos):
+    gene_obj = alchemist.metadata.tables["gene"]
+
+    geneid_obj = gene_obj.c.GeneID
+
+    rel_geneid = build_relative_geneid(geneid, pos)
     geneid_query = select([geneid_obj]).where(geneid_obj == rel_geneid)
     rel_geneid = alchemist.engine.execute(geneid_query).scalar()
 
     return rel_geneid
 
 
-def get_adjacent_genes(alchemist, gene):
+def get_relative_genes(alchemist, geneids, pos, limit=8000):
+    """Find the genes pos genes away from each of a list of genes.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param geneids: GeneIDs formatted as {PhageID}_CDS_{number}.
+    :type geneids: list[str]
+    :param pos: Number of genes away from each gene.
+    :type pos: int
+    :param limit: SQLAlchemy IN clause query length limiter.
+    :type limit: int
+    :returns: GeneIDs of the relative genes, or None where there is none.
+    :rtype: list
+    """
+    rel_geneids = [build_relative_geneid(geneid, pos) for geneid in geneids]
+    if not rel_geneids:
+        return []
+
+    gene_obj = alchemist.metadata.tables["gene"]
+
+    geneid_obj = gene_obj.c.GeneID
+
+    geneid_query = select([geneid_obj])
+    found_geneids = querying.first_column(alchemist.engine, geneid_query,
+                                          in_column=geneid_obj,
+                                          values=list(set(rel_geneids)),
+                                          limit=limit)
+
+    # MySQL compares GeneIDs case-insensitively.
+    found_geneids = {geneid.lower(): geneid for geneid in found_geneids}
+
+    return [found_geneids.get(geneid.lower()) for geneid in rel_geneids]
+
+
+# NEIGHBOUR INDEX
+# -----------------------------------------------------------------------------
+def build_neighbour_index(alchemist):
+    """Map every gene to the genes to its left and right in its genome.
+
+    Genes are ordered by Start coordinate within each genome, so GeneIDs
+    need not follow the {PhageID}_CDS_{number} format.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :returns: Dictionary where key = GeneID and
+              value = tuple of left GeneID and right GeneID, or None
+              where there is no neighbour.
+    :rtype: dict
+    """
+    genomes = {}
+    for phage_id, geneid, start in mysqldb_basic.query_iter(
+                                        alchemist.engine, GET_GENE_POSITIONS):
+        genomes.setdefault(phage_id, []).append((start, geneid))
+
+    neighbour_index = {}
+    for genes in genomes.values():
+        genes.sort()
+        geneids = [None] + [geneid for start, geneid in genes] + [None]
+        for i in range(1, len(geneids) - 1):
+            neighbour_index[geneids[i]] = (geneids[i - 1], geneids[i + 1])
+
+    return neighbour_index
+
+
+def get_neighbour_index_version(alchemist):
+    """Identify the state of a database that a neighbour index depends on.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :returns: Database version and number of genes.
+    :rtype: list
+    """
+    version_data = mysqldb_basic.get_first_row_data(alchemist.engine,
+                                                    "version")
+    gene_count = mysqldb_basic.scalar(alchemist.engine, COUNT_GENES)
+
+    return [version_data.get("Version"), gene_count]
+
+
+def load_neighbour_index(alchemist, index_file=None):
+    """Load a neighbour index, building it if needed.
+
+    If an index file is given and was saved from the same database version
+    with the same number of genes, the index is read from it. Otherwise the
+    index is built, and saved to the index file if one is given.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param index_file: Path to a JSON file to persist the index in.
+    :type index_file: Path
+    :returns: Dictionary where key = GeneID and
+              value = tuple of left GeneID and right GeneID.
+    :rtype: dict
+    """
+    if index_file is None:
+        return build_neighbour_index(alchemist)
+
+    index_file = Path(index_file)
+    version = get_neighbour_index_version(alchemist)
+
+    if index_file.is_file():
+        with index_file.open(mode="r") as filehandle:
+            saved_index = json.load(filehandle)
+
+        if (saved_index.get("Database") == alchemist.database and
+                saved_index.get("Version") == version):
+            neighbour_index = {}
+            for geneid, neighbours in saved_index["Index"].items():
+                neighbour_index[geneid] = tuple(neighbours)
+            return neighbour_index
+
+    neighbour_index = build_neighbour_index(alchemist)
+
+    with index_file.open(mode="w") as filehandle:
+        json.dump({"Database": alchemist.database, "Version": version,
+                   "Index": neighbour_index}, filehandle)
+
+    return neighbour_index
+
+
+def get_adjacent_genes(alchemist, gene, neighbour_index=None):
+    if neighbour_index is not None:
+        return neighbour_index.get(gene, (None, None))
+
     left = get_relative_gene(alchemist, gene, -1)
     right = get_relative_gene(alchemist, gene, 1)
 
     return (left, right)
 
 
-def get_genes_adjacent_to_pham(alchemist, pham):
+def get_genes_adjacent_to_pham(alchemist, pham, neighbour_index=None):
     genes = get_genes_from_pham(alchemist, pham)
 
     left_genes = []
     right_genes = []
     for gene in genes:
-        adjacent_genes = get_adjacent_genes(alchemist, gene)
+        adjacent_genes = get_adjacent_genes(alchemist, gene,
+                                            neighbour_index=neighbour_index)
 
         if not adjacent_genes[0] is None:
             left_genes.append(adjacent_genes[0])
@@ -162,8 +395,59 @@ def get_genes_adjacent_to_pham(alchemist, pham):
     return (left_genes, right_genes)
 
 
-def get_distinct_adjacent_phams(alchemist, pham):
-    adjacent_genes = get_genes_adjacent_to_pham(alchemist, pham)
+def get_genes_adjacent_to_phams(alchemist, phams, neighbour_index=None):
+    """Find the genes to the left and right of the genes in each of a list
+    of phams.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param phams: PhamIDs of the phams to find adjacent genes for.
+    :type phams: list[int]
+    :param neighbour_index: Index from build_neighbour_index(). If not
+                            given, neighbours are found from GeneIDs.
+    :type neighbour_index: dict
+    :returns: Dictionary where key = PhamID and
+              value = tuple of left GeneIDs and right GeneIDs.
+    :rtype: dict
+    """
+    pham_data = get_pham_gene_data(alchemist, phams)
+
+    genes = []
+    for pham_genes in pham_data.values():
+        genes.extend([geneid for geneid, note in pham_genes])
+
+    if neighbour_index is not None:
+        left_genes = {}
+        right_genes = {}
+        for gene in genes:
+            neighbours = neighbour_index.get(gene, (None, None))
+            left_genes[gene] = neighbours[0]
+            right_genes[gene] = neighbours[1]
+    else:
+        left_genes = dict(zip(genes,
+                              get_relative_genes(alchemist, genes, -1)))
+        right_genes = dict(zip(genes,
+                               get_relative_genes(alchemist, genes, 1)))
+
+    adjacent_genes = {}
+    for pham, pham_genes in pham_data.items():
+        left = []
+        right = []
+        for geneid, note in pham_genes:
+            if not left_genes[geneid] is None:
+                left.append(left_genes[geneid])
+            if not right_genes[geneid] is None:
+                right.append(right_genes[geneid])
+
+        adjacent_genes[pham] = (left, right)
+
+    return adjacent_genes
+
+
+def get_distinct_adjacent_phams(alchemist, pham, neighbour_index=None):
+    adjacent_genes = get_genes_adjacent_to_pham(
+                                        alchemist, pham,
+                                        neighbour_index=neighbour_index)
 
     left_phams = get_phams_from_genes(alchemist, adjacent_genes[0])
     right_phams = get_phams_from_genes(alchemist, adjacent_genes[1])
@@ -171,8 +455,11 @@ def get_distinct_adjacent_phams(alchemist, pham):
     return (left_phams, right_phams)
 
 
-def get_count_adjacent_phams_to_pham(alchemist, pham, incounts=None):
-    adjacent_genes = get_genes_adjacent_to_pham(alchemist, pham)
+def get_count_adjacent_phams_to_pham(alchemist, pham, incounts=None,
+                                     neighbour_index=None):
+    adjacent_genes = get_genes_adjacent_to_pham(
+                                        alchemist, pham,
+                                        neighbour_index=neighbour_index)
 
     adjacent_phams = ({}, {})
     if incounts is not None:
@@ -187,8 +474,11 @@ def get_count_adjacent_phams_to_pham(alchemist, pham, incounts=None):
     return adjacent_phams
 
 
-def get_count_adjacent_annotations_to_pham(alchemist, pham, incounts=None):
-    adjacent_genes = get_genes_adjacent_to_pham(alchemist, pham)
+def get_count_adjacent_annotations_to_pham(alchemist, pham, incounts=None,
+                                           neighbour_index=None):
+    adjacent_genes = get_genes_adjacent_to_pham(
+                                        alchemist, pham,
+                                        neighbour_index=neighbour_index)
 
     adjacent_annotations = ({}, {})
     if incounts is not None:
@@ -203,3 +493,46 @@ def get_count_adjacent_annotations_to_pham(alchemist, pham, incounts=None):
                                    incounts=right_in)
 
     return adjacent_annotations
+
+
+def get_count_adjacent_annotations_to_phams(alchemist, phams,
+                                            neighbour_index=None):
+    """Count the annotations of the genes to the left and right of the genes
+    in each of a list of phams.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param phams: PhamIDs of the phams to count adjacent annotations for.
+    :type phams: list[int]
+    :param neighbour_index: Index from build_neighbour_index(). If not
+                            given, neighbours are found from GeneIDs.
+    :type neighbour_index: dict
+    :returns: Dictionary where key = PhamID and value = tuple of left
+              annotation counts and right annotation counts.
+    :rtype: dict
+    """
+    adjacent_genes = get_genes_adjacent_to_phams(
+                                        alchemist, phams,
+                                        neighbour_index=neighbour_index)
+
+    genes = []
+    for left, right in adjacent_genes.values():
+        genes.extend(left)
+        genes.extend(right)
+    gene_data = get_gene_data(alchemist, genes)
+
+    adjacent_annotations = {}
+    for pham, (left, right) in adjacent_genes.items():
+        left_counts = {}
+        left_notes = [gene_data.get(gene.lower(), (None, None))[1]
+                      for gene in left]
+        basic.increment_histogram(left_notes, left_counts)
+
+        right_counts = {}
+        right_notes = [gene_data.get(gene.lower(), (None, None))[1]
+                       for gene in right]
+        basic.increment_histogram(right_notes, right_counts)
+
+        adjacent_annotations[pham] = (left_counts, right_counts)
+
+    return adjacent_annotations
@@ -0,0 +1,432 @@
+"""Functions to share the blastp searches of the blast-mcl phameration
+pipeline between processes on one or more machines, which coordinate
+through a work directory on a shared filesystem."""
+
+import json
+import multiprocessing as mp
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+from pdm_utils.functions import parallelize
+from pdm_utils.functions import phameration
+
+MANIFEST_NAME = "blastp_manifest.json"
+LOCK_DIR = "locks"
+DONE_DIR = "done"
+
+# Seconds between checks for new work, and between touches of a lock file
+# by the worker holding it. Locks untouched for STALE_AFTER seconds are
+# assumed to belong to a worker that died, and can be claimed again. The
+# coordinator touches the manifest every POLL_INTERVAL seconds in the same
+# way, so manifests untouched for STALE_AFTER seconds are left by a run
+# that was interrupted, and are ignored.
+POLL_INTERVAL = 5
+HEARTBEAT = 30
+STALE_AFTER = 300
+
+
+def write_manifest(chunks, tmp, blast_db, evalue, query_cov):
+    """
+    Writes a query FASTA file for each chunk, then the manifest workers
+    use to find them. The manifest is written last, so a worker never
+    sees an incomplete set of chunks, and is given a new run id, so
+    workers can tell it apart from the manifests of earlier runs.
+    :param chunks: chunks of translations and their geneids
+    :type chunks: dict
+    :param tmp: shared work directory
+    :type tmp: str
+    :param blast_db: name of the blast database in the work directory
+    :type blast_db: str
+    :param evalue: e-value cutoff to report hits
+    :type evalue: float
+    :param query_cov: query coverage cutoff to keep HSPs
+    :type query_cov: float
+    :return: manifest
+    :rtype: dict
+    """
+    os.makedirs(os.path.join(tmp, LOCK_DIR), exist_ok=True)
+    os.makedirs(os.path.join(tmp, DONE_DIR), exist_ok=True)
+
+    for index, chunk in chunks.items():
+        phameration.write_blastp_query(chunk, get_query_path(tmp, index))
+
+    # Paths are relative to the work directory, which may be mounted at
+    # different paths on different machines
+    manifest = {"RunID": uuid.uuid4().hex, "Database": blast_db,
+                "EValue": evalue, "QueryCoverage": query_cov,
+                "Chunks": list(chunks.keys())}
+
+    manifest_path = os.path.join(tmp, MANIFEST_NAME)
+    with open(f"{manifest_path}.part", "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(f"{manifest_path}.part", manifest_path)
+
+    return manifest
+
+
+def read_manifest(tmp, wait=0, poll=POLL_INTERVAL, stale_after=STALE_AFTER):
+    """
+    Reads the manifest from the work directory, waiting for it to be
+    written if needed. Manifests the coordinator hasn't touched for
+    stale_after seconds are ignored.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param wait: seconds to wait for the manifest
+    :type wait: float
+    :param poll: seconds between checks for the manifest
+    :type poll: float
+    :param stale_after: seconds after which a manifest is abandoned, or
+    None to read manifests of any age
+    :type stale_after: float
+    :return: manifest, or None if it was not written in time
+    :rtype: dict
+    """
+    manifest_path = os.path.join(tmp, MANIFEST_NAME)
+    deadline = time.time() + wait
+    while True:
+        try:
+            age = time.time() - os.path.getmtime(manifest_path)
+            if stale_after is None or age <= stale_after:
+                with open(manifest_path, "r") as fh:
+                    return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            pass
+
+        if time.time() >= deadline:
+            return None
+        time.sleep(poll)
+
+
+def is_current_run(tmp, manifest):
+    """
+    Checks whether the work directory's manifest still belongs to the
+    same run, i.e. that its coordinator hasn't finished or started over.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param manifest: work manifest
+    :type manifest: dict
+    :return: whether the run is current
+    :rtype: bool
+    """
+    current = read_manifest(tmp, stale_after=None)
+    return current is not None and current["RunID"] == manifest["RunID"]
+
+
+def remove_manifest(tmp):
+    """
+    Removes the manifest and the chunks' lock files and markers, once
+    the coordinator has finished waiting for the workers. Workers still
+    running then exit, and workers started for the next run don't
+    mistake this run's chunks for their own.
+    :param tmp: shared work directory
+    :type tmp: str
+    :return:
+    """
+    try:
+        os.remove(os.path.join(tmp, MANIFEST_NAME))
+    except FileNotFoundError:
+        pass
+
+    shutil.rmtree(os.path.join(tmp, LOCK_DIR), ignore_errors=True)
+    shutil.rmtree(os.path.join(tmp, DONE_DIR), ignore_errors=True)
+
+
+def get_query_path(tmp, index):
+    """Path of a chunk's blastp query FASTA file."""
+    return os.path.join(tmp, f"input{index}.fasta")
+
+
+def get_output_path(tmp, index):
+    """Path of a chunk's blastp output file."""
+    return os.path.join(tmp, f"output{index}.tsv")
+
+
+def get_lock_path(tmp, index):
+    """Path of the lock file a worker holds on a chunk."""
+    return os.path.join(tmp, LOCK_DIR, f"{index}.lock")
+
+
+def get_done_path(tmp, index, failed=False):
+    """Path of the marker left once a chunk's search finishes."""
+    if failed:
+        return os.path.join(tmp, DONE_DIR, f"{index}.failed")
+    return os.path.join(tmp, DONE_DIR, f"{index}.done")
+
+
+def get_chunk_status(tmp, index):
+    """
+    Checks whether a chunk has been searched.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param index: chunk index
+    :type index: int
+    :return: "done", "failed", or None if the chunk is unfinished
+    :rtype: str
+    """
+    if os.path.exists(get_done_path(tmp, index)):
+        return "done"
+    if os.path.exists(get_done_path(tmp, index, failed=True)):
+        return "failed"
+    return None
+
+
+def claim_chunk(tmp, index, worker_id, stale_after=STALE_AFTER):
+    """
+    Tries to claim a chunk by creating its lock file. A lock that hasn't
+    been touched for stale_after seconds is removed and claimed again.
+    Results are moved into place atomically, so a chunk that two workers
+    claim is only searched twice, never corrupted.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param index: chunk index
+    :type index: int
+    :param worker_id: name of the claiming worker, stored in the lock
+    :type worker_id: str
+    :param stale_after: seconds after which a lock is abandoned
+    :type stale_after: float
+    :return: whether the chunk was claimed
+    :rtype: bool
+    """
+    lock_path = get_lock_path(tmp, index)
+    for attempt in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                continue
+            if age <= stale_after:
+                return False
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+
+        with os.fdopen(fd, "w") as fh:
+            fh.write(worker_id)
+        return True
+
+    return False
+
+
+def search_chunk(tmp, manifest, index, worker_id, heartbeat=HEARTBEAT):
+    """
+    Runs blastp on a claimed chunk, touching its lock file while the
+    search runs, then marks the chunk as done or failed.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param manifest: work manifest
+    :type manifest: dict
+    :param index: chunk index
+    :type index: int
+    :param worker_id: name of the worker running the search
+    :type worker_id: str
+    :param heartbeat: seconds between touches of the lock file
+    :type heartbeat: float
+    :return: whether the search succeeded
+    :rtype: bool
+    """
+    out_name = get_output_path(tmp, index)
+    part_name = f"{out_name}.{worker_id}.part"
+    db_path = os.path.join(tmp, manifest["Database"])
+
+    status = dict()
+
+    def run():
+        try:
+            status["returncode"] = phameration.run_blastp(
+                                    get_query_path(tmp, index), db_path,
+                                    part_name, manifest["EValue"],
+                                    manifest["QueryCoverage"])
+        except Exception as e:
+            print(f"blastp failed on chunk {index}: {e}")
+            status["returncode"] = None
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    lock_path = get_lock_path(tmp, index)
+    while thread.is_alive():
+        thread.join(heartbeat)
+        try:
+            os.utime(lock_path)
+        except FileNotFoundError:
+            pass
+
+    # Leave no results behind for a run that has since finished
+    if not is_current_run(tmp, manifest):
+        if os.path.exists(part_name):
+            os.remove(part_name)
+        return False
+
+    succeeded = status["returncode"] == 0 and os.path.exists(part_name)
+    if succeeded:
+        os.replace(part_name, out_name)
+    elif os.path.exists(part_name):
+        os.remove(part_name)
+
+    try:
+        with open(get_done_path(tmp, index, failed=not succeeded),
+                  "w") as fh:
+            fh.write(worker_id)
+    except FileNotFoundError:
+        return False
+
+    return succeeded
+
+
+def shard_worker(tmp, worker_id=None, wait=0, poll=POLL_INTERVAL,
+                 stale_after=STALE_AFTER, heartbeat=HEARTBEAT):
+    """
+    Claims and searches chunks listed in the work directory's manifest,
+    from the most to the least costly, until every chunk is finished or
+    the coordinator removes the manifest.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param worker_id: name of this worker; defaults to hostname and pid
+    :type worker_id: str
+    :param wait: seconds to wait for the manifest to be written
+    :type wait: float
+    :param poll: seconds between checks for claimable chunks
+    :type poll: float
+    :param stale_after: seconds after which a lock is abandoned
+    :type stale_after: float
+    :param heartbeat: seconds between touches of a held lock file
+    :type heartbeat: float
+    :return: indices of the chunks searched by this worker
+    :rtype: list
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    manifest = read_manifest(tmp, wait, poll, stale_after)
+    if manifest is None:
+        return []
+
+    searched = []
+    while True:
+        if not is_current_run(tmp, manifest):
+            break
+
+        remaining = [x for x in manifest["Chunks"]
+                     if get_chunk_status(tmp, x) is None]
+        if len(remaining) == 0:
+            break
+
+        # Rescan after each chunk, so the costliest chunks go first
+        claimed = False
+        for index in remaining:
+            if claim_chunk(tmp, index, worker_id, stale_after):
+                claimed = True
+                if search_chunk(tmp, manifest, index, worker_id, heartbeat):
+                    searched.append(index)
+                break
+
+        # Wait on chunks held by other workers, in case they die
+        if not claimed:
+            time.sleep(poll)
+
+    return searched
+
+
+def start_shard_workers(tmp, num_processors):
+    """
+    Starts shard workers in background processes on this machine, so
+    that the coordinator can keep the manifest fresh while they search.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param num_processors: number of worker processes
+    :type num_processors: int
+    :return: worker processes
+    :rtype: list
+    """
+    workers = []
+    for _ in range(num_processors):
+        worker = mp.Process(target=shard_worker, args=(tmp,))
+        worker.start()
+        workers.append(worker)
+
+    return workers
+
+
+def run_shard_workers(tmp, num_processors, wait=0, verbose=True):
+    """
+    Runs shard workers in parallel processes on this machine.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param num_processors: number of worker processes
+    :type num_processors: int
+    :param wait: seconds to wait for the manifest to be written
+    :type wait: float
+    :param verbose: updating progress bar output?
+    :type verbose: bool
+    :return: indices of the chunks searched by these workers
+    :rtype: list
+    """
+    jobs = [(tmp, None, wait) for _ in range(num_processors)]
+    results = parallelize.parallelize(jobs, num_processors, shard_worker,
+                                      verbose=verbose)
+
+    searched = []
+    for result in results:
+        searched.extend(result)
+
+    return searched
+
+
+def wait_for_shards(tmp, manifest, poll=POLL_INTERVAL, timeout=None):
+    """
+    Waits until every chunk in the manifest has been searched, touching
+    the manifest so workers know the run is still being coordinated.
+    Gives up once no worker has shown signs of life for timeout seconds:
+    no chunk has finished, and no lock file has been touched, e.g. because
+    every worker has died or none was ever started.
+    :param tmp: shared work directory
+    :type tmp: str
+    :param manifest: work manifest
+    :type manifest: dict
+    :param poll: seconds between checks
+    :type poll: float
+    :param timeout: seconds without worker activity before giving up, or
+    None to wait on
+    :type timeout: float
+    :return: indices of failed chunks, and of unfinished chunks
+    :rtype: list, list
+    """
+    manifest_path = os.path.join(tmp, MANIFEST_NAME)
+    last_count = None
+    last_activity = time.time()
+    while True:
+        os.utime(manifest_path)
+
+        statuses = {x: get_chunk_status(tmp, x) for x in manifest["Chunks"]}
+        unfinished = [x for x, status in statuses.items() if status is None]
+        failed = [x for x, status in statuses.items() if status == "failed"]
+
+        count = len(statuses) - len(unfinished)
+        if count != last_count:
+            print(f"{count}/{len(statuses)} blastp chunks finished")
+            last_count = count
+            last_activity = time.time()
+
+        if len(unfinished) == 0:
+            break
+
+        # Workers touch the locks of the chunks they are searching
+        for index in unfinished:
+            try:
+                touched = os.path.getmtime(get_lock_path(tmp, index))
+            except FileNotFoundError:
+                continue
+            last_activity = max(last_activity, touched)
+
+        if timeout is not None and time.time() - last_activity >= timeout:
+            break
+        time.sleep(poll)
+
+    return failed, unfinished
@@ -1,4 +1,5 @@
 import csv
+import math
 import os
 import textwrap
 from pathlib import Path
@@ -7,13 +8,17 @@ from Bio import SeqIO
 from Bio.SeqFeature import CompoundLocation
 
 from pdm_utils.classes.fileio import FeatureTableParser
-from pdm_utils.functions import multithread
+from pdm_utils.functions import basic, parallelize
 
 # GLOBAL VARIABLES
 # -----------------------------------------------------------------------------
 TBL_EXCLUDED_QUALIFIERS = ["translation"]
 TBL_SPECIAL_QUALIFIERS = ["ribosomal_slippage"]
 
+# Number of chunks of files handed to each process when writing files in
+# parallel, so that processes given quickly-written files are not left idle.
+WRITE_CHUNKS_PER_PROCESS = 4
+
 
 # READING FUNCTIONS
 # -----------------------------------------------------------------------------
@@ -180,8 +185,8 @@ def write_database(alchemist, version, export_path, db_name=None):
     version_path.write_text(f"{version}")
 
 
-def write_seqrecord(seqrecord, file_path, file_format):
-    file_handle = file_path.open(mode="w")
+def write_seqrecord(seqrecord, file_path, file_format, mode="w"):
+    file_handle = file_path.open(mode=mode)
 
     if isinstance(seqrecord, list):
         for record in seqrecord:
@@ -193,83 +198,102 @@ def write_seqrecord(seqrecord, file_path, file_format):
     file_handle.close()
 
 
-def write_feature_table(seqrecord_list, export_path, verbose=False):
+def write_feature_table(seqrecord_list, export_path, threads=1,
+                        verbose=False):
     """Outputs files as five_column tab-delimited text files.
 
     :param seq_record_list: List of populated SeqRecords.
     :type seq_record_list: list[SeqRecord]
     :param export_path: Path to a dir for file creation.
     :type export_path: Path
+    :param threads: Number of processes to write files with.
+    :type threads: int
     :param verbose: A boolean value to toggle progress print statements.
     :type verbose: bool
+    :returns: List of tuples containing each file path and any write error.
+    :rtype: list[tuple]
     """
     if verbose:
         print("Writing selected data to files...")
+
+    work_items = []
     for record in seqrecord_list:
-        if verbose:
-            print(f"...Writing {record.name}...")
         file_name = f"{record.name}.tbl"
         file_path = export_path.joinpath(file_name)
-        file_handle = file_path.open(mode='w')
-
-        accession = record.id
-        version = record.annotations.get("sequence_version")
-        if version:
-            accession = ".".join([accession, version])
-
-        prefix = record.annotations.get("tbl_prefix")
-        if not prefix:
-            prefix = ""
-
-        file_handle.write(f">Feature {prefix}|{accession}|\n")
-
-        for feature in record.features:
-            location = feature.location
-            if isinstance(feature.location, CompoundLocation):
-                location = feature.location.parts[0]
-
-            if feature.strand == 1:
-                start = location.start + 1
-                stop = location.end
-            elif feature.strand == -1:
-                start = location.end
-                stop = location.start + 1
+        work_items.append((record, file_path))
 
-            file_handle.write(f"{start}\t{stop}\t{feature.type}\n")
+    return write_files(work_items, write_feature_table_record,
+                       threads=threads, verbose=verbose)
 
-            if isinstance(feature.location, CompoundLocation):
-                if len(feature.location.parts) > 1:
-                    for location in feature.location.parts[1:]:
-                        if feature.strand == 1:
-                            start = location.start + 1
-                            stop = location.end
-                        elif feature.strand == -1:
-                            start = location.end
-                            stop = location.start + 1
 
-                        file_handle.write(f"{start}\t{stop}\n")
+def write_feature_table_record(record, file_path):
+    """Outputs a SeqRecord as a five_column tab-delimited text file.
 
-            for key in feature.qualifiers.keys():
-                if key in TBL_EXCLUDED_QUALIFIERS:
-                    continue
-                elif key in TBL_SPECIAL_QUALIFIERS:
-                    file_handle.write(f"\t\t\t{key}\n")
-                    continue
-
-                qualifier_values = feature.qualifiers[key]
-                for value in qualifier_values:
-                    file_handle.write(f"\t\t\t{key}\t{value}\n")
-
-        file_handle.write("\n")
-        file_handle.close()
+    :param record: A populated SeqRecord.
+    :type record: SeqRecord
+    :param file_path: Path to the file to create.
+    :type file_path: Path
+    """
+    file_handle = file_path.open(mode='w')
+
+    accession = record.id
+    version = record.annotations.get("sequence_version")
+    if version:
+        accession = ".".join([accession, version])
+
+    prefix = record.annotations.get("tbl_prefix")
+    if not prefix:
+        prefix = ""
+
+    file_handle.write(f">Feature {prefix}|{accession}|\n")
+
+    for feature in record.features:
+        location = feature.location
+        if isinstance(feature.location, CompoundLocation):
+            location = feature.location.parts[0]
+
+        if feature.strand == 1:
+            start = location.start + 1
+            stop = location.end
+        elif feature.strand == -1:
+            start = location.end
+            stop = location.start + 1
+
+        file_handle.write(f"{start}\t{stop}\t{feature.type}\n")
+
+        if isinstance(feature.location, CompoundLocation):
+            if len(feature.location.parts) > 1:
+                for location in feature.location.parts[1:]:
+                    if feature.strand == 1:
+                        start = location.start + 1
+                        stop = location.end
+                    elif feature.strand == -1:
+                        start = location.end
+                        stop = location.start + 1
+
+                    file_handle.write(f"{start}\t{stop}\n")
+
+        for key in feature.qualifiers.keys():
+            if key in TBL_EXCLUDED_QUALIFIERS:
+                continue
+            elif key in TBL_SPECIAL_QUALIFIERS:
+                file_handle.write(f"\t\t\t{key}\n")
+                continue
+
+            qualifier_values = feature.qualifiers[key]
+            for value in qualifier_values:
+                file_handle.write(f"\t\t\t{key}\t{value}\n")
+
+    file_handle.write("\n")
+    file_handle.close()
 
 
-# MULTITHREAD WRAPPERS
+# PARALLEL WRAPPERS
 # -----------------------------------------------------------------------------
 
 def write_seqrecords(seqrecord_list, file_format, export_path,
                      export_name=None, concatenate=False, threads=1,
-                     verbose=False):
+                     verbose=False, append=False):
     """Outputs files with a particuar format from a SeqRecord list.
 
     :param seq_record_list: List of populated SeqRecords.
@@ -282,7 +306,13 @@ def write_seqrecords(seqrecord_list, file_format, export_path,
     :type concaternate: bool
     :param verbose: A boolean value to toggle progress print statements.
     :type verbose: bool
+    :param append: A boolean to toggle appending to existing files.
+    :type append: bool
     """
+    mode = "w"
+    if append:
+        mode = "a"
+
     record_dictionary = {}
     if concatenate:
         if export_name is None:
@@ -301,6 +331,70 @@ def write_seqrecords(seqrecord_list, file_format, export_path,
         file_name = f"{record_name}.{file_format}"
         file_path = export_path.joinpath(file_name)
 
-        work_items.append((records, file_path, file_format))
-    multithread.multithread(work_items, threads, write_seqrecord,
-                            verbose=verbose)
+        work_items.append((records, file_path, file_format, mode))
+
+    return write_files(work_items, write_seqrecord, threads=threads,
+                       verbose=verbose)
+
+
+def write_files(work_items, target, threads=1, verbose=False):
+    """Runs file writing work items, in parallel processes if requested.
+
+    Formatting SeqRecords is CPU-bound, so work items are split into
+    chunks that are handed to separate processes rather than threads.
+
+    :param work_items: Tuples of target function args, each with the path
+                       of the file to write as its second item.
+    :type work_items: list[tuple]
+    :param target: Function that writes one file.
+    :type target: Function
+    :param threads: Number of processes to write files with.
+    :type threads: int
+    :param verbose: A boolean value to toggle progress print statements.
+    :type verbose: bool
+    :returns: List of tuples containing each file path and any write error.
+    :rtype: list[tuple]
+    """
+    if threads > 1 and len(work_items) > 1:
+        num_chunks = min(len(work_items), threads * WRITE_CHUNKS_PER_PROCESS)
+        chunk_size = math.ceil(len(work_items) / num_chunks)
+        chunks = [(target, chunk) for chunk in
+                  basic.partition_list(work_items, chunk_size)]
+
+        chunk_results = parallelize.parallelize(chunks, threads,
+                                                write_file_chunk,
+                                                verbose=verbose)
+        results = []
+        for chunk_result in chunk_results:
+            results.extend(chunk_result)
+    else:
+        results = write_file_chunk(target, work_items)
+
+    for file_path, error in results:
+        if error is not None:
+            print(f"Unable to write '{file_path}': {error}")
+
+    return results
+
+
+def write_file_chunk(target, work_items):
+    """Runs a chunk of file writing work items, recording any errors.
+
+    :param target: Function that writes one file.
+    :type target: Function
+    :param work_items: Tuples of target function args.
+    :type work_items: list[tuple]
+    :returns: List of tuples containing each file path and any write error.
+    :rtype: list[tuple]
+    """
+    results = []
+    for work_item in work_items:
+        error = None
+        try:
+            target(*work_item)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        results.append((work_item[1], error))
+
+    return results
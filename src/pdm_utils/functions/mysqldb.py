@@ -423,22 +423,25 @@ def parse_genome_data(engine, phage_id_list=None, phage_query=None,
         to retrieve data from the phage table.
     :type phage_query: str
     :param gene_query:
-        This parameter is passed directly to the 'parse_feature_data' function
-        to retrieve data from the gene table.
+        This parameter is passed directly to the
+        'parse_grouped_feature_data' function to retrieve data from the
+        gene table for all genomes at once.
         If not None, pdm_utils Cds objects for all of the phage's
         CDS features in the gene table will be constructed
         and added to the Genome object.
     :type gene_query: str
     :param trna_query:
-        This parameter is passed directly to the 'parse_feature_data' function
-        to retrieve data from the trna table.
+        This parameter is passed directly to the
+        'parse_grouped_feature_data' function to retrieve data from the
+        trna table for all genomes at once.
         If not None, pdm_utils Trna objects for all of the phage's
         tRNA features in the trna table will be constructed
         and added to the Genome object.
     :type trna_query: str
     :param tmrna_query:
-        This parameter is passed directly to the 'parse_feature_data' function
-        to retrieve data from the tmrna table.
+        This parameter is passed directly to the
+        'parse_grouped_feature_data' function to retrieve data from the
+        tmrna table for all genomes at once.
         If not None, pdm_utils Tmrna objects for all of the phage's
         tmRNA features in the tmrna table will be constructed
         and added to the Genome object.
@@ -462,36 +465,84 @@ def parse_genome_data(engine, phage_id_list=None, phage_query=None,
                                                query=phage_query)
     for data_dict in result_list1:
         gnm = parse_phage_table_data(data_dict, gnm_type=gnm_type)
+        genome_list.append(gnm)
 
-        if gene_query is not None:
-            cds_list = parse_feature_data(engine, "cds", column=COLUMN,
-                                          phage_id_list=[gnm.id],
-                                          query=gene_query)
+    if len(genome_list) == 0:
+        return genome_list
 
-            for x in range(len(cds_list)):
-                cds_list[x].genome_length = gnm.length
-            gnm.cds_features = cds_list
+    # Features are retrieved for all genomes at once. Without a list of
+    # PhageIDs every genome was retrieved, so the feature queries do not
+    # need to be conditioned either.
+    if phage_id_list is None or len(phage_id_list) == 0:
+        feature_id_list = None
+    else:
+        feature_id_list = [gnm.id for gnm in genome_list]
+
+    feature_queries = [("cds", gene_query, "cds_features"),
+                       ("trna", trna_query, "trna_features"),
+                       ("tmrna", tmrna_query, "tmrna_features")]
+    for ftr_type, query, attr in feature_queries:
+        if query is None:
+            continue
+
+        ftr_groups = parse_grouped_feature_data(
+                                    engine, ftr_type, column=COLUMN,
+                                    phage_id_list=feature_id_list,
+                                    query=query)
+        for gnm in genome_list:
+            ftr_list = ftr_groups.get(gnm.id.lower(), [])
+            for ftr in ftr_list:
+                ftr.genome_length = gnm.length
+            setattr(gnm, attr, ftr_list)
 
-        if trna_query is not None:
-            trna_list = parse_feature_data(engine, "trna", column=COLUMN,
-                                          phage_id_list=[gnm.id],
-                                          query=trna_query)
+    return genome_list
 
-            for x in range(len(trna_list)):
-                trna_list[x].genome_length = gnm.length
-            gnm.trna_features = trna_list
 
-        if tmrna_query is not None:
-            tmrna_list = parse_feature_data(engine, "tmrna", column=COLUMN,
-                                          phage_id_list=[gnm.id],
-                                          query=tmrna_query)
+def parse_grouped_feature_data(engine, ftr_type, column="PhageID",
+                               phage_id_list=None, query=None, limit=8000):
+    """Returns features parsed from a MySQL database, grouped by genome.
 
-            for x in range(len(tmrna_list)):
-                tmrna_list[x].genome_length = gnm.length
-            gnm.tmrna_features = tmrna_list
+    The features of all genomes are retrieved with one query for every
+    chunk of PhageIDs, instead of one query per genome.
 
-        genome_list.append(gnm)
-    return genome_list
+    :param engine:
+        This parameter is passed directly to the 'retrieve_data' function.
+    :type engine: Engine
+    :param ftr_type:
+        Indicates the type of features retrieved.
+    :type ftr_type: str
+    :param column:
+        This parameter is passed directly to the 'retrieve_data' function.
+    :type column: str
+    :param phage_id_list:
+        List of PhageIDs upon which the query is conditioned.
+        If None, or an empty list, features of all genomes are retrieved.
+    :type phage_id_list: list
+    :param query:
+        This parameter is passed directly to the 'retrieve_data' function.
+        It must select the PhageID column.
+    :type query: str
+    :param limit: Maximum number of PhageIDs in each query.
+    :type limit: int
+    :returns:
+        Dictionary where key = lowercase PhageID and value = list of
+        pdm_utils feature objects.
+    :rtype: dict
+    """
+    if phage_id_list is None or len(phage_id_list) == 0:
+        chunks = [None]
+    else:
+        chunks = basic.partition_list(list(phage_id_list), limit)
+
+    ftr_groups = {}
+    for chunk in chunks:
+        ftrs = parse_feature_data(engine, ftr_type, column=column,
+                                  phage_id_list=chunk, query=query)
+        for ftr in ftrs:
+            # MySQL compares PhageIDs case-insensitively.
+            ftr_groups.setdefault(ftr.genome_id.lower(), []).append(ftr)
+
+    return ftr_groups
 
 
 def create_seq_set(engine):
@@ -827,7 +878,7 @@ def check_schema_compatibility(engine, pipeline, code_version=None):
 # Handles exceptions similar to find_domains pipeline.
 # Copied and modeled from MySQLConnectionHandler.execute_transaction,
 # but simplified since Engine does the work of connecting to the database.
-def execute_transaction(engine, statement_list=[]):
+def execute_transaction(engine, statement_list=[], rowcounts=None):
     """Execute list of MySQL statements within a single defined transaction.
 
     :param engine:
@@ -835,7 +886,13 @@ def execute_transaction(engine, statement_list=[]):
     :type engine: Engine
     :param statement_list:
         a list of any number of MySQL statements with
-        no expectation that anything will return
+        no expectation that anything will return. Items may also be
+        2-tuples of a parameterized statement and a list of parameter
+        tuples, which are executed in bulk with executemany().
+    :param rowcounts:
+        a list to which the number of rows matched by each executed
+        statement is appended.
+    :type rowcounts: list
     :returns:
         tuple (result, message)
         WHERE
@@ -848,7 +905,15 @@ def execute_transaction(engine, statement_list=[]):
     trans = connection.begin()
     try:
         for statement in statement_list:
-            connection.execute(statement)
+            if isinstance(statement, tuple):
+                statement, parameters = statement
+                if len(parameters) == 0:
+                    continue
+                result = connection.execute(statement, parameters)
+            else:
+                result = connection.execute(statement)
+            if rowcounts is not None:
+                rowcounts.append(result.rowcount)
         trans.commit()
 
     except sqlalchemy.exc.DBAPIError as err:
@@ -254,6 +254,32 @@ def query_dict_list(engine, query):
         result_dict_list.append(row_as_dict)
     return result_dict_list
 
+def query_iter(engine, query, size=10000):
+    """Stream the results of a MySQL query with a server-side cursor.
+
+    Rows are fetched from the server in batches, so the full result set
+    is never held in memory at once.
+
+    :param engine: SQLAlchemy Engine object able to connect to a MySQL database.
+    :type engine: Engine
+    :param query: MySQL query statement.
+    :type query: str
+    :param size: Number of rows to fetch from the server at a time.
+    :type size: int
+    :returns: Generator of rows, which can be indexed like tuples.
+    :rtype: generator
+    """
+    with engine.connect() as connection:
+        proxy = connection.execution_options(stream_results=True)\
+                          .execute(query)
+        while True:
+            rows = proxy.fetchmany(size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        proxy.close()
+
 def retrieve_data(engine, column=None, query=None, id_list=None):
     """Retrieve genome data from a MySQL database for a single genome.
 
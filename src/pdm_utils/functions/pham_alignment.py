@@ -1,5 +1,9 @@
+import hashlib
+import json
+import os
 import shlex
 import shutil
+import time
 from subprocess import (Popen, DEVNULL)
 
 from pdm_utils.functions import (fileio, multithread, parallelize)
@@ -202,16 +206,49 @@ def reintroduce_pham_fasta_duplicates(pham_path_map, pham_translations_dict,
 # Parallelized all-encompassing function that combines the functionality
 # of the above functions
 def write_phams(fasta_dir, aln_dir, phams_translations_dict, cores=1,
-                verbose=False):
+                verbose=False, cache_dir=None):
+    """Writes fasta-formatted multiple sequence files and alignments for all
+    of the phams listed, using multiple processes.
+
+    If a cache directory is given, alignments of phams whose unique
+    translations have not changed since they were cached are reused,
+    and only new or changed phams are aligned.
+
+    :param fasta_dir: Path to the directory where fasta files will be written
+    :type fasta_dir: pathlib.Path
+    :param aln_dir: Path to the directory where aln files will be written
+    :type aln_dir: pathlib.Path
+    :param phams_translations_dict: Map of phams to translations to geneids
+    :type phams_translations_dict: dict{dict}
+    :param cores: Number of processes to spawn during alignment
+    :type cores: int
+    :param verbose: A boolean value to toggle progress print statements.
+    :type verbose: bool
+    :param cache_dir: Path to a directory of previously computed alignments
+    :type cache_dir: pathlib.Path
+    :return: Dictionary summarizing the number of aligned and reused phams
+    :rtype: dict
+    """
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
     work_items = []
     for pham, pham_translations in phams_translations_dict.items():
-        work_items.append((fasta_dir, aln_dir, pham, pham_translations))
+        work_items.append((fasta_dir, aln_dir, pham, pham_translations,
+                           cache_dir))
+
+    results = parallelize.parallelize(work_items, cores, write_phams_process,
+                                      verbose=verbose)
+
+    summary = summarize_alignments(results)
+    if cache_dir is not None:
+        print_alignment_summary(summary)
 
-    parallelize.parallelize(work_items, cores, write_phams_process,
-                            verbose=verbose)
+    return summary
 
 
-def write_phams_process(fasta_dir, aln_dir, pham, pham_translations):
+def write_phams_process(fasta_dir, aln_dir, pham, pham_translations,
+                        cache_dir=None):
     fasta_path = fasta_dir.joinpath("".join([str(pham), "_genes.fasta"]))
     aln_path = aln_dir.joinpath("".join([str(pham), "_genes.aln"]))
 
@@ -221,8 +258,113 @@ def write_phams_process(fasta_dir, aln_dir, pham, pham_translations):
 
     fileio.write_fasta(gs_to_ts, fasta_path)
 
+    result = (None, 0)
     if len(pham_translations) > 1:
-        run_clustalo(fasta_path, aln_path)
+        if cache_dir is None:
+            run_clustalo(fasta_path, aln_path)
+        else:
+            result = align_with_cache(fasta_path, aln_path, pham_translations,
+                                      cache_dir)
+
         fileio.reintroduce_fasta_duplicates(pham_translations, aln_path)
 
     fileio.reintroduce_fasta_duplicates(pham_translations, fasta_path)
+
+    return result
+
+
+# ALIGNMENT CACHE FUNCTIONS
+def hash_pham_translations(pham_translations):
+    """Computes the content address of the unique translations of a pham.
+
+    :param pham_translations: Dictionary that maps translations to geneids
+    :type pham_translations: dict
+    :return: Returns a hex digest of the sorted unique translations
+    :rtype: str
+    """
+    translations = "\n".join(sorted(pham_translations.keys()))
+    return hashlib.sha256(translations.encode("utf-8")).hexdigest()
+
+
+def align_with_cache(fasta_path, aln_path, pham_translations, cache_dir):
+    """Copies a cached alignment of a pham's unique translations, or aligns
+    them with Clustal Omega and caches the alignment.
+
+    Cached alignments are matched to genes through their ungapped
+    sequences, so they remain valid when gene names or products change.
+
+    :param fasta_path: Path to a fasta file containing sequences to be aligned
+    :type fasta_path: Path
+    :param aln_path: The desired path to the aligned sequences file
+    :type aln_path: Path
+    :param pham_translations: Dictionary that maps translations to geneids
+    :type pham_translations: dict
+    :param cache_dir: Path to a directory of previously computed alignments
+    :type cache_dir: Path
+    :return: Returns whether the cache was hit and the alignment seconds
+    :rtype: tuple
+    """
+    key = hash_pham_translations(pham_translations)
+    cached_aln = cache_dir.joinpath(f"{key}.aln")
+    cached_info = cache_dir.joinpath(f"{key}.json")
+
+    if cached_aln.is_file() and cached_info.is_file():
+        with cached_info.open(mode="r") as filehandle:
+            seconds = json.load(filehandle)["Seconds"]
+        shutil.copyfile(cached_aln, aln_path)
+        return ("hit", seconds)
+
+    start = time.perf_counter()
+    run_clustalo(fasta_path, aln_path)
+    seconds = time.perf_counter() - start
+
+    if aln_path.is_file():
+        # Written under temporary names and moved into place, so an
+        # interrupted run never leaves a partial cache entry behind
+        temp_aln = cache_dir.joinpath(f"{key}.aln.{os.getpid()}")
+        temp_info = cache_dir.joinpath(f"{key}.json.{os.getpid()}")
+        shutil.copyfile(aln_path, temp_aln)
+        with temp_info.open(mode="w") as filehandle:
+            json.dump({"Seconds": seconds}, filehandle)
+        os.replace(temp_aln, cached_aln)
+        os.replace(temp_info, cached_info)
+
+    return ("miss", seconds)
+
+
+def summarize_alignments(results):
+    """Summarizes the alignment cache use of a write_phams run.
+
+    :param results: Tuples of cache status and alignment seconds per pham
+    :type results: list[tuple]
+    :return: Returns the number of cache hits and misses and the time saved
+    :rtype: dict
+    """
+    summary = {"hits": 0, "misses": 0, "seconds_saved": 0,
+               "seconds_aligning": 0}
+    for status, seconds in results:
+        if status == "hit":
+            summary["hits"] += 1
+            summary["seconds_saved"] += seconds
+        elif status == "miss":
+            summary["misses"] += 1
+            summary["seconds_aligning"] += seconds
+
+    return summary
+
+
+def print_alignment_summary(summary):
+    """Prints the alignment cache hit rate and time saved.
+
+    :param summary: Dictionary summarizing the alignment cache use
+    :type summary: dict
+    """
+    total = summary["hits"] + summary["misses"]
+    hit_rate = 0
+    if total > 0:
+        hit_rate = summary["hits"] / total * 100
+
+    print(f"Alignment cache: reused {summary['hits']} of {total} "
+          f"alignments ({hit_rate:.1f}%), aligned {summary['misses']} "
+          f"in {summary['seconds_aligning']:.1f}s, saved about "
+          f"{summary['seconds_saved']:.1f}s of alignment time.")
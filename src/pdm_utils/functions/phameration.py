@@ -1,13 +1,20 @@
 """Functions that are used in the phameration pipeline"""
 
+from array import array
 import shlex
 from subprocess import Popen, PIPE
 import random
 import colorsys
+import heapq
+import math
+import sys
 
 from pdm_utils.functions import mysqldb
 from pdm_utils.functions import mysqldb_basic
 
+# Pruning defaults of 'mcl' (-P 4000 -S 500), used by sparse_markov_cluster
+MCL_PRUNE = 1 / 4000
+MCL_SELECT = 500
 
 # DATABASE FUNCTIONS
 def get_pham_geneids(engine):
@@ -116,6 +123,49 @@ def get_translation_groups(engine):
     return ts_to_gs
 
 
+def load_gene_data(engine):
+    """
+    Streams the gene table once, building all of the gene data needed
+    for phameration in a single pass: GeneIDs to translations,
+    translations to GeneIDs, existing phams to GeneIDs, and the set of
+    unphamerated GeneIDs. GeneIDs are interned so that each one is
+    stored once no matter how many mappings refer to it.
+    :param engine: the Engine allowing access to the database
+    :return: gs_to_ts, ts_to_gs, pham_geneids, new_geneids
+    """
+    gs_to_ts = dict()
+    ts_to_gs = dict()
+    pham_geneids = dict()
+    new_geneids = set()
+
+    query = ("SELECT GeneID, PhamID, CONVERT(Translation USING utf8) "
+             "FROM gene")
+
+    for geneid, pham_id, translation in mysqldb_basic.query_iter(engine,
+                                                                 query):
+        geneid = sys.intern(geneid)
+
+        # Share a single copy of each unique translation
+        geneids = ts_to_gs.get(translation)
+        if geneids is None:
+            geneids = ts_to_gs[translation] = [geneid]
+        else:
+            translation = gs_to_ts[geneids[0]]
+            geneids.append(geneid)
+        gs_to_ts[geneid] = translation
+
+        if pham_id is None:
+            new_geneids.add(geneid)
+        else:
+            pham = pham_geneids.get(pham_id)
+            if pham is None:
+                pham_geneids[pham_id] = {geneid}
+            else:
+                pham.add(geneid)
+
+    return gs_to_ts, ts_to_gs, pham_geneids, new_geneids
+
+
 def update_pham_table(colors, engine):
     """
     Populates the pham table with the new PhamIDs and their colors.
@@ -127,28 +177,41 @@ def update_pham_table(colors, engine):
     # First command needs to clear the pham table
     commands = ["DELETE FROM pham"]
 
-    # Then we need to issue insert commands for each pham
-    for key in colors.keys():
-        commands.append(f"INSERT INTO pham (PhamID, Color) VALUES ({key}, "
-                        f"'{colors[key]}')")
+    # Then all phams are inserted in bulk
+    commands.append(("INSERT INTO pham (PhamID, Color) VALUES (%s, %s)",
+                     [(key, color) for key, color in colors.items()]))
 
     mysqldb.execute_transaction(engine, commands)
 
 
 def update_gene_table(phams, engine):
     """
-    Updates the gene table with new pham data
+    Updates the gene table with new pham data. The (GeneID, PhamID)
+    pairs are bulk loaded into a temporary table, and then applied to
+    the gene table with a single joined UPDATE.
     :param phams: new pham gene data
     :type phams: dict
     :param engine: sqlalchemy Engine allowing access to the database
     :return:
     """
-    commands = []
-
-    # We need to issue an update command for each gene in each pham
-    for key in phams.keys():
-        for gene in phams[key]:
-            commands.append(f"UPDATE gene SET PhamID = {key} WHERE GeneID = '{gene}'")
+    assignments = list()
+    for key, pham in phams.items():
+        for gene in pham:
+            assignments.append((gene, key))
+
+    # The temporary table shares the gene table's charset, so the join
+    # can use gene's primary key
+    commands = [
+        "DROP TEMPORARY TABLE IF EXISTS pham_assignment",
+        "CREATE TEMPORARY TABLE pham_assignment ("
+        "GeneID varchar(35) NOT NULL, PhamID int(10) unsigned NOT NULL, "
+        "PRIMARY KEY (GeneID)) DEFAULT CHARSET=latin1",
+        ("INSERT INTO pham_assignment (GeneID, PhamID) VALUES (%s, %s)",
+         assignments),
+        "UPDATE gene INNER JOIN pham_assignment "
+        "ON gene.GeneID = pham_assignment.GeneID "
+        "SET gene.PhamID = pham_assignment.PhamID",
+        "DROP TEMPORARY TABLE pham_assignment"]
 
     mysqldb.execute_transaction(engine, commands)
 
@@ -156,7 +219,8 @@ def update_gene_table(phams, engine):
 def fix_white_phams(engine):
     """
     Find any phams with 2+ members which are colored as though they are
-    orphams (#FFFFFF in pham.Color).
+    orphams (#FFFFFF in pham.Color), and give them all new colors in
+    one bulk statement.
     :param engine: sqlalchemy Engine allowing access to the database
     :return:
     """
@@ -168,7 +232,7 @@ def fix_white_phams(engine):
     results = mysqldb_basic.query_dict_list(engine, query)
     print(f"Found {len(results)} white phams...")
 
-    commands = []
+    new_colors = []
     for dictionary in results:
         pham_id = dictionary["PhamID"]
         h = s = v = 0
@@ -183,8 +247,12 @@ def fix_white_phams(engine):
         hexrgb = "#{:02x}{:02x}{:02x}".format(int(rgb[0]), int(rgb[1]),
                                               int(rgb[2]))
         new_color = hexrgb.upper()
-        commands.append(f"UPDATE pham SET Color = '{new_color}' WHERE "
-                        f"PhamID = '{pham_id}'")
+        new_colors.append((pham_id, new_color))
+
+    # Every PhamID already exists, so this only ever updates colors
+    commands = [("INSERT INTO pham (PhamID, Color) VALUES (%s, %s) "
+                 "ON DUPLICATE KEY UPDATE Color = VALUES(Color)",
+                 new_colors)]
 
     mysqldb.execute_transaction(engine, commands)
 
@@ -192,28 +260,21 @@ def fix_white_phams(engine):
 def fix_colored_orphams(engine):
     """
     Find any single-member phams which are colored as though they are
-    multi-member phams (not #FFFFFF in pham.Color).
+    multi-member phams (not #FFFFFF in pham.Color), and whiten them with
+    a single joined UPDATE.
     :param engine: sqlalchemy Engine allowing access to the database
     :return:
     """
-    query = "SELECT * FROM (SELECT g.PhamID, COUNT(GeneID) AS count, " \
-            "p.Color FROM gene AS g INNER JOIN pham AS p ON g.PhamID " \
-            "=p.PhamID GROUP BY PhamID) AS c WHERE Color != '#FFFFFF' " \
-            "AND count = 1"
+    statement = "UPDATE pham AS p INNER JOIN (SELECT PhamID FROM gene " \
+                "WHERE PhamID IS NOT NULL GROUP BY PhamID " \
+                "HAVING COUNT(GeneID) = 1) AS c ON p.PhamID = c.PhamID " \
+                "SET p.Color = '#FFFFFF' WHERE p.Color != '#FFFFFF'"
 
-    results = mysqldb_basic.query_dict_list(engine, query)
-    print(f"Found {len(results)} non-white orphams...")
-
-    commands = []
-    for dictionary in results:
-        pham_id = dictionary["PhamID"]
-        count = dictionary["count"]
-        color = dictionary["Color"]
-        new_color = "#FFFFFF"
-        commands.append(f"UPDATE pham SET Color = '{new_color}' WHERE "
-                        f"PhamID = '{pham_id}'")
-
-    mysqldb.execute_transaction(engine, commands)
+    rowcounts = []
+    result, msg = mysqldb.execute_transaction(engine, [statement],
+                                              rowcounts=rowcounts)
+    if result == 0:
+        print(f"Found {sum(rowcounts)} non-white orphams...")
 
 
 # FILE I/O FUNCTIONS
@@ -233,51 +294,36 @@ def write_fasta(translation_groups, outfile):
     fasta.close()
 
 
-def parse_mmseqs_output(outfile):
+def parse_mmseqs_clusters(outfile):
     """
-    Parses the indicated MMseqs2 FASTA-like file into a dictionary of
-    integer-named phams.
-    :param outfile: FASTA-like parseable output
+    Parses the indicated MMseqs2 'createtsv' output (cluster
+    representative and member identifiers in the first two columns)
+    into a dictionary of integer-named phams. Phams are named in the
+    order their representatives first appear, and each pham lists its
+    representative first.
+    :param outfile: tab-delimited MMseqs2 cluster output
     :type outfile: str
     :return: phams
     :rtype: dict
     """
-    phams = {}
-    pham_geneids = list()
-    pham_name = 0
-
-    with open(f"{outfile}", "r") as fh:
-        prior = fh.readline()
-        current = fh.readline()
-
-        # While loop to interate until EOF
-        while current:
-            # If current line is a header line
-            if current.startswith(">"):
-                # If the prior line was also a header line
-                if prior.startswith(">"):
-                    # We've reached a new pham block
-                    try:
-                        # We need to remove prior line's geneid before dumping
-                        pham_geneids.pop(-1)
-                    except IndexError:
-                        # This should happen for the first pham dump
-                        pass
-                    phams[pham_name] = pham_geneids
-                    pham_name += 1
-                    pham_geneids = [current.lstrip(">").rstrip()]
-                # Otherwise, we're still in a pham block
-                else:
-                    pham_geneids.append(current.lstrip(">").rstrip())
-            # If the current line is a translation line
-            else:
-                # We don't care about it - do nothing and move on
-                pass
-            prior, current = current, fh.readline()
-        # Need to dump the last pham into the dictionary
-        phams[pham_name] = pham_geneids
-    # Pham 0 is a placeholder
-    phams.pop(0)
+    phams = dict()
+    rep_names = dict()
+
+    with open(outfile, "r") as fh:
+        for line in fh:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 2:
+                continue
+            rep, member = fields[0], fields[1]
+
+            pham_name = rep_names.get(rep)
+            if pham_name is None:
+                pham_name = len(rep_names) + 1
+                rep_names[rep] = pham_name
+                phams[pham_name] = [rep]
+
+            if member != rep:
+                phams[pham_name].append(member)
 
     return phams
 
@@ -298,16 +344,76 @@ def parse_mcl_output(outfile):
             counter += 1
             pham = line.rstrip().split()
             for i in range(len(pham)):
-                gene = pham[i]
-                if "|" in gene:
-                    gene = gene.split("|")
-                    gene = "_".join(gene[1:])
-                pham[i] = gene
+                pham[i] = parse_sequence_name(pham[i])
             phams[counter] = pham
 
     return phams
 
 
+def parse_sequence_name(name):
+    """
+    Recover a geneid from a sequence name reported by blastp or mcl,
+    which may be prefixed with a database tag (e.g. 'lcl|Trixie_CDS_1').
+    :param name: sequence name
+    :type name: str
+    :return: geneid
+    :rtype: str
+    """
+    if "|" in name:
+        name = "_".join(name.split("|")[1:])
+    return name
+
+
+def parse_mmseqs_hits(outfile):
+    """
+    Parses the indicated MMseqs2 'convertalis' output (query and target
+    identifiers in the first two columns) into a dictionary mapping each
+    query to the set of targets it hit.
+    :param outfile: tab-delimited MMseqs2 alignment output
+    :type outfile: str
+    :return: hits
+    :rtype: dict
+    """
+    hits = dict()
+
+    with open(outfile, "r") as fh:
+        for line in fh:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 2:
+                continue
+            query, target = fields[0], fields[1]
+            targets = hits.get(query, set())
+            targets.add(target)
+            hits[query] = targets
+
+    return hits
+
+
+def parse_mmseqs_headers(database):
+    """
+    Parses the header database of the indicated MMseqs2 database into a
+    dictionary mapping each entry's key to the identifier in its header.
+    :param database: MMseqs2 database
+    :type database: str
+    :return: headers
+    :rtype: dict
+    """
+    with open(f"{database}_h", "rb") as fh:
+        data = fh.read()
+
+    headers = dict()
+    with open(f"{database}_h.index", "r") as fh:
+        for line in fh:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            key, offset, length = fields[0], int(fields[1]), int(fields[2])
+            header = data[offset:offset + length].rstrip(b"\x00\n")
+            headers[key] = header.decode("utf-8").split(" ")[0]
+
+    return headers
+
+
 # PHAM MANIPULATION FUNCTIONS
 def merge_pre_and_hmm_phams(hmm_phams, pre_phams, consensus_lookup):
     """
@@ -338,6 +444,93 @@ def merge_pre_and_hmm_phams(hmm_phams, pre_phams, consensus_lookup):
     return phams
 
 
+def get_kept_profile_keys(headers, gene_index, affected):
+    """
+    Gets the keys of the saved pham profiles that are still current:
+    those whose representative gene belongs to a pham that is not being
+    re-clustered. Profiles of re-clustered phams are replaced by the
+    profiles built when they are re-clustered.
+    :param headers: saved profile keys and their representative genes
+    :type headers: dict
+    :param gene_index: the dictionary that maps genes to their phams
+    :type gene_index: dict
+    :param affected: phams that are being re-clustered
+    :type affected: set
+    :return: keys
+    :rtype: list
+    """
+    keys = list()
+    for key, geneid in headers.items():
+        pham = gene_index.get(geneid)
+        if pham is not None and pham not in affected:
+            keys.append(key)
+
+    return keys
+
+
+def get_new_translations(translation_groups, new_genes):
+    """
+    Finds the translations that are only found in previously
+    unphamerated genes. Translations shared with an already phamerated
+    gene do not need to be searched - they inherit that gene's pham.
+    :param translation_groups: the dictionary that maps translations
+    to the GeneIDs that share them
+    :type translation_groups: dict
+    :param new_genes: the set of previously unphamerated genes
+    :type new_genes: set
+    :return: new_translations
+    :rtype: list
+    """
+    new_translations = list()
+
+    for translation, geneids in translation_groups.items():
+        if all(geneid in new_genes for geneid in geneids):
+            new_translations.append(translation)
+
+    return new_translations
+
+
+def assign_new_translations(queries, hits, gene_index):
+    """
+    Assigns new sequences to existing phams using their hits to pham
+    profiles. Queries that hit profiles from exactly one pham join that
+    pham; queries that hit profiles from several phams mark all of them
+    as affected; queries without usable hits are left unassigned.
+    :param queries: GeneIDs of the new sequences that were searched
+    :type queries: list
+    :param hits: the dictionary that maps queries to the profile
+    representative GeneIDs they hit
+    :type hits: dict
+    :param gene_index: the dictionary that maps GeneIDs to their pham
+    :type gene_index: dict
+    :return: assignments, affected, unassigned
+    :rtype: dict, set, list
+    """
+    assignments = dict()
+    affected = set()
+    unassigned = list()
+
+    for query in queries:
+        phams = set()
+        for target in hits.get(query, set()):
+            pham = gene_index.get(target)
+            # Profile representatives may have been deleted since
+            if pham is not None:
+                phams.add(pham)
+
+        if len(phams) == 1:
+            pham = phams.pop()
+            geneids = assignments.get(pham, list())
+            geneids.append(query)
+            assignments[pham] = geneids
+        else:
+            if len(phams) > 1:
+                affected.update(phams)
+            unassigned.append(query)
+
+    return assignments, affected, unassigned
+
+
 def reintroduce_duplicates(new_phams, trans_groups, genes_and_trans):
     """
     Reintroduces into each pham ALL GeneIDs that map onto the set of
@@ -362,10 +555,34 @@ def reintroduce_duplicates(new_phams, trans_groups, genes_and_trans):
     return new_phams
 
 
+def index_pham_genes(phams):
+    """
+    Builds an inverted index that maps each GeneID to the name of the
+    pham it belongs to, and each pham name to its position in the
+    input dictionary.
+    :param phams: the dictionary that maps phams to their genes
+    :type phams: dict
+    :return: gene_index, pham_order
+    :rtype: dict, dict
+    """
+    gene_index = dict()
+    pham_order = dict()
+
+    for position, (key, pham) in enumerate(phams.items()):
+        pham_order[key] = position
+        for geneid in pham:
+            # Phams are disjoint, but keep the earliest pham just in case
+            gene_index.setdefault(geneid, key)
+
+    return gene_index, pham_order
+
+
 def preserve_phams(old_phams, new_phams, old_colors, new_genes):
     """
     Attempts to keep pham numbers consistent from one round of pham
-    building to the next
+    building to the next.  Each old pham is only compared against the
+    new phams that share at least one gene with it, found through a
+    GeneID -> new pham index.
     :param old_phams: the dictionary that maps old phams to their genes
     :param new_phams: the dictionary that maps new phams to their genes
     :param old_colors: the dictionary that maps old phams to colors
@@ -375,56 +592,54 @@ def preserve_phams(old_phams, new_phams, old_colors, new_genes):
     final_phams = dict()
     final_colors = dict()
 
-    outcount = 0
-    total = len(old_phams)
     new_phams_copy = new_phams.copy()
+    gene_index, pham_order = index_pham_genes(new_phams)
 
-    # Iterate through old and new phams
-    for old_key in old_phams.keys():
-        outcount += 1
-        # print("Pham Name Conservation: {} / {}".format(outcount, total))
-
-        old_pham = old_phams[old_key]
-
+    # Iterate through old phams, comparing each one to the first
+    # remaining new pham (in new_phams order) it overlaps with
+    for old_key, old_pham in old_phams.items():
         if old_key in final_phams.keys():
             continue
 
-        for new_key in new_phams_copy.keys():
-            new_pham = new_phams_copy[new_key]
+        candidates = set()
+        for geneid in old_pham:
+            new_key = gene_index.get(geneid)
+            if new_key is not None and new_key in new_phams_copy:
+                candidates.add(new_key)
 
-            if old_pham & new_pham == set():
-                continue
+        if len(candidates) == 0:
+            continue
 
-            # Case 1 + 5 (Identity and Subtraction)
-            if old_pham == new_pham:
-                final_phams[old_key] = new_pham
-                final_colors[old_key] = old_colors[old_key]
-                new_phams_copy.pop(new_key)
-                break
+        new_key = min(candidates, key=pham_order.get)
+        new_pham = new_phams_copy[new_key]
 
-            # Case 2 and 4 (Addition and Join) - PHAM GREW
-            elif new_pham - old_pham != set():
+        # Case 1 + 5 (Identity and Subtraction)
+        if old_pham == new_pham:
+            final_phams[old_key] = new_pham
+            final_colors[old_key] = old_colors[old_key]
+            new_phams_copy.pop(new_key)
 
-                # Case 2 and 4 (Addition and Join)
-                if new_pham & new_genes != set():
+        # Case 2 and 4 (Addition and Join) - PHAM GREW
+        elif new_pham - old_pham != set():
 
-                    # Case 4 - Join with new gene
-                    if (new_pham - (new_pham & new_genes)) - old_pham != set():
-                        break
+            # Case 2 and 4 (Addition and Join)
+            if new_pham & new_genes != set():
 
-                    # Case 2 - Addition with new gene
-                    final_phams[old_key] = new_pham
-                    final_colors[old_key] = old_colors[old_key]
-                    new_phams_copy.pop(new_key)
-                    break
+                # Case 4 - Join with new gene
+                if (new_pham - (new_pham & new_genes)) - old_pham != set():
+                    continue
 
-                # Case 4 - Join without new gene
-                else:
-                    break
+                # Case 2 - Addition with new gene
+                final_phams[old_key] = new_pham
+                final_colors[old_key] = old_colors[old_key]
+                new_phams_copy.pop(new_key)
 
-            # Case 3 - split - PHAM SHRANK, BUT NOT BY REMOVAL
-            elif old_pham - new_pham != set():
-                break
+            # Case 4 - Join without new gene
+            else:
+                continue
+
+        # Case 3 - split - PHAM SHRANK, BUT NOT BY REMOVAL
+        # (nothing to do; the new pham gets a new name below)
 
     final_phams[0] = "placeholder"
     highest_pham = max(map(int, final_phams.keys())) + 1
@@ -467,6 +682,8 @@ def mmseqs_createdb(fasta, sequence_db):
     :type fasta: str
     :param sequence_db: MMseqs2 sequence database
     :type sequence_db: str
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs createdb {fasta} {sequence_db} -v 3"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
@@ -474,6 +691,8 @@ def mmseqs_createdb(fasta, sequence_db):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
 def mmseqs_cluster(sequence_db, cluster_db, args):
     """
@@ -484,6 +703,8 @@ def mmseqs_cluster(sequence_db, cluster_db, args):
     :type cluster_db: str
     :param args: parsed command line arguments
     :type args: dict
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs cluster {sequence_db} {cluster_db} {args['tmp_dir']}" \
               f" -v 3 --min-seq-id {args['identity']} -c {args['coverage']} " \
@@ -496,6 +717,8 @@ def mmseqs_cluster(sequence_db, cluster_db, args):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
 def mmseqs_result2profile(sequence_db, cluster_db, profile_db):
     """
@@ -507,6 +730,8 @@ def mmseqs_result2profile(sequence_db, cluster_db, profile_db):
     :type cluster_db: str
     :param profile_db: MMseqs2 profile database
     :type profile_db: str
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs result2profile {sequence_db} {sequence_db} " \
               f"{cluster_db} {profile_db} -v 3"
@@ -515,6 +740,8 @@ def mmseqs_result2profile(sequence_db, cluster_db, profile_db):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
 def mmseqs_profile2consensus(profile_db, consensus_db):
     """
@@ -525,6 +752,8 @@ def mmseqs_profile2consensus(profile_db, consensus_db):
     :type profile_db: str
     :param consensus_db: MMseqs2 sequence database
     :type consensus_db: str
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs profile2consensus {profile_db} {consensus_db} -v 3"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
@@ -532,6 +761,8 @@ def mmseqs_profile2consensus(profile_db, consensus_db):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
 def mmseqs_search(profile_db, consensus_db, align_db, args):
     """
@@ -546,6 +777,8 @@ def mmseqs_search(profile_db, consensus_db, align_db, args):
     :type align_db: str
     :param args: parsed command line arguments
     :type args: dict
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs search {profile_db} {consensus_db} {align_db} " \
               f"{args['tmp_dir']} --min-seq-id {args['hmmident']} -c " \
@@ -556,6 +789,8 @@ def mmseqs_search(profile_db, consensus_db, align_db, args):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
 def mmseqs_clust(consensus_db, align_db, cluster_db):
     """
@@ -568,6 +803,8 @@ def mmseqs_clust(consensus_db, align_db, cluster_db):
     :type align_db: str
     :param cluster_db: MMseqs2 cluster database
     :type cluster_db: str
+    :return: exit status
+    :rtype: int
     """
     command = f"mmseqs clust {consensus_db} {align_db} {cluster_db}"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
@@ -575,45 +812,140 @@ def mmseqs_clust(consensus_db, align_db, cluster_db):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
-def mmseqs_createseqfiledb(sequence_db, cluster_db, seqfile_db):
+def mmseqs_createtsv(sequence_db, cluster_db, outfile):
     """
-    Runs 'mmseqs createseqfiledb' to create the intermediate to the
-    FASTA-like parseable output.
-    :param sequence_db: MMseqs2 sequence database
+    Runs 'mmseqs createtsv' to write an MMseqs2 cluster database as
+    tab-delimited representative, member lines, without writing the
+    sequences out again.
+    :param sequence_db: MMseqs2 sequence database holding the identifiers
     :type sequence_db: str
-    :param cluster_db: MMseqs2 clustered database
+    :param cluster_db: MMseqs2 cluster database
     :type cluster_db: str
-    :param seqfile_db: MMseqs2 seqfile database
-    :type seqfile_db: str
+    :param outfile: tab-delimited output file
+    :type outfile: str
+    :return: exit status
+    :rtype: int
+    """
+    command = f"mmseqs createtsv {sequence_db} {sequence_db} {cluster_db} " \
+              f"{outfile} -v 3"
+    with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
+        # print(process.stdout.read().decode("utf-8"))
+        # print(process.stderr.read().decode("utf-8"))
+        process.wait()
+
+    return process.returncode
+
+
+def mmseqs_search_profiles(sequence_db, profile_db, align_db, args):
+    """
+    Runs 'mmseqs search' to search sequences against an existing
+    MMseqs2 profile database, using the pre-pham thresholds.
+    :param sequence_db: MMseqs2 sequence database (queries)
+    :type sequence_db: str
+    :param profile_db: MMseqs2 profile database (targets)
+    :type profile_db: str
+    :param align_db: MMseqs2 alignment database
+    :type align_db: str
+    :param args: parsed command line arguments
+    :type args: dict
+    :return: exit status
+    :rtype: int
     """
-    command = f"mmseqs createseqfiledb {sequence_db} {cluster_db} " \
-              f"{seqfile_db} -v 3"
+    command = f"mmseqs search {sequence_db} {profile_db} {align_db} " \
+              f"{args['tmp_dir']} --min-seq-id {args['identity']} -c " \
+              f"{args['coverage']} -e {args['e_value']} -s {args['sens']} " \
+              f"--cov-mode {args['cov_mode']} --threads {args['threads']} " \
+              f"-v 3"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
         # print(process.stdout.read().decode("utf-8"))
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
-def mmseqs_result2flat(query_db, target_db, seqfile_db, outfile):
+def mmseqs_convertalis(query_db, target_db, align_db, outfile):
     """
-    Runs 'mmseqs result2flat' to create FASTA-like parseable output.
-    :param query_db: MMseqs2 sequence or profile database
+    Runs 'mmseqs convertalis' to write an MMseqs2 alignment database
+    as tab-delimited query, target, evalue lines.
+    :param query_db: MMseqs2 sequence database
     :type query_db: str
-    :param target_db: MMseqs2 sequence database
+    :param target_db: MMseqs2 sequence or profile database
     :type target_db: str
-    :param seqfile_db: MMseqs2 seqfile database
-    :type seqfile_db: str
-    :param outfile: FASTA-like parseable output
+    :param align_db: MMseqs2 alignment database
+    :type align_db: str
+    :param outfile: tab-delimited output file
     :type outfile: str
+    :return: exit status
+    :rtype: int
     """
-    command = f"mmseqs result2flat {query_db} {target_db} {seqfile_db} " \
-              f"{outfile} -v 3"
+    command = f"mmseqs convertalis {query_db} {target_db} {align_db} " \
+              f"{outfile} --format-output query,target,evalue -v 3"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
         # print(process.stdout.read().decode("utf-8"))
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
+
+def mmseqs_concatdbs(first_db, second_db, concat_db):
+    """
+    Runs 'mmseqs concatdbs' to append one MMseqs2 database (and its
+    headers) to another. Keys of the second database are shifted so they
+    don't collide with those of the first.
+    :param first_db: MMseqs2 database
+    :type first_db: str
+    :param second_db: MMseqs2 database of the same type
+    :type second_db: str
+    :param concat_db: concatenated MMseqs2 database
+    :type concat_db: str
+    :return: exit status of the first failed command, or 0
+    :rtype: int
+    """
+    returncode = 0
+    for suffix in ("", "_h"):
+        command = f"mmseqs concatdbs {first_db}{suffix} {second_db}{suffix} " \
+                  f"{concat_db}{suffix} -v 3"
+        with Popen(args=shlex.split(command), stdout=PIPE,
+                   stderr=PIPE) as process:
+            # print(process.stdout.read().decode("utf-8"))
+            # print(process.stderr.read().decode("utf-8"))
+            process.wait()
+        returncode = returncode or process.returncode
+
+    return returncode
+
+
+def mmseqs_createsubdb(keys_file, source_db, sub_db):
+    """
+    Runs 'mmseqs createsubdb' to copy the entries (and headers) of an
+    MMseqs2 database whose keys are listed in keys_file.
+    :param keys_file: file with one database key per line
+    :type keys_file: str
+    :param source_db: MMseqs2 database
+    :type source_db: str
+    :param sub_db: MMseqs2 database of the listed entries
+    :type sub_db: str
+    :return: exit status of the first failed command, or 0
+    :rtype: int
+    """
+    returncode = 0
+    for suffix in ("", "_h"):
+        command = f"mmseqs createsubdb {keys_file} {source_db}{suffix} " \
+                  f"{sub_db}{suffix} -v 3"
+        with Popen(args=shlex.split(command), stdout=PIPE,
+                   stderr=PIPE) as process:
+            # print(process.stdout.read().decode("utf-8"))
+            # print(process.stderr.read().decode("utf-8"))
+            process.wait()
+        returncode = returncode or process.returncode
+
+    return returncode
+
 
 # BLAST-MCL CLUSTERING FUNCTIONS
 def create_blastdb(fasta, db_name, db_path):
@@ -625,6 +957,8 @@ def create_blastdb(fasta, db_name, db_path):
     :type db_name: str
     :param db_path: BLAST sequence database path
     :type db_path: str
+    :return: exit status
+    :rtype: int
     """
     command = f"makeblastdb -in {fasta} -dbtype prot -title {db_name} " \
               f"-parse_seqids -out {db_path}"
@@ -633,36 +967,66 @@ def create_blastdb(fasta, db_name, db_path):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
+    return process.returncode
+
 
-def chunk_translations(translation_groups, chunksize=500):
+def chunk_translations(translation_groups, chunksize=500, workers=1):
     """
-    Break translation_groups into a dictionary of chunksize-tuples of
-    2-tuples where each 2-tuple is a translation and its corresponding
-    geneid.
+    Break translation_groups into a dictionary of tuples of 2-tuples
+    where each 2-tuple is a translation and its corresponding geneid.
+    Chunks hold chunksize translations on average, but are balanced by
+    their total length rather than their number of translations, since
+    blastp run time grows with query length. Chunks are numbered from
+    the most to the least costly, so that the longest-running searches
+    are dispatched first. The number of chunks is rounded up to a
+    multiple of workers, so that no worker is left idle at the end.
     :param translation_groups: translations and their geneids
     :type translation_groups: dict
-    :param chunksize: how many translations will be in a chunk?
+    :param chunksize: how many translations will be in a chunk on average?
     :type chunksize: int
+    :param workers: how many processes will search the chunks?
+    :type workers: int
     :return: chunks
     :rtype: dict
     """
-    chunks = dict()
-    keys = list(translation_groups.keys())
-    num_chunks = len(keys) // chunksize
+    workers = max(1, workers)
+
+    translations = sorted(translation_groups.keys(), key=len, reverse=True)
+    num_chunks = math.ceil(len(translations) / chunksize)
+    num_chunks = math.ceil(num_chunks / workers) * workers
+    num_chunks = min(num_chunks, len(translations))
 
-    index = 0
-    for i in range(num_chunks):
-        temp_chunk = tuple((x, translation_groups[x][0]) for x in keys[index:index+chunksize])
-        chunks[i] = temp_chunk
-        index += chunksize
+    # Longest translations first, each to the chunk with the fewest residues
+    chunk_heap = [(0, i) for i in range(num_chunks)]
+    members = [list() for _ in range(num_chunks)]
+    for translation in translations:
+        residues, i = heapq.heappop(chunk_heap)
+        members[i].append((translation, translation_groups[translation][0]))
+        heapq.heappush(chunk_heap, (residues + len(translation), i))
 
-    # Add any leftovers to one last (smaller) chunk
-    temp_chunk = tuple((x, translation_groups[x][0]) for x in keys[index:])
-    chunks[num_chunks + 1] = temp_chunk
+    members.sort(key=estimate_chunk_cost, reverse=True)
+
+    chunks = dict()
+    for i, chunk in enumerate(members):
+        chunks[i] = tuple(chunk)
 
     return chunks
 
 
+def estimate_chunk_cost(chunk):
+    """
+    Estimates the relative cost of searching a chunk of translations
+    against the blastp database, as the chunk's total residues. Every
+    chunk is searched against the same database, so its size does not
+    change how chunks compare.
+    :param chunk: the translations and their geneids
+    :type chunk: tuple of 2-tuples
+    :return: cost
+    :rtype: int
+    """
+    return sum(len(x[0]) for x in chunk)
+
+
 def blastp(index, chunk, tmp, db_path, evalue, query_cov):
     """
     Runs 'blastp' using the given chunk as the input gene set. The
@@ -677,14 +1041,46 @@ def blastp(index, chunk, tmp, db_path, evalue, query_cov):
     :type db_path: str
     :param evalue: e-value cutoff to report hits
     :type evalue: float
+    :return: exit status
+    :rtype: int
     """
     in_name = f"{tmp}/input{index}.fasta"
     out_name = f"{tmp}/output{index}.tsv"
 
+    write_blastp_query(chunk, in_name)
+    return run_blastp(in_name, db_path, out_name, evalue, query_cov)
+
+
+def write_blastp_query(chunk, in_name):
+    """
+    Writes a chunk of translations to a blastp query FASTA file.
+    :param chunk: translations and their geneids
+    :type chunk: tuple of 2-tuples
+    :param in_name: FASTA filename
+    :type in_name: str
+    :return:
+    """
     with open(in_name, "w") as fh:
         for t in chunk:
             fh.write(f">{t[1]}\n{t[0]}\n")
 
+
+def run_blastp(in_name, db_path, out_name, evalue, query_cov):
+    """
+    Runs 'blastp' on a query FASTA file against the target database.
+    :param in_name: query FASTA filename
+    :type in_name: str
+    :param db_path: path to the target blast database
+    :type db_path: str
+    :param out_name: filename for the tabular blastp output
+    :type out_name: str
+    :param evalue: e-value cutoff to report hits
+    :type evalue: float
+    :param query_cov: query coverage cutoff to keep HSPs
+    :type query_cov: float
+    :return: returncode
+    :rtype: int
+    """
     command = f"blastp -query {in_name} -db {db_path} -out {out_name} " \
               f"-outfmt '6 qseqid sseqid evalue' -max_target_seqs " \
               f"10000 -num_threads 1 -use_sw_tback -evalue {evalue} " \
@@ -697,7 +1093,7 @@ def blastp(index, chunk, tmp, db_path, evalue, query_cov):
         if stderr != "":
             print(stderr)
 
-    return [out_name]
+    return process.returncode
 
 
 def markov_cluster(adj_mat_file, inflation, tmp_dir):
@@ -714,6 +1110,24 @@ def markov_cluster(adj_mat_file, inflation, tmp_dir):
     :rtype: str
     """
     outfile = f"{tmp_dir}/mcl_clusters.txt"
+    run_mcl(adj_mat_file, inflation, outfile)
+
+    return outfile
+
+
+def run_mcl(adj_mat_file, inflation, outfile):
+    """
+    Runs 'mcl' on an adjacency matrix, writing one cluster per line.
+    :param adj_mat_file: 3-column file with blastp resultant
+    queries, subjects, and evalues
+    :type adj_mat_file: str
+    :param inflation: mcl inflation parameter
+    :type inflation: float
+    :param outfile: mcl output file
+    :type outfile: str
+    :return: exit status
+    :rtype: int
+    """
     command = f"mcl {adj_mat_file} -I {inflation} --abc -o {outfile} " \
               f"-abc-tf 'ceil(200)' --abc-neg-log10"
     with Popen(args=shlex.split(command), stdout=PIPE, stderr=PIPE) as process:
@@ -721,4 +1135,199 @@ def markov_cluster(adj_mat_file, inflation, tmp_dir):
         # print(process.stderr.read().decode("utf-8"))
         process.wait()
 
-    return outfile
+    return process.returncode
+
+
+def sparse_markov_cluster(outfiles, inflation, prune_threshold=MCL_PRUNE,
+                          select=MCL_SELECT, max_iterations=100):
+    """
+    Cluster blastp results into phams with a built-in implementation of
+    Markov clustering on SciPy sparse matrices, rather than 'mcl'.
+    :param outfiles: blastp outputs with queries, subjects and evalues
+    :type outfiles: list
+    :param inflation: mcl inflation parameter
+    :type inflation: float
+    :param prune_threshold: smallest flow kept after each expansion
+    :type prune_threshold: float
+    :param select: largest number of flows kept per gene
+    :type select: int
+    :param max_iterations: iterations to run if flows don't converge
+    :type max_iterations: int
+    :return: phams
+    :rtype: dict
+    """
+    genes, matrix = build_blastp_matrix(outfiles)
+    clusters = iterate_markov_cluster(matrix, inflation, prune_threshold,
+                                      select, max_iterations)
+
+    phams = dict()
+    for i, cluster in enumerate(clusters):
+        phams[i + 1] = [genes[x] for x in cluster]
+
+    return phams
+
+
+def build_blastp_matrix(outfiles, max_weight=200):
+    """
+    Read blastp results into a symmetric sparse adjacency matrix. Edges
+    are weighted like 'mcl --abc-neg-log10 -abc-tf ceil(200)': the
+    negative log10 of the evalue, capped at max_weight. Where two genes
+    hit each other more than once, the heaviest edge is kept.
+    :param outfiles: blastp outputs with queries, subjects and evalues
+    :type outfiles: list
+    :param max_weight: largest edge weight
+    :type max_weight: float
+    :return: genes, matrix
+    :rtype: list, scipy.sparse.csc_matrix
+    """
+    import numpy as np
+    from scipy import sparse
+
+    index = dict()
+    genes = list()
+    rows, cols, weights = array("q"), array("q"), array("d")
+    for outfile in outfiles:
+        with open(outfile, "r") as fh:
+            for line in fh:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+
+                evalue = float(fields[2])
+                if evalue > 0:
+                    weight = min(-math.log10(evalue), max_weight)
+                else:
+                    weight = max_weight
+                if weight <= 0:
+                    continue
+
+                pair = list()
+                for name in fields[:2]:
+                    gene = parse_sequence_name(name)
+                    if gene not in index:
+                        index[gene] = len(genes)
+                        genes.append(gene)
+                    pair.append(index[gene])
+
+                rows.append(pair[0])
+                cols.append(pair[1])
+                weights.append(weight)
+
+    size = len(genes)
+    rows = np.frombuffer(rows, dtype=np.int64)
+    cols = np.frombuffer(cols, dtype=np.int64)
+    weights = np.frombuffer(weights, dtype=np.float64)
+
+    # Mirror every edge, then keep the heaviest of any duplicates
+    keys = np.concatenate((rows * size + cols, cols * size + rows))
+    weights = np.concatenate((weights, weights))
+    order = np.argsort(keys, kind="stable")
+    keys, weights = keys[order], weights[order]
+    starts = np.flatnonzero(np.diff(keys, prepend=-1))
+    if len(starts) > 0:
+        weights = np.maximum.reduceat(weights, starts)
+    keys = keys[starts]
+
+    matrix = sparse.csc_matrix((weights, (keys // size, keys % size)),
+                               shape=(size, size))
+    return genes, matrix
+
+
+def iterate_markov_cluster(matrix, inflation, prune_threshold=MCL_PRUNE,
+                           select=MCL_SELECT, max_iterations=100,
+                           tolerance=1e-6):
+    """
+    Run Markov clustering on an adjacency matrix. As 'mcl' does, loops
+    are replaced with the heaviest edge of each gene and flows are
+    pruned after each expansion, which bounds memory use on large
+    graphs. Clusters are the connected groups of genes left in the
+    converged matrix, largest first.
+    :param matrix: symmetric adjacency matrix
+    :type matrix: scipy.sparse.spmatrix
+    :param inflation: mcl inflation parameter
+    :type inflation: float
+    :param prune_threshold: smallest flow kept after each expansion
+    :type prune_threshold: float
+    :param select: largest number of flows kept per gene
+    :type select: int
+    :param max_iterations: iterations to run if flows don't converge
+    :type max_iterations: int
+    :param tolerance: largest change in flow allowed at convergence
+    :type tolerance: float
+    :return: clusters of matrix indices
+    :rtype: list
+    """
+    import numpy as np
+    from scipy import sparse
+    from scipy.sparse import csgraph
+
+    if matrix.shape[0] == 0:
+        return list()
+
+    matrix = sparse.csc_matrix(matrix, dtype=np.float64)
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    loops = matrix.max(axis=0).toarray().ravel()
+    loops[loops == 0] = 1
+    matrix = matrix + sparse.diags(loops, format="csc")
+    matrix = normalize_columns(matrix)
+
+    for _ in range(max_iterations):
+        last = matrix
+        matrix = prune_columns(matrix @ matrix, prune_threshold, select)
+        matrix = normalize_columns(matrix.power(inflation))
+
+        if abs(matrix - last).max() < tolerance:
+            break
+
+    count, labels = csgraph.connected_components(matrix, directed=True,
+                                                 connection="weak")
+    clusters = [list() for _ in range(count)]
+    for i, label in enumerate(labels):
+        clusters[label].append(i)
+
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+def normalize_columns(matrix):
+    """
+    Scale each column of a sparse matrix to sum to one.
+    :param matrix: sparse matrix
+    :type matrix: scipy.sparse.csc_matrix
+    :return: matrix
+    :rtype: scipy.sparse.csc_matrix
+    """
+    from scipy import sparse
+
+    sums = matrix.sum(axis=0).A1
+    sums[sums == 0] = 1
+    return sparse.csc_matrix(matrix @ sparse.diags(1 / sums))
+
+
+def prune_columns(matrix, threshold, select):
+    """
+    Drop flows below threshold, then all but the select largest flows in
+    each column of a sparse matrix.
+    :param matrix: sparse matrix
+    :type matrix: scipy.sparse.csc_matrix
+    :param threshold: smallest flow kept
+    :type threshold: float
+    :param select: largest number of flows kept per column
+    :type select: int
+    :return: matrix
+    :rtype: scipy.sparse.csc_matrix
+    """
+    import numpy as np
+
+    matrix = matrix.tocsc()
+    matrix.data[matrix.data < threshold] = 0
+
+    counts = np.diff(matrix.indptr)
+    for column in np.flatnonzero(counts > select):
+        start, end = matrix.indptr[column], matrix.indptr[column + 1]
+        data = matrix.data[start:end]
+        data[np.argsort(data)[:-select]] = 0
+
+    matrix.eliminate_zeros()
+    return matrix
@@ -693,6 +693,61 @@ def first_column(engine, executable, in_column=None, values=[], limit=8000):
     return values
 
 
+def execute_iter(engine, executable, in_column=None, values=[], limit=8000,
+                 size=10000, return_dict=True):
+    """Use SQLAlchemy Engine to stream the results of a MySQL query.
+
+    Rows are fetched from a server-side cursor in batches, so the full
+    result set is never held in memory at once.
+
+    :param engine: SQLAlchemy Engine object used for executing queries.
+    :type engine: Engine
+    :param executable: Input a executable MySQL query.
+    :type executable: Select
+    :param in_column: SQLAlchemy Column object.
+    :type in_column: Column
+    :param values: Values from specified MySQL column.
+    :type values: list[str]
+    :param limit: SQLAlchemy IN clause query length limiter.
+    :type limit: int
+    :param size: Number of rows to fetch from the server at a time.
+    :type size: int
+    :param return_dict: Toggle whether execute returns dict or tuple.
+    :type return_dict: Boolean
+    :returns: Generator of results from execution of given MySQL query.
+    :rtype: generator
+    """
+    if values:
+        if in_column is None:
+            raise ValueError("Column input is required to condition "
+                             "SQLAlchemy select for a set of values.")
+
+        if in_column.type.python_type == bytes:
+            values = basic.convert_to_encoded(values)
+
+        executables = [executable.where(in_column.in_(value_chunk))
+                       for value_chunk in basic.partition_list(values, limit)]
+    else:
+        executables = [executable]
+
+    for subquery in executables:
+        with engine.connect() as connection:
+            proxy = connection.execution_options(stream_results=True)\
+                              .execute(subquery)
+            while True:
+                results = proxy.fetchmany(size)
+                if not results:
+                    break
+
+                for result in results:
+                    if return_dict:
+                        result = dict(result)
+
+                    yield result
+
+            proxy.close()
+
+
 def execute_value_subqueries(engine, executable, in_column, source_values,
                              return_dict=True, limit=8000):
     """Query with a conditional on a set of values using subqueries.
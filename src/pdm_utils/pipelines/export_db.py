@@ -1,13 +1,13 @@
 """Pipeline for exporting database information into files."""
 import argparse
+import itertools
 import shutil
 import sys
 import time
 from pathlib import Path
 
-from pdm_utils.classes.filter import Filter
-from pdm_utils.functions import (configfile, fileio, flat_files, mysqldb,
-                                 mysqldb_basic, pham_alignment,
+from pdm_utils.functions import (basic, configfile, fileio, flat_files,
+                                 mysqldb, mysqldb_basic, pham_alignment,
                                  pipelines_basic, querying)
 
 
@@ -38,6 +38,9 @@ BIOPYTHON_PIPELINES = ["gb", "fasta", "clustal", "fasta-2line", "nexus",
 FILTERABLE_PIPELINES = BIOPYTHON_PIPELINES + ["csv", "tbl"]
 PIPELINES = FILTERABLE_PIPELINES + ["sql"]
 FLAT_FILE_TABLES = ["phage", "gene"]
+# Number of database entries converted and written at a time by
+# SeqRecord export pipelines, which bounds their memory use.
+DEFAULT_BATCH_SIZES = {"phage": 100, "gene": 5000}
 FIVE_COLUMN_TABLES = ["phage"]
 
 CDD_DATA_COLUMNS = ["gene_domain.QueryStart", "gene_domain.QueryEnd",
@@ -99,7 +102,8 @@ def main(unparsed_args_list):
                        raw_bytes=args.raw_bytes,
                        concatenate=args.concatenate, db_name=args.db_name,
                        verbose=args.verbose, dump=args.dump, force=args.force,
-                       threads=args.number_processes, phams_out=args.phams_out)
+                       threads=args.number_processes, phams_out=args.phams_out,
+                       batch_size=args.batch_size, aln_cache=args.aln_cache)
     else:
         pass
 
@@ -182,6 +186,13 @@ def parse_export(unparsed_args_list):
             Follow selection argument with the name of the desired database.
         """
 
+    ALN_CACHE_HELP = """
+        MySQL export option to reuse the alignments of unchanged phams when
+        exporting phams with --phams_out.
+            Follow selection argument with the path to a directory where
+            alignments are cached between exports.
+        """
+
     CONCATENATE_HELP = """
         SeqRecord export option to toggle concatenation of files.
             Toggle to enable concatenation of files.
@@ -203,6 +214,11 @@ def parse_export(unparsed_args_list):
             Follow selection argument with formatted column expressions:
                 {Table}.{Column}={Value}
         """
+    BATCH_SIZE_HELP = """
+        SeqRecord export option to change the number of entries retrieved,
+        converted, and written at a time.
+            Follow selection argument with the desired number of entries.
+        """
     RAW_BYTES_HELP = """
         Csv export option to conserve blob and encoded data from the database
         when exporting to a csv file.
@@ -269,6 +285,10 @@ def parse_export(unparsed_args_list):
         subparser.add_argument("-s", "--order_by", nargs="*",
                                help=ORDER_BY_HELP)
 
+    for subparser in biopython_parsers + [tbl_parser]:
+        subparser.add_argument("-bs", "--batch_size", type=int,
+                               help=BATCH_SIZE_HELP)
+
     for subparser in biopython_parsers:
         subparser.add_argument("-cc", "--concatenate", help=CONCATENATE_HELP,
                                action="store_true")
@@ -291,6 +311,8 @@ def parse_export(unparsed_args_list):
 
     sql_parser.add_argument("-n", "--db_name", type=str, help=DB_NAME_HELP)
     sql_parser.add_argument("-pho", "--phams_out", action="store_true")
+    sql_parser.add_argument("-ac", "--aln_cache", type=Path,
+                            help=ALN_CACHE_HELP)
 
     for subparser in subparser_list:
         subparser.set_defaults(
@@ -300,7 +322,7 @@ def parse_export(unparsed_args_list):
                         include_columns=[], exclude_columns=[],
                         sequence_columns=False, concatenate=False,
                         raw_bytes=False, db_name=None, phams_out=False,
-                        number_processes=1)
+                        number_processes=1, batch_size=None, aln_cache=None)
 
     parsed_args = parser.parse_args(unparsed_args_list[2:])
 
@@ -312,7 +334,8 @@ def execute_export(alchemist, pipeline, folder_path=None,
                    dump=False, force=False, table=DEFAULT_TABLE, filters="",
                    groups=[], sort=[], include_columns=[], exclude_columns=[],
                    sequence_columns=False, raw_bytes=False, concatenate=False,
-                   db_name=None, phams_out=False, threads=1):
+                   db_name=None, phams_out=False, threads=1,
+                   batch_size=None, aln_cache=None):
     """Executes the entirety of the file export pipeline.
 
     :param alchemist: A connected and fully built AlchemyHandler object.
@@ -349,6 +372,10 @@ def execute_export(alchemist, pipeline, folder_path=None,
     :type concaternate: bool
     :param threads: Number of processes/threads to spawn during the pipeline
     :type threads: int
+    :param batch_size: Number of entries exported at a time as SeqRecords.
+    :type batch_size: int
+    :param aln_cache: Path to a dir of cached pham alignments.
+    :type aln_cache: Path
     """
     if verbose:
         print("Retrieving database version...")
@@ -378,7 +405,8 @@ def execute_export(alchemist, pipeline, folder_path=None,
     if pipeline == "sql":
         execute_sql_export(alchemist, export_path, folder_path, db_version,
                            db_name=db_name, dump=dump, force=force,
-                           phams_out=phams_out, threads=threads,
+                           phams_out=phams_out, aln_cache=aln_cache,
+                           threads=threads,
                            verbose=verbose)
     elif pipeline in FILTERABLE_PIPELINES:
         conditionals_map = pipelines_basic.build_groups_map(
@@ -418,8 +446,8 @@ def execute_export(alchemist, pipeline, folder_path=None,
                 execute_ffx_export(alchemist, mapped_path, export_path,
                                    db_filter.values, pipeline, db_version,
                                    table, concatenate=concatenate,
-                                   data_cache=data_cache,
                                    export_name=export_name, threads=threads,
+                                   batch_size=batch_size,
                                    verbose=verbose, dump=dump)
             elif pipeline == "csv":
                 execute_csv_export(db_filter, mapped_path, export_path,
@@ -467,12 +495,19 @@ def execute_csv_export(db_filter, export_path, folder_path, columns, csv_name,
         if column.name != db_filter._key.name:
             headers.append(column.name)
 
-    results = db_filter.select(columns)
+    # Rows are streamed from the server and written as they arrive,
+    # rather than fetched and decoded as a whole.
+    query = querying.build_select(db_filter.graph, columns,
+                                  add_in=db_filter.key)
+    results = querying.execute_iter(db_filter.engine, query,
+                                    in_column=db_filter.key,
+                                    values=db_filter.values)
 
     if not raw_bytes:
-        decode_results(results, columns, verbose=verbose)
+        results = iter_decoded_results(results, columns)
 
-    if len(results) == 0:
+    first_result = next(results, None)
+    if first_result is None:
         print(f"No database entries received for {csv_name}.")
         if not dump:
             export_path.rmdir()
@@ -485,16 +520,19 @@ def execute_csv_export(db_filter, export_path, folder_path, columns, csv_name,
             print(f"...Writing csv {csv_name}.csv in '{export_path.name}'...")
 
         file_path = export_path.joinpath(f"{csv_name}.csv")
-        fileio.export_data_dict(results, file_path, headers,
-                                include_headers=True)
+        fileio.export_data_dict(itertools.chain([first_result], results),
+                                file_path, headers, include_headers=True)
 
 
 def execute_ffx_export(alchemist, export_path, folder_path, values,
                        file_format, db_version, table, concatenate=False,
-                       data_cache=None, verbose=False, dump=False,
-                       threads=1, export_name=None):
+                       verbose=False, dump=False, threads=1, export_name=None,
+                       batch_size=None):
     """Executes SeqRecord export of the compilation of data from a MySQL entry.
 
+    Entries are retrieved, converted and written in batches, so that only
+    one batch of SeqRecords is held in memory at a time.
+
     :param alchemist: A connected and fully build AlchemyHandler object.
     :type alchemist: AlchemyHandler
     :param export_path: Path to a dir for file creation.
@@ -509,17 +547,17 @@ def execute_ffx_export(alchemist, export_path, folder_path, values,
     :type table: str
     :param values: List of values to fitler database results.
     :type values: list[str]
-    :param conditionals: MySQL WHERE clause-related SQLAlchemy objects.
-    :type conditionals: list[BinaryExpression]
-    :param sort: A list of SQLAlchemy Columns to sort by.
-    :type sort: list[Column]
     :param concatenate: A boolean to toggle concatenation of SeqRecords.
     :type concaternate: bool
     :param verbose: A boolean value to toggle progress print statements.
     :type verbose: bool
+    :param batch_size: Number of entries converted and written at a time.
+    :type batch_size: int
     """
-    if data_cache is None:
-        data_cache = {}
+    if table not in FLAT_FILE_TABLES:
+        print(f"Unknown error occured, table '{table}' is not recognized "
+              "for SeqRecord export pipelines.")
+        sys.exit(1)
 
     if export_name is None:
         export_name = export_path.name
@@ -527,33 +565,40 @@ def execute_ffx_export(alchemist, export_path, folder_path, values,
     if verbose:
         print(f"Retrieving {export_name} data...")
 
-    if table == "phage":
-        seqrecords = get_genome_seqrecords(alchemist, values,
-                                           data_cache=data_cache,
-                                           verbose=verbose)
-    elif table == "gene":
-        seqrecords = get_cds_seqrecords(alchemist, values,
-                                        data_cache=data_cache, verbose=verbose)
-    else:
-        print(f"Unknown error occured, table '{table}' is not recognized "
-              "for SeqRecord export pipelines.")
-        sys.exit(1)
+    write_results = []
+    seqrecord_batches = iter_seqrecords(alchemist, values, table,
+                                        batch_size=batch_size,
+                                        verbose=verbose)
+    for batch_index, seqrecords in enumerate(seqrecord_batches):
+        if file_format == "tbl":
+            write_results.extend(fileio.write_feature_table(
+                                            seqrecords, export_path,
+                                            threads=threads, verbose=verbose))
+            continue
 
-    if file_format == "tbl":
-        fileio.write_feature_table(seqrecords, export_path, verbose=verbose)
-    else:
         if verbose:
             print("Appending database version...")
         for record in seqrecords:
             append_database_version(record, db_version)
-        fileio.write_seqrecords(seqrecords, file_format, export_path,
-                                export_name=export_name, verbose=verbose,
-                                concatenate=concatenate, threads=threads)
+
+        # Concatenated files are started by the first batch and
+        # extended by the batches that follow.
+        write_results.extend(fileio.write_seqrecords(
+                                    seqrecords, file_format, export_path,
+                                    export_name=export_name, verbose=verbose,
+                                    concatenate=concatenate, threads=threads,
+                                    append=(batch_index > 0)))
+
+    failed = [file_path for file_path, error in write_results
+              if error is not None]
+    if failed:
+        print(f"{len(failed)} of {len(write_results)} {export_name} files "
+              "could not be written.")
 
 
 def execute_sql_export(alchemist, export_path, folder_path, db_version,
                        db_name=None, dump=False, force=False, phams_out=False,
-                       threads=1, verbose=False):
+                       threads=1, verbose=False, aln_cache=None):
     pipelines_basic.create_working_dir(export_path, dump=dump, force=force)
 
     if phams_out:
@@ -574,7 +619,8 @@ def execute_sql_export(alchemist, export_path, folder_path, db_version,
         if verbose:
             print("...Writing and aligning pham fasta files...")
         pham_alignment.write_phams(phams_out_fasta_dir, phams_out_aln_dir,
-                                   phams_dict, cores=threads, verbose=verbose)
+                                   phams_dict, cores=threads, verbose=verbose,
+                                   cache_dir=aln_cache)
 
         pham_fastas_zip = export_path.joinpath("fastas.zip")
         pham_alns_zip = export_path.joinpath("alns.zip")
@@ -594,11 +640,51 @@ def execute_sql_export(alchemist, export_path, folder_path, db_version,
 # EXPORT-SPECIFIC HELPER FUNCTIONS
 # -----------------------------------------------------------------------------
 
+def iter_seqrecords(alchemist, values, table, batch_size=None,
+                    verbose=False):
+    """Generates SeqRecords for database entries, one batch at a time.
+
+    Each batch uses its own data cache, so retrieved genomes are released
+    once the batch has been consumed.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param values: List of PhageIDs or GeneIDs to export.
+    :type values: list[str]
+    :param table: MySQL table name.
+    :type table: str
+    :param batch_size: Number of entries in each batch.
+    :type batch_size: int
+    :param verbose: A boolean value to toggle progress print statements.
+    :type verbose: bool
+    :returns: Generator yielding lists of SeqRecords.
+    """
+    if batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZES[table]
+
+    batches = basic.partition_list(list(values), batch_size)
+    for batch_index, batch in enumerate(batches):
+        if verbose:
+            print(f"...Converting batch {batch_index + 1}/{len(batches)}...")
+
+        data_cache = {}
+        if table == "phage":
+            seqrecords = get_genome_seqrecords(alchemist, batch,
+                                               data_cache=data_cache)
+        else:
+            seqrecords = get_cds_seqrecords(alchemist, batch,
+                                            data_cache=data_cache)
+
+        yield seqrecords
+
+
 # TODO Document and Unittest
 def get_genome_seqrecords(alchemist, values, data_cache=None, verbose=False):
     if data_cache is None:
         data_cache = {}
 
+    get_genomes(alchemist, values, get_features=True, data_cache=data_cache)
+
     seqrecords = []
     for genome_id in values:
         genome = data_cache.get(genome_id)
@@ -621,25 +707,23 @@ def get_cds_seqrecords(alchemist, values, data_cache=None, nucleotide=False,
 
     cds_list = parse_feature_data(alchemist, values=values)
 
-    db_filter = Filter(alchemist)
-    db_filter.key = 'gene.GeneID'
+    if verbose:
+        print("...Retrieving parent genome and domain data...")
+    get_genomes(alchemist, [cds.genome_id for cds in cds_list],
+                data_cache=data_cache)
+    cds_domains = get_cds_domains(alchemist, [cds.id for cds in cds_list])
 
     if verbose:
         print("...Converting SQL data...")
 
     seqrecords = []
     for cds in cds_list:
-        parent_genome = data_cache.get(cds.genome_id)
-
-        if parent_genome is None:
-            parent_genome = get_single_genome(alchemist, cds.genome_id,
-                                              data_cache=data_cache)
+        parent_genome = data_cache[cds.genome_id]
 
         cds.genome_length = parent_genome.length
         cds.set_seqfeature()
 
-        db_filter.values = [cds.id]
-        gene_domains = db_filter.select(CDD_DATA_COLUMNS)
+        gene_domains = cds_domains.get(cds.id, [])
 
         record = flat_files.cds_to_seqrecord(cds, parent_genome,
                                              gene_domains=gene_domains)
@@ -755,6 +839,27 @@ def decode_results(results, columns, verbose=False):
                     result[column.name] = result[column.name].decode("utf-8")
 
 
+def iter_decoded_results(results, columns):
+    """Generator that decodes encoded results from SQLAlchemy generated data.
+
+    :param results: Iterable of data dictionaries from a SQLAlchemy query.
+    :type results: Iterable[dict]
+    :param columns: SQLAlchemy Column objects.
+    :type columns: list[Column]
+    :returns: Generator of decoded data dictionaries.
+    :rtype: generator
+    """
+    bytes_columns = [column.name for column in columns
+                     if column.type.python_type == bytes]
+
+    for result in results:
+        for column_name in bytes_columns:
+            if result[column_name] is not None:
+                result[column_name] = result[column_name].decode("utf-8")
+
+        yield result
+
+
 # Functions to be evaluated for another module:
 # -----------------------------------------------------------------------------
 
@@ -787,6 +892,79 @@ def parse_feature_data(alchemist, values=[], limit=8000):
     return cds_list
 
 
+def get_cds_domains(alchemist, values, limit=8000):
+    """Returns the conserved domain data for a list of GeneIDs.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param values: List of GeneIDs upon which the query can be conditioned.
+    :type values: list[str]
+    :param limit: Maximum number of GeneIDs in each query.
+    :type limit: int
+    :returns: Dictionary where key = GeneID and value = list of domain data.
+    :rtype: dict
+    """
+    cds_domains = {}
+    if not values:
+        return cds_domains
+
+    gene_id = querying.get_column(alchemist.metadata, "gene.GeneID")
+    columns = [querying.get_column(alchemist.metadata, column)
+               for column in CDD_DATA_COLUMNS]
+
+    domain_query = querying.build_select(alchemist.graph,
+                                         [gene_id] + columns, add_in=gene_id)
+    domain_data = querying.execute(alchemist.engine, domain_query,
+                                   in_column=gene_id, values=values,
+                                   limit=limit)
+
+    for data_dict in domain_data:
+        geneid = data_dict.pop("GeneID")
+        cds_domains.setdefault(geneid, []).append(data_dict)
+
+    return cds_domains
+
+
+def get_genomes(alchemist, phage_ids, get_features=False, data_cache=None):
+    """Returns Genome objects for a list of PhageIDs.
+
+    Genomes missing from the data cache are retrieved with a single query
+    for each table.
+
+    :param alchemist: A connected and fully built AlchemyHandler object.
+    :type alchemist: AlchemyHandler
+    :param phage_ids: List of PhageIDs.
+    :type phage_ids: list[str]
+    :param get_features: A boolean to toggle retrieval of genome features.
+    :type get_features: bool
+    :param data_cache: Dictionary where key = PhageID and value = Genome.
+    :type data_cache: dict
+    :returns: Dictionary where key = PhageID and value = Genome.
+    :rtype: dict
+    """
+    if data_cache is None:
+        data_cache = {}
+
+    missing = [phage_id for phage_id in set(phage_ids)
+               if phage_id not in data_cache]
+
+    if missing:
+        feature_queries = {}
+        if get_features:
+            feature_queries = {"gene_query": GENE_QUERY,
+                               "trna_query": TRNA_QUERY,
+                               "tmrna_query": TMRNA_QUERY}
+
+        genomes = mysqldb.parse_genome_data(alchemist.engine,
+                                            phage_id_list=missing,
+                                            phage_query=PHAGE_QUERY,
+                                            **feature_queries)
+        for genome in genomes:
+            data_cache[genome.id] = genome
+
+    return data_cache
+
+
 def append_database_version(genome_seqrecord, version_data):
     """Function that appends the database version to the SeqRecord comments.
 
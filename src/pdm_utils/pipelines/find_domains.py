@@ -1,10 +1,14 @@
 import argparse
+import hashlib
+import json
 import logging
 import os
 import pathlib
 import platform
+import queue
 import shlex
 import sys
+import time
 from subprocess import Popen, PIPE # import warnings
 
 from Bio.Blast import NCBIXML
@@ -13,6 +17,7 @@ import sqlalchemy
 
 import pdm_utils
 from pdm_utils.classes.alchemyhandler import AlchemyHandler
+from pdm_utils.classes.domaincache import DomainCache, hash_translation
 from pdm_utils.constants import constants
 from pdm_utils.functions import basic
 from pdm_utils.functions import configfile
@@ -39,6 +44,18 @@ INSERT_INTO_GENE_DOMAIN = (
 
 UPDATE_GENE = "UPDATE gene SET DomainStatus = 1 WHERE GeneID = '{}'"
 
+# Parameterized SQL COMMANDS, for bulk execution
+INSERT_IGNORE_INTO_DOMAIN = (
+    "INSERT IGNORE INTO domain (HitID, DomainID, Name, Description) "
+    "VALUES (%s, %s, %s, %s)")
+
+INSERT_IGNORE_INTO_GENE_DOMAIN = (
+    "INSERT IGNORE INTO gene_domain "
+    "(GeneID, HitID, Expect, QueryStart, QueryEnd) "
+    "VALUES (%s, %s, %s, %s, %s)")
+
+UPDATE_GENES = "UPDATE gene SET DomainStatus = 1 WHERE GeneID IN ({})"
+
 CLEAR_GENE_DOMAIN = "TRUNCATE gene_domain"
 CLEAR_DOMAIN = "DELETE FROM domain"
 CLEAR_GENE_DOMAINSTATUS = "UPDATE gene SET DomainStatus = 0"
@@ -56,7 +73,12 @@ DEFAULT_TMP_DIR = "/tmp/find_domains"
 DEFAULT_OUTPUT_FOLDER = os.getcwd()
 RESULTS_FOLDER = f"{constants.CURRENT_DATE}_find_domains"
 MAIN_LOG_FILE = "find_domains.log"
+JOURNAL_FILE = "search_journal.jsonl"
 DEFAULT_CDD = "~/Databases/Cdd_LE"
+# Number of genes whose domain data is inserted in each transaction
+INSERT_BATCH_SIZE = 1000
+# Number of searched batches that may wait to be inserted
+DEFAULT_QUEUE_SIZE = 2
 
 # LOGGING
 # Add a logger named after this module. Then add a null handler, which
@@ -87,6 +109,19 @@ def setup_argparser():
         f"Default is {DEFAULT_CDD}.")
     config_file_help = (
         "Path to the file containing user-specific login data.")
+    cache_file_help = (
+        "Path to a file where search results are cached by translation, "
+        "so they can be reused by later runs and other databases.")
+    cache_size_help = (
+        "Maximum size (MB) of cached search results. "
+        "Least recently used results are evicted first.")
+    resume_help = (
+        "Path to the results folder of an interrupted run. Translations "
+        "searched by that run are not searched again.")
+    queue_size_help = (
+        "Maximum number of searched batches waiting to be inserted "
+        "while the next batch is searched. "
+        f"Default is {DEFAULT_QUEUE_SIZE}.")
 
     # Initialize parser and add arguments
     parser = argparse.ArgumentParser(description=description)
@@ -107,10 +142,20 @@ def setup_argparser():
                         help=output_folder_help)
     parser.add_argument("-b", "--batch_size", default=10000, type=int,
                         help="number of translations to search at a time")
+    parser.add_argument("-k", "--chunk_size", default=100, type=int,
+                        help="number of translations per rpsblast process")
     parser.add_argument("-x", "--reset", action="store_true",
                         default=False, help=reset_help)
     parser.add_argument("-c", "--config_file", type=pathlib.Path,
                         help=config_file_help, default=None)
+    parser.add_argument("--cache_file", type=pathlib.Path,
+                        help=cache_file_help, default=None)
+    parser.add_argument("--cache_size", type=int, default=1024,
+                        help=cache_size_help)
+    parser.add_argument("--resume", type=pathlib.Path, default=None,
+                        help=resume_help)
+    parser.add_argument("--queue_size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=queue_size_help)
 
     return parser
 
@@ -167,23 +212,90 @@ def search_and_process(rpsblast, cdd_name, tmp_dir, evalue,
     return results
 
 
+def search_and_process_batch(rpsblast, cdd_name, tmp_dir, evalue,
+                             batch_id, translations, rps_threads=1):
+    """
+    Uses one rpsblast process to search a batch of translations against
+    the indicated CDD, so the CDD is only loaded once per batch.
+    :param rpsblast: path to rpsblast binary
+    :param cdd_name: CDD database path/name
+    :param tmp_dir: path to directory where I/O will take place
+    :param evalue: evalue cutoff for rpsblast
+    :param batch_id: unique identifier for the batch, used for file names
+    :param translations: protein sequences to query
+    :param rps_threads: number of threads for the rpsblast process
+    :return: results
+    """
+    # Setup I/O variables
+    i = "{}/batch_{}.fasta".format(tmp_dir, batch_id)
+    o = "{}/batch_{}.xml".format(tmp_dir, batch_id)
+
+    # Write the multi-FASTA input file. Query names are indices into
+    # translations, so they can be mapped back after the search.
+    with open(i, "w") as fh:
+        for index, translation in enumerate(translations):
+            fh.write(">{}\n{}\n".format(index, translation))
+
+    # Setup, run the rpsblast command, and process results
+    rps_command = NcbirpsblastCommandline(cmd=rpsblast, db=cdd_name,
+                                          query=i, out=o, outfmt=5,
+                                          evalue=evalue,
+                                          num_threads=rps_threads)
+    rps_command()
+    data = process_rps_batch_output(o, evalue)
+
+    results = []
+    for index, translation in enumerate(translations):
+        # A translation missing from the output was not searched, so it
+        # must not be recorded as having no domains.
+        if index not in data.keys():
+            logger.warning(f"No rpsblast output for translation "
+                           f"{index} in batch {batch_id}.")
+            continue
+        results.append({"Translation": translation, "Data": data[index]})
+    return results
+
+
 def process_rps_output(filepath, evalue):
     """Process rpsblast output and return list of dictionaries."""
     results = []
     with open(filepath, "r") as fh:
         for record in NCBIXML.parse(fh):
-            for align in record.alignments:
-                des, d_id, name = process_align(align)
-                for hsp in align.hsps:
-                    if hsp.expect <= evalue:
-                        dict = {"HitID": align.hit_id,
-                                "DomainID": d_id,
-                                "Name": name,
-                                "Description": des,
-                                "Expect": float(hsp.expect),
-                                "QueryStart": int(hsp.query_start),
-                                "QueryEnd": int(hsp.query_end)}
-                        results.append(dict)
+            results.extend(process_rps_record(record, evalue))
+    return results
+
+
+def process_rps_batch_output(filepath, evalue):
+    """Process multi-query rpsblast output, one query record at a time.
+
+    Returns a dictionary, where:
+    key = query index (the FASTA header written by search_and_process_batch),
+    value = list of dictionaries, each dictionary a significant rpsblast hit.
+    """
+    results = {}
+    with open(filepath, "r") as fh:
+        for record in NCBIXML.parse(fh):
+            index = int(record.query.split()[0])
+            results[index] = process_rps_record(record, evalue)
+    return results
+
+
+def process_rps_record(record, evalue):
+    """Process the alignments of one rpsblast query record and return
+    list of dictionaries."""
+    results = []
+    for align in record.alignments:
+        des, d_id, name = process_align(align)
+        for hsp in align.hsps:
+            if hsp.expect <= evalue:
+                dict = {"HitID": align.hit_id,
+                        "DomainID": d_id,
+                        "Name": name,
+                        "Description": des,
+                        "Expect": float(hsp.expect),
+                        "QueryStart": int(hsp.query_start),
+                        "QueryEnd": int(hsp.query_end)}
+                results.append(dict)
     return results
 
 
@@ -216,6 +328,17 @@ def process_align(align):
     return description, domain_id, name
 
 
+def get_cdd_version(cdd_dir):
+    """Fingerprint the CDD files, so cached results from a different CDD
+    release are not reused."""
+    fingerprint = hashlib.sha256()
+    for filename in sorted(os.listdir(cdd_dir)):
+        stat = os.stat(os.path.join(cdd_dir, filename))
+        fingerprint.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};"
+                           .encode("utf-8"))
+    return fingerprint.hexdigest()
+
+
 def learn_cdd_name(cdd_dir):
     cdd_files = os.listdir(cdd_dir)
     cdd_files = [os.path.join(cdd_dir, x.split(".")[0]) for x in cdd_files]
@@ -249,6 +372,11 @@ def main(argument_list):
     output_folder = args.output_folder
     reset = args.reset
     batch_size = args.batch_size
+    chunk_size = args.chunk_size
+    cache_file = args.cache_file
+    cache_size = args.cache_size
+    queue_size = args.queue_size
+    resume = args.resume
 
     # Create config object with data obtained from file and/or defaults.
     config = configfile.build_complete_config(args.config_file)
@@ -324,22 +452,48 @@ def main(argument_list):
         logger.info(msg)
         print(msg)
 
-        # Process translations in batches. Otherwise, searching could take
-        # so long that MySQL connection closes resulting in 1 or more
-        # transaction errors.
-        batch_indices = basic.create_indices(unique_trans, batch_size)
-        total_rolled_back = 0
-        for indices in batch_indices:
-            start = indices[0]
-            stop = indices[1]
-            msg = f"Processing translations {start + 1} to {stop}..."
+        cdd_version = get_cdd_version(cdd_dir)
+
+        # Reuse results from earlier searches of the same translations.
+        cache = None
+        if cache_file is not None:
+            cache_file = expand_path(cache_file)
+            cache = DomainCache(cache_file, cdd_version, evalue,
+                                max_size=cache_size * 1024 ** 2)
+            cache.open()
+            logger.info(f"Using search result cache: {cache_file}")
+
+        # Record search results before they are inserted, so an
+        # interrupted run can be resumed without searching them again.
+        replay = None
+        if resume is not None:
+            replay = read_journal(pathlib.Path(expand_path(resume),
+                                               JOURNAL_FILE),
+                                  cdd_version, evalue)
+            msg = (f"{len(replay)} translations searched by the "
+                   "interrupted run will not be searched again.")
             logger.info(msg)
             print(msg)
-            sublist = unique_trans[start:stop]
-            batch_rolled_back = search_translations(
-                                    rpsblast, cdd_name, tmp_dir, evalue,
-                                    threads, engine, sublist, cds_trans_dict)
-            total_rolled_back += batch_rolled_back
+        journal = open_journal(pathlib.Path(results_path, JOURNAL_FILE),
+                               cdd_version, evalue)
+
+        # Process translations in batches. Otherwise, searching could take
+        # so long that MySQL connection closes resulting in 1 or more
+        # transaction errors. Each batch is inserted by a writer process
+        # while the next batch is searched.
+        try:
+            total_rolled_back = pipeline_translations(
+                                rpsblast, cdd_name, tmp_dir, evalue, threads,
+                                engine, unique_trans, cds_trans_dict,
+                                batch_size, chunk_size=chunk_size,
+                                cache=cache, queue_size=queue_size,
+                                journal=journal, replay=replay)
+        finally:
+            journal.close()
+
+        if cache is not None:
+            cache_summary(cache)
+            cache.close()
 
         search_summary(total_rolled_back)
         engine.dispose()
@@ -359,18 +513,73 @@ def search_summary(rolled_back):
     print("\n\n\n" + msg)
 
 
+def cache_summary(cache):
+    """Evict old results from the cache and report its usage."""
+    evicted = cache.evict()
+    msg = (f"Search result cache: {cache.hits} hits, {cache.misses} misses, "
+           f"{evicted} results evicted.")
+    logger.info(msg)
+    print(msg)
+
+
 def search_translations(rpsblast, cdd_name, tmp_dir, evalue, threads,
-                        engine, unique_trans, cds_trans_dict):
-    """Search for conserved domains in a list of unique translations.
+                        engine, unique_trans, cds_trans_dict, chunk_size=100,
+                        cache=None):
+    """Search for conserved domains in a list of unique translations, and
+    insert the results.
+
+    If a DomainCache is provided, only translations missing from it are
+    searched, and their results are added to it.
     """
-    # Build jobs list
-    jobs = []
-    for id, translation in enumerate(unique_trans):
-        jobs.append((rpsblast, cdd_name, tmp_dir, evalue, id, translation))
-    results_temp = parallelize(jobs, threads, search_and_process)
-    # Get rid of unneeded list type which was only needed due to
-    # filter restriction in parallelize.start_processes()
-    results = [i[0] for i in results_temp]
+    domain_txn, gene_txns = search_batch(rpsblast, cdd_name, tmp_dir, evalue,
+                                         threads, unique_trans, cds_trans_dict,
+                                         chunk_size=chunk_size, cache=cache)
+    rolled_back = insert_bulk_domain_data(engine, domain_txn, gene_txns)
+    return rolled_back
+
+
+def search_batch(rpsblast, cdd_name, tmp_dir, evalue, threads, unique_trans,
+                 cds_trans_dict, chunk_size=100, cache=None, journal=None,
+                 replay=None):
+    """Search for conserved domains in a list of unique translations, and
+    construct the transactions to insert the results.
+
+    If a DomainCache is provided, only translations missing from it are
+    searched, and their results are added to it. Translations whose hash
+    is in the replay dictionary (read from the journal of an interrupted
+    run) are not searched either. If a journal file handle is provided,
+    all results are recorded in it before they are inserted.
+
+    Returns the domain transaction and the list of gene transactions.
+    """
+    cached = {}
+    if cache is not None:
+        cached = cache.get_many(unique_trans)
+        unique_trans = [x for x in unique_trans if x not in cached.keys()]
+
+    replayed = []
+    if replay is not None:
+        remaining = []
+        for translation in unique_trans:
+            data = replay.get(hash_translation(translation))
+            if data is None:
+                remaining.append(translation)
+            else:
+                replayed.append({"Translation": translation, "Data": data})
+        unique_trans = remaining
+
+    results = search_unique_translations(rpsblast, cdd_name, tmp_dir,
+                                         evalue, threads, unique_trans,
+                                         chunk_size=chunk_size)
+    results = results + replayed
+
+    if cache is not None:
+        cache.put_many(results)
+        results = results + [{"Translation": translation, "Data": data}
+                             for translation, data in cached.items()]
+
+    if journal is not None:
+        write_journal(journal, results)
 
     # List of dictionaries. Each dictionary:
     # keys: "Translation": translation, "Data": list of results
@@ -390,9 +599,215 @@ def search_translations(rpsblast, cdd_name, tmp_dir, evalue, threads,
     # key = unique translation,
     # value = list of dictionaries, each dictionary a unique rpsblast result
 
-    transactions = construct_sql_txns(cds_trans_dict, results_dict)
-    rolled_back = insert_domain_data(engine, transactions)
-    return rolled_back
+    return construct_bulk_txns(cds_trans_dict, results_dict)
+
+
+def pipeline_translations(rpsblast, cdd_name, tmp_dir, evalue, threads,
+                          engine, unique_trans, cds_trans_dict, batch_size,
+                          chunk_size=100, cache=None,
+                          queue_size=DEFAULT_QUEUE_SIZE, journal=None,
+                          replay=None):
+    """Search for conserved domains in batches of unique translations,
+    inserting each batch in a writer process while the next one is searched.
+
+    Inserts run in a separate process rather than a thread, because
+    searches fork rpsblast workers, and a fork taken while a thread holds
+    a database or logging lock would leave that lock held in the child.
+
+    The queue between searching and inserting holds at most queue_size
+    batches, so searching pauses if inserting falls too far behind.
+
+    Returns the number of transactions that were rolled back.
+    """
+    write_queue = mp.Queue(maxsize=max(1, queue_size))
+    totals = create_totals()
+
+    # The writer opens its own connections, rather than share the pool's
+    engine.dispose()
+    writer = mp.Process(target=write_worker,
+                        args=(engine, write_queue, totals))
+    writer.start()
+
+    start_time = time.time()
+    searched = 0
+    try:
+        batch_indices = basic.create_indices(unique_trans, batch_size)
+        for indices in batch_indices:
+            start = indices[0]
+            stop = indices[1]
+            msg = f"Processing translations {start + 1} to {stop}..."
+            logger.info(msg)
+            print(msg)
+            sublist = unique_trans[start:stop]
+            domain_txn, gene_txns = search_batch(
+                                    rpsblast, cdd_name, tmp_dir, evalue,
+                                    threads, sublist, cds_trans_dict,
+                                    chunk_size=chunk_size, cache=cache,
+                                    journal=journal, replay=replay)
+            searched += len(sublist)
+            put_batch(write_queue, writer,
+                      (len(sublist), domain_txn, gene_txns))
+            throughput_summary(searched, totals, time.time() - start_time)
+    finally:
+        # Stop the writer once it has inserted everything in the queue.
+        if writer.is_alive():
+            put_batch(write_queue, writer, None)
+        writer.join()
+
+    if writer.exitcode != 0:
+        raise RuntimeError("Database writer process exited with status "
+                           f"{writer.exitcode}.")
+
+    throughput_summary(searched, totals, time.time() - start_time)
+    return totals["rolled_back"].value
+
+
+def create_totals():
+    """Create the progress counters shared with the writer process."""
+    return {"translations": mp.Value("q", 0), "rows": mp.Value("q", 0),
+            "rolled_back": mp.Value("q", 0)}
+
+
+def put_batch(write_queue, writer, batch):
+    """Put a batch on the write queue, waiting for space unless the writer
+    process has exited."""
+    while True:
+        try:
+            write_queue.put(batch, timeout=1)
+            return
+        except queue.Full:
+            if not writer.is_alive():
+                raise RuntimeError("Database writer process exited with "
+                                   f"status {writer.exitcode}.")
+
+
+def write_worker(engine, write_queue, totals):
+    """Insert batches of search results from the queue until None is
+    received, recording progress in the shared totals counters.
+
+    An error inserting one batch is counted as rolled back transactions,
+    so that the worker keeps draining the queue and searching never blocks.
+    """
+    for num_trans, domain_txn, gene_txns in iter(write_queue.get, None):
+        try:
+            rolled_back = insert_bulk_domain_data(engine, domain_txn,
+                                                  gene_txns)
+        except Exception as err:
+            logger.error(f"Unable to insert batch of search results: {err}")
+            rolled_back = 1 + len(gene_txns)
+        totals["rolled_back"].value += rolled_back
+        totals["rows"].value += count_bulk_rows(domain_txn, gene_txns)
+        totals["translations"].value += num_trans
+
+    engine.dispose()
+
+
+def count_bulk_rows(domain_txn, gene_txns):
+    """Count the domain and gene_domain rows in a set of bulk transactions."""
+    rows = sum(len(parameters) for statement, parameters in domain_txn)
+    for txn in gene_txns:
+        rows += len(txn[0][1])
+    return rows
+
+
+def throughput_summary(searched, totals, elapsed):
+    """Report search and insert throughput."""
+    elapsed = max(elapsed, 1e-6)
+    msg = (f"Searched {searched} translations "
+           f"({searched / elapsed:.1f} translations/s), "
+           f"inserted {totals['translations'].value} translations "
+           f"({totals['rows'].value / elapsed:.1f} rows/s).")
+    logger.info(msg)
+    print(msg)
+
+
+def open_journal(journal_file, cdd_version, evalue):
+    """Create a search journal, starting with a header recording the CDD
+    version and evalue cutoff, and return the open file handle."""
+    journal = open(journal_file, "w")
+    journal.write(json.dumps({"CDDVersion": cdd_version,
+                              "Evalue": evalue}) + "\n")
+    journal.flush()
+    return journal
+
+
+def write_journal(journal, search_results):
+    """Append search results to a search journal, one line per translation.
+
+    The file is synced to disk, so the results survive a crash of this
+    process or of the machine.
+    """
+    for result in search_results:
+        entry = {"Hash": hash_translation(result["Translation"]),
+                 "Data": result["Data"]}
+        journal.write(json.dumps(entry) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def read_journal(journal_file, cdd_version, evalue):
+    """Read the search journal of an interrupted run.
+
+    Results are only returned if they were searched with the same CDD
+    version and evalue cutoff.
+
+    Returns a dictionary, where:
+    key = translation hash,
+    value = list of dictionaries, each dictionary a significant rpsblast hit.
+    """
+    replay = {}
+    if not os.path.exists(journal_file):
+        logger.warning(f"No search journal found at {journal_file}.")
+        return replay
+
+    with open(journal_file, "r") as fh:
+        header = None
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line is incomplete if the run was interrupted
+                # while it was being written.
+                logger.warning(f"Incomplete entry in {journal_file} ignored.")
+                break
+            if header is None:
+                header = entry
+                if (header.get("CDDVersion") != cdd_version or
+                        header.get("Evalue") != evalue):
+                    logger.warning(f"{journal_file} was created with a "
+                                   "different CDD or evalue and is ignored.")
+                    return replay
+                continue
+            replay[entry["Hash"]] = entry["Data"]
+    return replay
+
+
+def search_unique_translations(rpsblast, cdd_name, tmp_dir, evalue, threads,
+                               unique_trans, chunk_size=100):
+    """Search a list of unique translations in multi-FASTA chunks, with one
+    rpsblast process per chunk.
+
+    When there are fewer chunks than threads, the spare threads are given
+    to each rpsblast process instead.
+
+    Returns a list of dictionaries, one dict per translation, where:
+    keys = "Translation" and "Data".
+    """
+    chunks = basic.partition_list(unique_trans, chunk_size)
+    if len(chunks) == 0:
+        return []
+    rps_threads = max(1, threads // len(chunks))
+
+    # Build jobs list
+    jobs = []
+    for id, chunk in enumerate(chunks):
+        jobs.append((rpsblast, cdd_name, tmp_dir, evalue, id, chunk,
+                     rps_threads))
+    results_temp = parallelize(jobs, threads, search_and_process_batch)
+
+    # Flatten the per-chunk lists
+    results = [result for chunk in results_temp for result in chunk]
+    return results
 
 
 def create_cds_translation_dict(cdd_genes):
@@ -431,6 +846,47 @@ def construct_sql_txns(cds_trans_dict, rpsblast_results):
     return transactions
 
 
+def construct_bulk_txns(cds_trans_dict, rpsblast_results,
+                        batch_size=INSERT_BATCH_SIZE):
+    """Construct parameterized SQL transactions for bulk insertion.
+
+    Domain data shared by several translations or genes is only inserted
+    once, in its own transaction. The gene_domain rows and DomainStatus
+    updates are split into transactions of batch_size genes each.
+
+    Each transaction is a list of 2-tuples, where each 2-tuple is a
+    parameterized statement and a list of parameter tuples.
+
+    Returns the domain transaction and the list of gene transactions.
+    """
+    domain_rows = {}
+    gene_domain_rows = {}
+    for translation, rps_data_list in rpsblast_results.items():
+        rows = []
+        for rps_hit in rps_data_list:
+            domain_rows[rps_hit["HitID"]] = (rps_hit["HitID"],
+                                             rps_hit["DomainID"],
+                                             rps_hit["Name"],
+                                             rps_hit["Description"])
+            rows.append((rps_hit["HitID"], rps_hit["Expect"],
+                         rps_hit["QueryStart"], rps_hit["QueryEnd"]))
+        for gene_id in cds_trans_dict[translation]:
+            gene_domain_rows[gene_id] = [(gene_id,) + row for row in rows]
+
+    domain_txn = [(INSERT_IGNORE_INTO_DOMAIN, list(domain_rows.values()))]
+
+    gene_txns = []
+    gene_ids = list(gene_domain_rows.keys())
+    for batch in basic.partition_list(gene_ids, batch_size):
+        rows = []
+        for gene_id in batch:
+            rows.extend(gene_domain_rows[gene_id])
+        update = UPDATE_GENES.format(", ".join(["%s"] * len(batch)))
+        gene_txns.append([(INSERT_IGNORE_INTO_GENE_DOMAIN, rows),
+                          (update, [tuple(batch)])])
+    return domain_txn, gene_txns
+
+
 def construct_sql_txn(gene_id, rps_data_list):
     """Map domain data back to gene_id and create SQL statements for one transaction.
 
@@ -571,6 +1027,72 @@ def insert_domain_data(engine, results):
     return rolled_back
 
 
+def insert_bulk_domain_data(engine, domain_txn, gene_txns):
+    """Attempt to insert domain data into the database in bulk.
+
+    The domain transaction is executed first. If it fails, none of the
+    gene transactions can succeed, so they are all counted as rolled back.
+    """
+    msg = "Inserting data..."
+    logger.info(msg)
+    print(msg)
+
+    rolled_back = 0
+    with engine.connect() as connection:
+        if execute_bulk_transaction(connection, domain_txn) == 1:
+            rolled_back = 1 + len(gene_txns)
+        else:
+            for txn in gene_txns:
+                rolled_back += execute_bulk_transaction(connection, txn)
+
+    if rolled_back > 0:
+        msg = (f"Error executing {rolled_back} transaction(s).")
+        logger.error(msg)
+        print(msg)
+    return rolled_back
+
+
+def execute_bulk_transaction(connection, statement_list=[]):
+    """Execute a list of parameterized statements within one transaction.
+
+    statement_list is a list of 2-tuples, where each 2-tuple is a
+    parameterized statement and a list of parameter tuples. Since values
+    are never formatted into the statements, '%' in domain descriptions
+    needs no special handling.
+    """
+    trans = connection.begin()
+    try:
+        for statement, parameters in statement_list:
+            if len(parameters) == 0:
+                continue
+            connection.execute(statement, parameters)
+            logger.info(f"Successful execution of {len(parameters)} "
+                        f"parameter set(s). Statement: {statement}")
+    except sqlalchemy.exc.DBAPIError as err:
+        msg = (f"Unable to execute MySQL statement. "
+               f"SQLAlchemy Error type: {str(type(err))}. "
+               f"PyMySQL Error type: {str(type(err.orig))}. "
+               f"PyMySQL Error message: {err.orig.args}. "
+               f"Statement: {statement}")
+        logger.error(msg)
+        logger.info("Rolling back transaction.")
+        trans.rollback()
+        txn_result = 1
+    except:
+        print("Error executing MySQL statements.")
+        print("Rolling back transaction...")
+        logger.error("Unable to execute MySQL statements.")
+        logger.info("Rolling back transaction.")
+        trans.rollback()
+        txn_result = 1
+    else:
+        logger.info("Committing all changes.")
+        trans.commit()
+        txn_result = 0
+
+    return txn_result
+
+
 def execute_transaction(connection, statement_list=[]):
     trans = connection.begin()
     failed = 0
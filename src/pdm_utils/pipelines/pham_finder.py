@@ -8,6 +8,7 @@ from pathlib import Path
 from pdm_utils.functions import basic
 from pdm_utils.functions import configfile
 from pdm_utils.functions import fileio
+from pdm_utils.functions import mysqldb_basic
 from pdm_utils.functions import pipelines_basic
 
 #GLOBAL VARIABLES
@@ -17,6 +18,8 @@ DEFAULT_FOLDER_PATH = Path.cwd()
 
 PHAM_FINDER_HEADER = ["Reference Pham", "Corresponding Phams"]
 
+GET_GENE_PHAMS = "SELECT {}, PhamID FROM gene"
+
 def main(unparsed_args_list):
     """Uses parsed args to run the entirety of the pham_finder pipeline.
 
@@ -224,6 +227,16 @@ def execute_pham_finder(alchemist, folder_path, folder_name,
                                         groups=groups,
                                         verbose=verbose)
 
+    if use_locus:
+        key = "LocusTag"
+    else:
+        key = "GeneID"
+
+    if verbose:
+        print("Indexing phams in both databases...")
+    a_index = build_pham_genes(a_filter.engine, key=key)
+    b_index = build_gene_phams(b_filter.engine, key=key)
+
     if verbose:
         print("Prepared query and path structure, beginning export...")
 
@@ -245,7 +258,9 @@ def execute_pham_finder(alchemist, folder_path, folder_name,
             sort_columns = get_sort_columns(alchemist, sort)
             a_filter.sort(sort_columns)
 
-        mapped_phams = find_phams(a_filter, b_filter, show_per=show_per)
+        mapped_phams = find_phams(a_filter, b_filter, show_per=show_per,
+                                  use_locus=use_locus, a_index=a_index,
+                                  b_index=b_index)
         if not mapped_phams:
             print("Phams are consistent between the two databases "
                  f"for '{mapped_path}'.")
@@ -263,42 +278,51 @@ def execute_pham_finder(alchemist, folder_path, folder_name,
         fileio.export_data_dict(out_data_dicts, file_path, PHAM_FINDER_HEADER,
                                 include_headers=True)
 
-#TODO Owen Needs unittests
-def find_phams(a_filter, b_filter, show_per=False, use_locus=False):
+def find_phams(a_filter, b_filter, show_per=False, use_locus=False,
+               a_index=None, b_index=None):
     """Find phams helper function that finds phams via GeneID intermediates.
 
+    Genes are matched between the databases in memory, with one streamed
+    query to each database, instead of with queries for each pham.
+
     :param a_filter: Fully built Filter connected to the reference database.
     :type a_filter: Filter
     :param b_filter: Fully build Filter connected to a database.
     :type b_filter: Filter
     :param show_per: Enables display gene coverage of the corresponding phams.
     :type show_per: bool
+    :param use_locus: Toggles conversion between phams using LocusTag instead
+    :type use_locus: bool
+    :param a_index: Genes of each reference pham from build_pham_genes()
+    :type a_index: dict
+    :param b_index: Phams of each gene from build_gene_phams()
+    :type b_index: dict
     :returns: Returns a dictionary mapping original phams to corresponding phams
     :rtype: dict{int:str}
     """
     if use_locus:
-        genes = a_filter.retrieve("gene.GeneID")
+        key = "LocusTag"
     else:
-        genes = a_filter.retrieve("gene.GeneID")
+        key = "GeneID"
+
+    if a_index is None:
+        a_index = build_pham_genes(a_filter.engine, key=key)
+    if b_index is None:
+        b_index = build_gene_phams(b_filter.engine, key=key)
 
     mapped_phams = {}
-    for pham, data_dict in genes.items():
-        if use_locus:
-            values = data_dict["LocusTag"]
-            values.remove(None)
-            b_filter.values = values
-        else:
-            b_filter.values = data_dict["GeneID"]        
-
-        if show_per:
-            pham_groups = b_filter.group("gene.PhamID")
-            phams_list = list(pham_groups.keys())
-            total_genes = 0
-            
-            for grouped_genes in pham_groups.values():
-                total_genes += len(grouped_genes)
-        else:
-            phams_list = b_filter.transpose("gene.PhamID")
+    for pham in a_filter.values:
+        # Separate the genes of the reference pham by their pham in the
+        # second database.
+        pham_groups = {}
+        for gene in a_index.get(str(pham), []):
+            for join_pham in b_index.get(gene.lower(), []):
+                pham_groups.setdefault(join_pham, {}).update({gene: None})
+
+        phams_list = list(pham_groups.keys())
+        total_genes = 0
+        for grouped_genes in pham_groups.values():
+            total_genes += len(grouped_genes)
 
         if len(phams_list) == 1:
             if phams_list[0] == pham:
@@ -315,14 +339,63 @@ def find_phams(a_filter, b_filter, show_per=False, use_locus=False):
                     percent = (len(pham_groups[join_pham])\
                                   /total_genes) * 100
                     percent = round(percent, 1)
-                    phams_list[i] = "".join([str(join_pham), 
+                    phams_list[i] = "".join([str(join_pham),
                                         "(", str(percent), "%)"])
             corr_phams = ";".join([str(join_pham) for join_pham in phams_list])
 
         mapped_phams[pham] = corr_phams
-        
+
     return mapped_phams
 
+
+def build_pham_genes(engine, key="GeneID"):
+    """Groups the genes of a database by pham, with one streamed query.
+
+    :param engine: SQLAlchemy Engine connected to the reference database.
+    :type engine: Engine
+    :param key: Name of the gene column used to match genes.
+    :type key: str
+    :returns: Dictionary where key = PhamID as a string and
+              value = list of distinct gene column values.
+    :rtype: dict
+    """
+    pham_genes = {}
+    for gene, pham in mysqldb_basic.query_iter(engine,
+                                               GET_GENE_PHAMS.format(key)):
+        if gene is None or pham is None:
+            continue
+        pham_genes.setdefault(str(pham), {}).update({gene: None})
+
+    for pham in pham_genes.keys():
+        pham_genes[pham] = list(pham_genes[pham].keys())
+
+    return pham_genes
+
+
+def build_gene_phams(engine, key="GeneID"):
+    """Maps the genes of a database to their phams, with one streamed query.
+
+    :param engine: SQLAlchemy Engine connected to the second database.
+    :type engine: Engine
+    :param key: Name of the gene column used to match genes.
+    :type key: str
+    :returns: Dictionary where key = lowercase gene column value and
+              value = list of distinct PhamIDs.
+    :rtype: dict
+    """
+    gene_phams = {}
+    for gene, pham in mysqldb_basic.query_iter(engine,
+                                               GET_GENE_PHAMS.format(key)):
+        if gene is None:
+            continue
+        # MySQL compares gene identifiers case-insensitively.
+        gene_phams.setdefault(gene.lower(), {}).update({pham: None})
+
+    for gene in gene_phams.keys():
+        gene_phams[gene] = list(gene_phams[gene].keys())
+
+    return gene_phams
+
 if __name__ == "__main__":
     main(sys.argv)
     
@@ -6,6 +6,8 @@ import textwrap
 import time
 from pathlib import Path
 
+from sqlalchemy import func
+
 from pdm_utils.functions import annotation
 from pdm_utils.functions import basic
 from pdm_utils.functions import configfile
@@ -71,6 +73,7 @@ def main(unparsed_args_list):
                    filters=args.filters, groups=args.groups, sort=args.sort,
                    s_report=s_report, gr_reports=gr_reports,
                    production=args.production, psr_reports=psr_reports,
+                   neighbour_index_file=args.neighbour_index,
                    verbose=args.verbose)
 
 
@@ -124,6 +127,11 @@ def parse_pham_review(unparsed_args_list):
         Review option to toggle export of supplemental information about
         the profile of a pham selected for review.
         """
+    NEIGHBOUR_INDEX_HELP = """
+        Review option to store the index of adjacent genes used for pham
+        summary reports, so it can be reused by later reviews.
+            Follow selection argument with the path to the index file.
+        """
     PRODUCTION_HELP = """
         Review option to toggle additional filters to support production-level
         review.
@@ -187,6 +195,8 @@ def parse_pham_review(unparsed_args_list):
                         help=PHAM_SUMMARY_REPORT_HELP)
     parser.add_argument("-p", "--production", action="store_true",
                         help=PRODUCTION_HELP)
+    parser.add_argument("-ni", "--neighbour_index", type=Path,
+                        help=NEIGHBOUR_INDEX_HELP)
 
     parser.add_argument("-nr", "--no_review", action="store_true",
                         help=REVIEW_HELP)
@@ -208,7 +218,7 @@ def parse_pham_review(unparsed_args_list):
     parser.set_defaults(folder_name=default_folder_name,
                         folder_path=None,
                         input=[], filters="", groups=[], sort=[],
-                        config_file=None,
+                        config_file=None, neighbour_index=None,
                         no_review=False, gene_report=False,
                         summary_report=False, verbose=False)
 
@@ -221,7 +231,7 @@ def execute_pham_review(
                    folder_name=DEFAULT_FOLDER_NAME, no_review=False, values=[],
                    filters="", groups=[], sort=[], s_report=False,
                    gr_reports=False, psr_reports=False, production=False,
-                   verbose=False, force=False):
+                   neighbour_index_file=None, verbose=False, force=False):
     """Executes the entirety of the pham review pipeline.
 
     :param alchemist: A connected and fully built AlchemyHandler object.
@@ -247,6 +257,9 @@ def execute_pham_review(
     :type gr_reports: bool
     :param production: Toggles additional filters for production-level review
     :type production: bool
+    :param neighbour_index_file: Path to a file to persist the gene neighbour
+                                 index for pham summary reports in.
+    :type neighbour_index_file: Path
     :param verbose: A boolean value to toggle progress print statements.
     :type verbose: bool
     """
@@ -285,6 +298,13 @@ def execute_pham_review(
 
     if verbose:
         print("Prepared query and path structure, beginning review export...")
+    neighbour_index = None
+    if psr_reports:
+        if verbose:
+            print("Indexing adjacent genes...")
+        neighbour_index = annotation.load_neighbour_index(
+                                    alchemist, index_file=neighbour_index_file)
+
     original_phams = db_filter.values
     gr_data_cache = {}
     psr_data_cache = {}
@@ -310,13 +330,14 @@ def execute_pham_review(
                                        psr_reports=psr_reports,
                                        gr_data_cache=gr_data_cache,
                                        psr_data_cache=psr_data_cache,
+                                       neighbour_index=neighbour_index,
                                        verbose=verbose)
 
 
 def execute_pham_report_export(alchemist, db_filter, export_path,
                                gr_reports=False, gr_data_cache={},
                                psr_reports=False, psr_data_cache={},
-                               verbose=False):
+                               neighbour_index=None, verbose=False):
     """Executes export of gene data for a reviewed pham.
 
     :param alchemist: A connected and fully built AlchemyHandler object.
@@ -325,6 +346,8 @@ def execute_pham_report_export(alchemist, db_filter, export_path,
     :type export_path: Path
     :param gr_data_cache: Total data extracted for gene reports.
     :type gr_data_cache: dict
+    :param neighbour_index: Index of adjacent genes for pham summary reports.
+    :type neighbour_index: dict
     :param verbose: A boolean value to toggle progress print statements.
     :type verbose: bool
     """
@@ -333,6 +356,15 @@ def execute_pham_report_export(alchemist, db_filter, export_path,
     pham_report_path = export_path.joinpath("PhamReports")
     pham_report_path.mkdir()
 
+    adjacent_annotations = {}
+    if psr_reports:
+        uncached_phams = [pham for pham in phams
+                          if psr_data_cache.get(pham) is None]
+        adjacent_annotations = \
+            annotation.get_count_adjacent_annotations_to_phams(
+                                        alchemist, uncached_phams,
+                                        neighbour_index=neighbour_index)
+
     for pham in phams:
         pham_path = pham_report_path.joinpath(str(pham))
         pham_path.mkdir()
@@ -351,37 +383,49 @@ def execute_pham_report_export(alchemist, db_filter, export_path,
         if psr_reports:
             psr_data = psr_data_cache.get(pham)
             if psr_data is None:
-                psr_data = get_psr_data(alchemist, db_filter, verbose=verbose)
+                psr_data = get_psr_data(
+                            alchemist, db_filter, verbose=verbose,
+                            adjacent_annotations=adjacent_annotations.get(pham))
                 psr_data_cache[pham] = psr_data
 
             write_pham_summary_report(psr_data, pham_path, verbose=verbose)
 
 
-def review_phams(db_filter, verbose=False):
+def review_phams(db_filter, verbose=False, limit=8000):
     """Finds and stores phams with discrepant function calls in a Filter.
 
+    Phams are reviewed with one grouped query per chunk of limit phams.
+
+    :param db_filter: A connected Filter object with PhamID values.
+    :type db_filter: Filter
+    :param verbose: A boolean value to toggle progress print statements.
+    :type verbose: bool
+    :param limit: Number of phams reviewed by each query.
+    :type limit: int
     """
+    if not db_filter.values:
+        return
+
     notes = db_filter.get_column("gene.Notes")
 
     if verbose:
         print("Reviewing phams...")
 
-    reviewed_phams = []
-    for index in range(len(db_filter.values)):
-        pham = db_filter.values[index]
-        if verbose:
-            print(f"...Analyzing Pham {pham}...")
-
-        query = querying.build_count(db_filter.graph, notes.distinct(),
-                                     where=(db_filter.key == pham))
-        func_count = mysqldb_basic.scalar(db_filter.engine, query)
+    query = querying.build_select(
+                            db_filter.graph, db_filter.key,
+                            group_by=db_filter.key,
+                            having=(func.count(notes.distinct()) > 1))
+    discrepant_phams = set(querying.first_column(db_filter.engine, query,
+                                                 in_column=db_filter.key,
+                                                 values=db_filter.values,
+                                                 limit=limit))
 
-        if func_count <= 1:
-            continue
-
-        if verbose:
-            print(f"......Detected discrepencies in Pham {pham}")
-        reviewed_phams.append(pham)
+    reviewed_phams = []
+    for pham in db_filter.values:
+        if pham in discrepant_phams:
+            if verbose:
+                print(f"......Detected discrepencies in Pham {pham}")
+            reviewed_phams.append(pham)
 
     if verbose:
         print(f"Detected {len(reviewed_phams)} disrepent phams...")
@@ -463,13 +507,15 @@ def get_review_data(alchemist, db_filter, verbose=False):
     review_columns = get_review_data_columns(alchemist)
     row_dicts = db_filter.retrieve(review_columns)
 
+    pham_annotations = annotation.get_count_annotations_in_phams(
+                                            alchemist, list(row_dicts.keys()))
+
     review_data = []
     for pham in row_dicts.keys():
         if verbose:
             print(f"...Processing data for pham {pham}...")
         row_dict = row_dicts[pham]
-        row_dict["Notes"] = annotation.get_count_annotations_in_pham(
-                                                            alchemist, pham)
+        row_dict["Notes"] = pham_annotations[pham]
 
         format_review_data(row_dict, pham)
         review_data.append(row_dict)
@@ -525,15 +571,17 @@ def get_gr_data(alchemist, db_filter, verbose=False):
     return gr_data
 
 
-def get_psr_data(alchemist, db_filter, verbose=False):
+def get_psr_data(alchemist, db_filter, verbose=False,
+                 adjacent_annotations=None):
     pham = db_filter.values[0]
-    adjacent_genes = annotation.get_genes_adjacent_to_pham(alchemist, pham)
+    if adjacent_annotations is None:
+        adjacent_annotations = \
+            annotation.get_count_adjacent_annotations_to_phams(
+                                                    alchemist, [pham])[pham]
     psr_data = {}
 
-    psr_data["left_annotations"] = annotation.get_count_annotations_in_genes(
-                                                alchemist, adjacent_genes[0])
-    psr_data["right_annotations"] = annotation.get_count_annotations_in_genes(
-                                                alchemist, adjacent_genes[1])
+    psr_data["left_annotations"] = adjacent_annotations[0]
+    psr_data["right_annotations"] = adjacent_annotations[1]
 
     db_filter.values = [pham]
     db_filter.transpose("domain.Name", set_values=True)
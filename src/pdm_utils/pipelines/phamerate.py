@@ -4,10 +4,14 @@ and mcl for clustering."""
 
 import argparse
 from datetime import datetime
+import importlib.util
+import json
 import os
 import shutil
 
 from pdm_utils.classes.alchemyhandler import AlchemyHandler
+from pdm_utils.classes.stagereport import StageReport, get_path_size
+from pdm_utils.functions import blastp_shards
 from pdm_utils.functions.configfile import *
 from pdm_utils.functions.phameration import *
 from pdm_utils.functions.parallelize import *
@@ -31,6 +35,15 @@ Clusters From Networks. Methods in Molecular Biology, 2012. doi:
 10.1007/978-1-61779-361-5_15.
 """
 
+# Name of the JSON report of the time and memory used by each stage
+REPORT_NAME = "phamerate_report.json"
+
+WORKER_DESCRIPTION = """
+Search blastp chunks for a 'blast-mcl --sharded' run, which may be
+running on another machine that shares the --tmp-dir filesystem.
+Workers exit once every chunk has been searched.
+"""
+
 
 def setup_argparser():
     """
@@ -75,9 +88,16 @@ def setup_argparser():
                                help="number of threads to use")
     mmseqs_parser.add_argument("--tmp-dir", type=str, default="/tmp/phamerate",
                                help="temporary directory for file I/O")
+    mmseqs_parser.add_argument("--profile-dir", type=str, default=None,
+                               help="directory where pham profiles are kept "
+                                    "between runs")
+    mmseqs_parser.add_argument("--incremental", action="store_true",
+                               help="only search new translations against "
+                                    "the pham profiles in --profile-dir")
     mmseqs_parser.add_argument("-c", "--config_file", type=pathlib.Path, default=None,
                                help="path to file containing login details")
     mmseqs_parser.formatter_class = argparse.RawTextHelpFormatter
+    mmseqs_parser.set_defaults(program="mmseqs")
 
     # Create sub-parser for blast-mcl invocation
     blast_parser = subparsers.add_parser("blast-mcl",
@@ -91,13 +111,46 @@ def setup_argparser():
                               help="blastp query coverage to keep HSPs [0, 1]")
     blast_parser.add_argument("--inflate", type=float, default=5.0,
                               help="MCL inflation parameter")
+    blast_parser.add_argument("--mcl-engine", type=str, default="mcl",
+                              choices=["mcl", "scipy"],
+                              help="cluster with the mcl program, or with "
+                                   "the built-in SciPy implementation")
+    blast_parser.add_argument("--prune", type=float, default=MCL_PRUNE,
+                              help="smallest flow kept by the scipy engine")
+    blast_parser.add_argument("--select", type=int, default=MCL_SELECT,
+                              help="largest number of flows kept per gene by "
+                                   "the scipy engine")
     blast_parser.add_argument("--threads", type=int, default=mp.cpu_count(),
                               help="blastp instances to run in parallel")
     blast_parser.add_argument("--tmp-dir", type=str, default="/tmp/phamerate",
                               help="temporary directory for file I/O")
+    blast_parser.add_argument("--sharded", action="store_true",
+                              help="share blastp chunks with blastp-worker "
+                                   "processes through --tmp-dir")
+    blast_parser.add_argument("--shard-timeout", type=float, default=900,
+                              help="seconds without blastp-worker activity "
+                                   "before a sharded run gives up")
     blast_parser.add_argument("-c", "--config_file", type=pathlib.Path, default=None,
                               help="path to file containing login details")
     blast_parser.formatter_class = argparse.RawTextHelpFormatter
+    blast_parser.set_defaults(program="blast-mcl")
+
+    # Create sub-parser for blastp workers of a sharded blast-mcl invocation
+    worker_parser = subparsers.add_parser("blastp-worker",
+                                          help="search blastp chunks for a "
+                                               "sharded blast-mcl run")
+    worker_parser.description = WORKER_DESCRIPTION
+    worker_parser.add_argument("--threads", type=int, default=mp.cpu_count(),
+                               help="blastp instances to run in parallel")
+    worker_parser.add_argument("--tmp-dir", type=str,
+                               default="/tmp/phamerate",
+                               help="work directory shared with the "
+                                    "blast-mcl run")
+    worker_parser.add_argument("--wait", type=float, default=600,
+                               help="seconds to wait for blast-mcl to write "
+                                    "its work manifest")
+    worker_parser.formatter_class = argparse.RawTextHelpFormatter
+    worker_parser.set_defaults(program="blastp-worker")
     return parser
 
 
@@ -120,6 +173,333 @@ def refresh_tempdir(tmpdir):
         return
 
 
+def check_profile_state(profile_dir, database):
+    """
+    Checks whether profile_dir holds pham profiles saved by an earlier
+    run against the same database.
+    :param profile_dir: directory where pham profiles are kept
+    :param database: name of the database being phamerated
+    :return: usable
+    :rtype: bool
+    """
+    if profile_dir is None:
+        return False
+
+    manifest = f"{profile_dir}/manifest.json"
+    if not os.path.exists(manifest) or \
+            not os.path.exists(f"{profile_dir}/profileDB.dbtype"):
+        return False
+
+    with open(manifest, "r") as fh:
+        try:
+            state = json.load(fh)
+        except ValueError:
+            return False
+
+    return state.get("database") == database
+
+
+def save_profile_state(profile_db, profile_dir, database):
+    """
+    Copies an MMseqs2 profile database (and its headers) into
+    profile_dir so that the next incremental run can search against it.
+    :param profile_db: MMseqs2 profile database
+    :param profile_dir: directory where pham profiles are kept
+    :param database: name of the database being phamerated
+    :return:
+    """
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+    except OSError:
+        print(f"Failed to create profile directory '{profile_dir}'")
+        return
+
+    db_dir, db_name = os.path.split(profile_db)
+    for filename in os.listdir(db_dir):
+        if filename.startswith(db_name):
+            suffix = filename[len(db_name):]
+            # copy() follows the symlinks MMseqs2 uses for header files
+            shutil.copy(f"{db_dir}/{filename}",
+                        f"{profile_dir}/profileDB{suffix}")
+
+    state = {"database": database,
+             "saved": datetime.now().isoformat(timespec="seconds")}
+    with open(f"{profile_dir}/manifest.json", "w") as fh:
+        json.dump(state, fh)
+
+
+def mmseqs_phamerate(infile, tmp, args, report=None):
+    """
+    Runs the MMseqs2 workflow on a FASTA file of non-redundant
+    translations: sequence-sequence clustering into pre-phams, then
+    (unless --skip-hmm) profile-consensus clustering of the pre-phams.
+    :param infile: FASTA file of non-redundant translations
+    :param tmp: directory for this run's MMseqs2 databases
+    :param args: parsed command line arguments
+    :param report: record of the time and memory used by each stage
+    :return: new_phams, pro_db
+    """
+    if report is None:
+        report = StageReport()
+
+    seq_db = f"{tmp}/sequenceDB"            # MMseqs2 sequence database
+    clu_db = f"{tmp}/clusterDB"             # MMseqs2 cluster database
+    p_out = f"{tmp}/pre_out.tsv"            # pre-pham clusters (TSV)
+    pro_db = f"{tmp}/profileDB"             # MMseqs2 profile database
+
+    print("Creating MMseqs2 sequence database...")
+    with report.stage("createdb", {"bytes": get_path_size(infile)}):
+        report.record_tool("mmseqs createdb",
+                           mmseqs_createdb(infile, seq_db))
+        report.set_outputs(bytes=get_path_size(seq_db))
+
+    print("Clustering sequence database...")
+    with report.stage("cluster", {"bytes": get_path_size(seq_db)}):
+        report.record_tool("mmseqs cluster",
+                           mmseqs_cluster(seq_db, clu_db, args))
+        report.set_outputs(bytes=get_path_size(clu_db))
+
+    print("Storing sequence-based phamilies...")
+    with report.stage("parse", {"bytes": get_path_size(clu_db)}):
+        report.record_tool("mmseqs createtsv",
+                           mmseqs_createtsv(seq_db, clu_db, p_out))
+        pre_phams = parse_mmseqs_clusters(p_out)    # Parse pre-pham output
+        report.set_outputs(phams=len(pre_phams))
+
+    # Profiles are needed by the HMM step, and by later incremental runs
+    if not args["skip_hmm"] or args["profile_dir"] is not None:
+        print("Creating HMM profiles from sequence-based phamilies...")
+        with report.stage("profile", {"phams": len(pre_phams)}):
+            report.record_tool("mmseqs result2profile",
+                               mmseqs_result2profile(seq_db, clu_db, pro_db))
+            report.set_outputs(bytes=get_path_size(pro_db))
+
+    # Proceed with profile clustering, if allowed
+    if not args["skip_hmm"]:
+        con_lookup = dict()
+        for name, geneids in pre_phams.items():
+            for geneid in geneids:
+                con_lookup[geneid] = name
+
+        con_db = f"{tmp}/consensusDB"       # Consensus sequence database
+        aln_db = f"{tmp}/alignDB"           # Alignment database
+        res_db = f"{tmp}/resultDB"          # Cluster database
+        h_out = f"{tmp}/hmm_out.tsv"        # hmm-pham clusters (TSV)
+
+        print("Extracting consensus sequences from HMM profiles...")
+        with report.stage("consensus", {"bytes": get_path_size(pro_db)}):
+            report.record_tool("mmseqs profile2consensus",
+                               mmseqs_profile2consensus(pro_db, con_db))
+            report.set_outputs(bytes=get_path_size(con_db))
+
+        print("Searching for profile-profile hits...")
+        with report.stage("search", {"phams": len(pre_phams)}):
+            report.record_tool("mmseqs search",
+                               mmseqs_search(pro_db, con_db, aln_db, args))
+            report.set_outputs(bytes=get_path_size(aln_db))
+
+        print("Clustering based on profile-profile alignments...")
+        with report.stage("cluster (hmm)", {"bytes": get_path_size(aln_db)}):
+            report.record_tool("mmseqs clust",
+                               mmseqs_clust(con_db, aln_db, res_db))
+            report.set_outputs(bytes=get_path_size(res_db))
+
+        print("Storing profile-based phamilies...")
+        with report.stage("parse (hmm)", {"bytes": get_path_size(res_db)}):
+            # Consensus sequences share the keys, and so the identifiers,
+            # of the pre-pham representatives in the sequence database
+            report.record_tool("mmseqs createtsv",
+                               mmseqs_createtsv(seq_db, res_db, h_out))
+            hmm_phams = parse_mmseqs_clusters(h_out)
+            report.set_outputs(phams=len(hmm_phams))
+
+        print("Merging sequence and profile-based phamilies...")
+        with report.stage("merge", {"phams": len(pre_phams)}):
+            new_phams = merge_pre_and_hmm_phams(hmm_phams, pre_phams,
+                                                con_lookup)
+            report.set_outputs(phams=len(new_phams))
+    else:
+        new_phams = pre_phams
+
+    return new_phams, pro_db
+
+
+def incremental_phamerate(old_phams, new_genes, translation_groups,
+                          genes_and_translations, tmp, args, report=None):
+    """
+    Assorts only the translations of unphamerated genes into phams, by
+    searching them against the pham profiles saved by an earlier run.
+    Sequences that hit one pham join it; phams that are bridged by a new
+    sequence are re-clustered together with the sequences that found no
+    home, and the results replace them.
+    :param old_phams: the dictionary that maps old phams to their genes
+    :param new_genes: the set of previously unphamerated genes
+    :param translation_groups: translations and their geneids
+    :param genes_and_translations: geneids and their translations
+    :param tmp: temporary directory for file I/O
+    :param args: parsed command line arguments
+    :param report: record of the time and memory used by each stage
+    :return: new_phams, or None if no usable profiles were saved
+    """
+    if report is None:
+        report = StageReport()
+
+    profile_dir = args["profile_dir"]
+    if not check_profile_state(profile_dir, args["db"]):
+        print("No saved pham profiles found for this database... "
+              "running full phameration")
+        return None
+    saved_db = f"{profile_dir}/profileDB"
+
+    # Start from the existing phams, keyed by their current names
+    new_phams = {key: set(pham) for key, pham in old_phams.items()}
+
+    new_translations = get_new_translations(translation_groups, new_genes)
+    print(f"Found {len(new_translations)} new non-redundant translations...")
+    if len(new_translations) == 0:
+        return new_phams
+
+    new_fasta = f"{tmp}/new.fasta"              # New translations (FASTA)
+    new_db = f"{tmp}/newSequenceDB"             # New sequence database
+    aln_db = f"{tmp}/newAlignDB"                # Sequence-profile hits
+    hits_out = f"{tmp}/new_hits.tsv"            # Hits (query, target)
+
+    print("Writing new sequences to fasta...")
+    with report.stage("FASTA write",
+                      {"translations": len(new_translations)}):
+        write_fasta({t: translation_groups[t] for t in new_translations},
+                    new_fasta)
+        report.set_outputs(bytes=get_path_size(new_fasta))
+
+    print("Creating MMseqs2 sequence database for new sequences...")
+    with report.stage("createdb", {"bytes": get_path_size(new_fasta)}):
+        report.record_tool("mmseqs createdb",
+                           mmseqs_createdb(new_fasta, new_db))
+        report.set_outputs(bytes=get_path_size(new_db))
+
+    print("Searching new sequences against saved pham profiles...")
+    with report.stage("search", {"translations": len(new_translations),
+                                 "bytes": get_path_size(saved_db)}):
+        returncode = mmseqs_search_profiles(new_db, saved_db, aln_db, args)
+        report.record_tool("mmseqs search", returncode)
+        report.set_outputs(bytes=get_path_size(aln_db))
+    if returncode != 0:
+        print("Failed to search saved pham profiles... running full "
+              "phameration")
+        return None
+
+    with report.stage("parse", {"bytes": get_path_size(aln_db)}):
+        returncode = mmseqs_convertalis(new_db, saved_db, aln_db, hits_out)
+        report.record_tool("mmseqs convertalis", returncode)
+        if returncode == 0:
+            hits = parse_mmseqs_hits(hits_out)
+            report.set_outputs(queries=len(hits))
+    if returncode != 0:
+        print("Failed to convert saved pham profile hits... running full "
+              "phameration")
+        return None
+
+    gene_index, _ = index_pham_genes(old_phams)
+    queries = [translation_groups[t][0] for t in new_translations]
+    assignments, affected, unassigned = assign_new_translations(
+                                                queries, hits, gene_index)
+    print(f"Added {sum([len(x) for x in assignments.values()])} new "
+          f"sequences to {len(assignments)} existing phamilies...")
+
+    for pham, geneids in assignments.items():
+        new_phams[pham].update(geneids)
+
+    # Affected phams are re-clustered with the sequences that were unplaced
+    recluster = set()
+    for geneid in unassigned:
+        recluster.add(genes_and_translations[geneid])
+    for pham in affected:
+        for geneid in new_phams.pop(pham):
+            recluster.add(genes_and_translations[geneid])
+
+    if len(recluster) == 0:
+        return new_phams
+
+    print(f"Re-clustering {len(affected)} affected phamilies with "
+          f"{len(unassigned)} unplaced sequences...")
+    sub_tmp = f"{tmp}/recluster"
+    os.makedirs(sub_tmp, exist_ok=True)
+    sub_fasta = f"{sub_tmp}/input.fasta"
+    write_fasta({t: translation_groups[t] for t in recluster}, sub_fasta)
+    sub_phams, sub_pro_db = mmseqs_phamerate(sub_fasta, sub_tmp, args,
+                                             report)
+
+    next_key = max(new_phams.keys(), default=0) + 1
+    for pham in sub_phams.values():
+        new_phams[next_key] = set(pham)
+        next_key += 1
+
+    # Saved profiles still map onto phams through their representative
+    # genes; those of re-clustered phams are replaced by new profiles
+    print("Replacing affected pham profiles in saved profiles...")
+    keys_file = f"{tmp}/kept_profiles.txt"
+    kept_db = f"{tmp}/keptProfileDB"
+    merged_db = f"{tmp}/mergedProfileDB"
+    with report.stage("profile", {"bytes": get_path_size(sub_pro_db)}):
+        kept_keys = get_kept_profile_keys(parse_mmseqs_headers(saved_db),
+                                          gene_index, affected)
+        with open(keys_file, "w") as fh:
+            for key in kept_keys:
+                fh.write(f"{key}\n")
+
+        returncode = mmseqs_createsubdb(keys_file, saved_db, kept_db)
+        report.record_tool("mmseqs createsubdb", returncode)
+        if returncode == 0:
+            returncode = mmseqs_concatdbs(kept_db, sub_pro_db, merged_db)
+            report.record_tool("mmseqs concatdbs", returncode)
+
+        # Leave the saved profiles alone rather than save a partial copy
+        if returncode == 0:
+            save_profile_state(merged_db, profile_dir, args["db"])
+            report.set_outputs(bytes=get_path_size(merged_db))
+        else:
+            print("Failed to update saved pham profiles")
+
+    return new_phams
+
+
+def search_shards(chunks, tmp, blast_db, args):
+    """
+    Shares the blastp chunks of a sharded blast-mcl run with blastp-worker
+    processes through the work directory, searches them with this
+    machine's --threads workers (if any), and waits until they have all
+    been searched. The manifest and the chunks' lock files and markers
+    are removed afterwards, so workers stop and don't mistake them for
+    those of the next run.
+    :param chunks: chunks of translations and their geneids
+    :param tmp: shared work directory
+    :param blast_db: name of the blast database in the work directory
+    :param args: parsed command line arguments
+    :return: failed, unfinished
+    """
+    print("Writing blastp work manifest for blastp-worker processes...")
+    manifest = blastp_shards.write_manifest(chunks, tmp, blast_db,
+                                            args["e_value"],
+                                            args["query_cov"])
+
+    workers = []
+    try:
+        if args["threads"] > 0:
+            print("Running blastp...")
+            workers = blastp_shards.start_shard_workers(tmp, args["threads"])
+
+        print("Waiting for blastp-worker processes...")
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                tmp, manifest, timeout=args["shard_timeout"])
+    finally:
+        # Workers still running stop once the manifest is gone
+        blastp_shards.remove_manifest(tmp)
+        for worker in workers:
+            worker.join()
+
+    return failed, unfinished
+
+
 def main(argument_list):
     # Set up the argument parser
     parser = setup_argparser()
@@ -130,18 +510,30 @@ def main(argument_list):
     # Temporary directory gets its own variable because we'll use it a lot
     tmp = args["tmp_dir"]
 
+    # Make a note of which workflow we're using
+    program = args["program"]
+
+    # Workers only search blastp chunks, without touching the database
+    if program == "blastp-worker":
+        print("Searching blastp chunks...")
+        searched = blastp_shards.run_shard_workers(tmp, args["threads"],
+                                                   wait=args["wait"])
+        print(f"Searched {len(searched)} blastp chunks")
+        return
+
     # Create config object with data obtained from file and/or defaults.
     config = build_complete_config(args["config_file"])
     mysql_creds = config["mysql"]
 
-    # Make a note of which workflow we're using based on len(args)
-    if len(args) > 10:
-        program = "mmseqs"
-    else:
-        program = "blast-mcl"
+    if program == "blast-mcl" and args["mcl_engine"] == "scipy" and \
+            importlib.util.find_spec("scipy") is None:
+        print("The scipy engine requires SciPy to be installed "
+              "(pip install pdm_utils[mcl]). Terminating pipeline")
+        return
 
     # Record start time
     start_time = datetime.now()
+    report = StageReport(pipeline=program)
 
     # Initialize SQLAlchemy engine with database provided at CLI
     alchemist = AlchemyHandler(database=args["db"],
@@ -153,16 +545,17 @@ def main(argument_list):
     # Refresh temp_dir
     refresh_tempdir(tmp)
 
-    # Get old pham data and un-phamerated genes
-    old_phams = get_pham_geneids(engine)
-    old_colors = get_pham_colors(engine)
-    new_genes = get_new_geneids(engine)
-
-    # Get GeneIDs & translations, and translation groups
+    # Get GeneIDs & translations, translation groups, old pham data and
+    # un-phamerated genes in a single pass over the gene table
     # gene_x: translation_x
-    genes_and_translations = get_geneids_and_translations(engine)
     # translation_x: [gene_x, ..., gene_z]
-    translation_groups = get_translation_groups(engine)
+    with report.stage("DB load"):
+        genes_and_translations, translation_groups, old_phams, new_genes = \
+            load_gene_data(engine)
+        old_colors = get_pham_colors(engine)
+        report.set_outputs(genes=len(genes_and_translations),
+                           translations=len(translation_groups),
+                           phams=len(old_phams))
 
     # Print initial state
     initial_summary = f"""
@@ -178,144 +571,167 @@ Initial database summary:
 """
     print(initial_summary)
 
-    # Write input fasta file
-    print("Writing non-redundant sequences to input fasta...")
-    infile = f"{tmp}/input.fasta"
-    write_fasta(translation_groups, infile)
-
     # Here is where the workflow selection comes into play
     if program == "mmseqs":
-        seq_db = f"{tmp}/sequenceDB"            # MMseqs2 sequence database
-        clu_db = f"{tmp}/clusterDB"             # MMseqs2 cluster database
-        psf_db = f"{tmp}/seqfileDB"             # pre-pham seqfile database
-        p_out = f"{tmp}/pre_out.fasta"          # pre-pham output (FASTA)
-
-        print("Creating MMseqs2 sequence database...")
-        mmseqs_createdb(infile, seq_db)
-
-        print("Clustering sequence database...")
-        mmseqs_cluster(seq_db, clu_db, args)
-
-        print("Storing sequence-based phamilies...")
-        mmseqs_createseqfiledb(seq_db, clu_db, psf_db)
-        mmseqs_result2flat(seq_db, seq_db, psf_db, p_out)
-        pre_phams = parse_mmseqs_output(p_out)      # Parse pre-pham output
-
-        # Proceed with profile clustering, if allowed
-        if not args["skip_hmm"]:
-            con_lookup = dict()
-            for name, geneids in pre_phams.items():
-                for geneid in geneids:
-                    con_lookup[geneid] = name
-
-            pro_db = f"{tmp}/profileDB"         # MMseqs2 profile database
-            con_db = f"{tmp}/consensusDB"       # Consensus sequence database
-            aln_db = f"{tmp}/alignDB"           # Alignment database
-            res_db = f"{tmp}/resultDB"          # Cluster database
-            hsf_db = f"{tmp}/hmmSeqfileDB"      # hmm-pham seqfile database
-            h_out = f"{tmp}/hmm_out.fasta"      # hmm-pham output (FASTA)
-
-            print("Creating HMM profiles from sequence-based phamilies...")
-            mmseqs_result2profile(seq_db, clu_db, pro_db)
-
-            print("Extracting consensus sequences from HMM profiles...")
-            mmseqs_profile2consensus(pro_db, con_db)
-
-            print("Searching for profile-profile hits...")
-            mmseqs_search(pro_db, con_db, aln_db, args)
-
-            print("Clustering based on profile-profile alignments...")
-            mmseqs_clust(con_db, aln_db, res_db)
-
-            print("Storing profile-based phamilies...")
-            mmseqs_createseqfiledb(seq_db, res_db, hsf_db)
-            mmseqs_result2flat(pro_db, con_db, hsf_db, h_out)
-            hmm_phams = parse_mmseqs_output(h_out)
-
-            print("Merging sequence and profile-based phamilies...")
-            new_phams = merge_pre_and_hmm_phams(
-                hmm_phams, pre_phams, con_lookup)
-        else:
-            new_phams = pre_phams
+        new_phams = None
+        if args["incremental"]:
+            new_phams = incremental_phamerate(old_phams, new_genes,
+                                              translation_groups,
+                                              genes_and_translations, tmp,
+                                              args, report)
+
+        # Full phameration if not incremental, or no profiles were saved
+        if new_phams is None:
+            # Write input fasta file
+            print("Writing non-redundant sequences to input fasta...")
+            infile = f"{tmp}/input.fasta"
+            with report.stage("FASTA write",
+                              {"translations": len(translation_groups)}):
+                write_fasta(translation_groups, infile)
+                report.set_outputs(bytes=get_path_size(infile))
+
+            new_phams, pro_db = mmseqs_phamerate(infile, tmp, args, report)
+
+            if args["profile_dir"] is not None:
+                print("Saving pham profiles for incremental phameration...")
+                save_profile_state(pro_db, args["profile_dir"], args["db"])
     else:
+        # Write input fasta file
+        print("Writing non-redundant sequences to input fasta...")
+        infile = f"{tmp}/input.fasta"
+        with report.stage("FASTA write",
+                          {"translations": len(translation_groups)}):
+            write_fasta(translation_groups, infile)
+            report.set_outputs(bytes=get_path_size(infile))
+
         blast_db = "blastdb"
         blast_path = f"{tmp}/{blast_db}"
 
         print("Creating blast protein database...")
-        create_blastdb(infile, blast_db, blast_path)
+        with report.stage("createdb", {"bytes": get_path_size(infile)}):
+            report.record_tool("makeblastdb",
+                               create_blastdb(infile, blast_db, blast_path))
+            report.set_outputs(bytes=get_path_size(blast_path))
 
         print("Splitting non-redundant sequences into multiple blastp query "
               "files...")
-        chunks = chunk_translations(translation_groups)
-
-        jobs = []
-        for key, chunk in chunks.items():
-            jobs.append((key, chunk, tmp, blast_path, 
-                         args["e_value"], args["query_cov"]))
-
-        print("Running blastp...")
-        parallelize(jobs, args["threads"], blastp)
-
-        print("Converting blastp output into adjacency matrix for mcl...")
-        results = [x for x in os.listdir(tmp) if x.endswith(".tsv")]
-        adjacency = f"{tmp}/blast_adjacency.abc"
-        with open(adjacency, "w") as fh:
-            for result in results:
-                f = open(f"{tmp}/{result}", "r")
-                for line in f:
-                    fh.write(line)
-                f.close()
-
-        print("Running mcl on adjacency matrix...")
-        outfile = markov_cluster(adjacency, args["inflate"], tmp)
+        # A sharded run with --threads 0 only coordinates other workers
+        chunks = chunk_translations(translation_groups,
+                                    workers=max(1, args["threads"]))
+
+        with report.stage("search", {"chunks": len(chunks)}):
+            if args["sharded"]:
+                failed, unfinished = search_shards(chunks, tmp, blast_db,
+                                                   args)
+                returncodes = [1] * (len(failed) + len(unfinished))
+            else:
+                jobs = []
+                for key, chunk in chunks.items():
+                    jobs.append((key, chunk, tmp, blast_path,
+                                 args["e_value"], args["query_cov"]))
+
+                print("Running blastp...")
+                returncodes = parallelize(jobs, args["threads"], blastp)
+
+            # One status for all chunks: the first failure, if any
+            failures = [x for x in returncodes if x != 0]
+            report.record_tool("blastp", failures[0] if failures else 0)
+
+            results = [f"{tmp}/{x}" for x in os.listdir(tmp)
+                       if x.endswith(".tsv")]
+            report.set_outputs(bytes=sum(get_path_size(x) for x in results))
+
+        if args["sharded"] and len(failed) + len(unfinished) > 0:
+            print(f"blastp failed on {len(failed)} chunks, and "
+                  f"{len(unfinished)} chunks were not searched... "
+                  f"Terminating pipeline")
+            write_report(report, tmp)
+            return
 
-        print("Storing blast-mcl phamilies...")
-        new_phams = parse_mcl_output(outfile)
+        results_size = {"bytes": sum(get_path_size(x) for x in results)}
+        if args["mcl_engine"] == "scipy":
+            print("Running Markov clustering on blastp output...")
+            with report.stage("cluster", results_size):
+                new_phams = sparse_markov_cluster(results, args["inflate"],
+                                                  args["prune"],
+                                                  args["select"])
+                report.set_outputs(phams=len(new_phams))
+        else:
+            print("Converting blastp output into adjacency matrix for "
+                  "mcl...")
+            adjacency = f"{tmp}/blast_adjacency.abc"
+            outfile = f"{tmp}/mcl_clusters.txt"
+            with report.stage("cluster", results_size):
+                with open(adjacency, "w") as fh:
+                    for result in results:
+                        f = open(result, "r")
+                        for line in f:
+                            fh.write(line)
+                        f.close()
+
+                print("Running mcl on adjacency matrix...")
+                report.record_tool("mcl", run_mcl(adjacency, args["inflate"],
+                                                  outfile))
+                report.set_outputs(bytes=get_path_size(outfile))
+
+            print("Storing blast-mcl phamilies...")
+            with report.stage("parse", {"bytes": get_path_size(outfile)}):
+                new_phams = parse_mcl_output(outfile)
+                report.set_outputs(phams=len(new_phams))
 
         # Some proteins don't have even self-hits in blastp - take a
         # census of who is missing, and add them as "orphams"
-        mcl_genes = set()
-        for name, pham in new_phams.items():
-            for gene in pham:
-                mcl_genes.add(genes_and_translations[gene])
-
-        all_trans = set(translation_groups.keys())
-
-        # Some genes don't have blast hits, even to themselves. These are
-        # not in the blast output and need to be re-inserted as orphams.
-        missing = all_trans - mcl_genes
-        for translation in missing:
-            new_phams[len(new_phams) + 1] = \
-                [translation_groups[translation][0]]
+        with report.stage("merge", {"phams": len(new_phams)}):
+            mcl_genes = set()
+            for name, pham in new_phams.items():
+                for gene in pham:
+                    mcl_genes.add(genes_and_translations[gene])
+
+            all_trans = set(translation_groups.keys())
+
+            # Some genes don't have blast hits, even to themselves. These
+            # are not in the blast output and need to be re-inserted as
+            # orphams.
+            missing = all_trans - mcl_genes
+            for translation in missing:
+                new_phams[len(new_phams) + 1] = \
+                    [translation_groups[translation][0]]
+            report.set_outputs(phams=len(new_phams))
 
     # Reintroduce duplicates
     print("Propagating phamily assignments to duplicate genes...")
-    new_phams = reintroduce_duplicates(new_phams, translation_groups,
-                                       genes_and_translations)
+    with report.stage("reintroduce", {"phams": len(new_phams)}):
+        new_phams = reintroduce_duplicates(new_phams, translation_groups,
+                                           genes_and_translations)
+        report.set_outputs(genes=sum([len(x) for x in new_phams.values()]))
 
     # Preserve old pham names and colors
     print("Preserving old phamily names/colors where possible...")
-    new_phams, new_colors = preserve_phams(old_phams, new_phams,
-                                           old_colors, new_genes)
+    with report.stage("preserve", {"phams": len(new_phams)}):
+        new_phams, new_colors = preserve_phams(old_phams, new_phams,
+                                               old_colors, new_genes)
+        report.set_outputs(phams=len(new_phams))
 
     # Early exit if we don't have new phams or new colors - avoids
     # overwriting the existing pham data with incomplete new data
     if len(new_phams) == 0 or len(new_colors) == 0:
         print("Failed to parse new pham/color data properly... Terminating "
               "pipeline")
+        write_report(report, tmp)
         return
 
     # Update gene/pham tables with new pham data. Pham colors need to be done
     # first, because gene.PhamID is a foreign key to pham.PhamID.
     print("Updating pham data in database...")
-    update_pham_table(new_colors, engine)
-    update_gene_table(new_phams, engine)
+    with report.stage("DB write", {"phams": len(new_phams)}):
+        update_pham_table(new_colors, engine)
+        update_gene_table(new_phams, engine)
 
-    # Fix miscolored phams/orphams
-    print("Phixing phalsely phlagged orphams...", end=" ")
-    fix_white_phams(engine)
-    print("Phixing phalsely hued phams...", end=" ")
-    fix_colored_orphams(engine)
+        # Fix miscolored phams/orphams
+        print("Phixing phalsely phlagged orphams...", end=" ")
+        fix_white_phams(engine)
+        print("Phixing phalsely hued phams...", end=" ")
+        fix_colored_orphams(engine)
 
     # Close all connections in the connection pool.
     engine.dispose()
@@ -334,6 +750,9 @@ Final database summary:
 """
     print(final_summary)
 
+    # Report time and memory used by each stage
+    write_report(report, tmp)
+
     # Record stop time
     stop_time = datetime.now()
     elapsed_time = str(stop_time - start_time)
@@ -342,5 +761,24 @@ Final database summary:
     print(f"Elapsed time: {elapsed_time}")
 
 
+def write_report(report, tmp):
+    """
+    Prints the time and memory used by each stage of the pipeline, and
+    writes them to a JSON report in the temporary directory.
+    :param report: record of the time and memory used by each stage
+    :param tmp: temporary directory for file I/O
+    :return:
+    """
+    print(report.format_table())
+
+    for stage, tool, returncode in report.get_failed_tools():
+        print(f"Warning: {tool} exited with status {returncode} during "
+              f"the {stage} stage")
+
+    report_path = f"{tmp}/{REPORT_NAME}"
+    report.write(report_path)
+    print(f"Stage report written to {report_path}")
+
+
 if __name__ == "__main__":
     main(sys.argv[1:])
@@ -94,6 +94,53 @@ class TestAnnotationRetrieval(unittest.TestCase):
 
                 self.assertTrue(isinstance(annotation_counts[key], int))
 
+    def test_get_count_annotations_in_phams_1(self):
+        """Verify get_count_annotations_in_phams() matches the per pham
+        function."""
+        counts = annotation.get_count_annotations_in_phams(self.alchemist,
+                                                           [42006])
+
+        self.assertEqual(counts[42006],
+                         annotation.get_count_annotations_in_pham(
+                                                        self.alchemist, 42006))
+
+    def test_get_genes_adjacent_to_phams_1(self):
+        """Verify get_genes_adjacent_to_phams() matches the per pham
+        function."""
+        adjacent_genes = annotation.get_genes_adjacent_to_phams(
+                                                        self.alchemist, [42006])
+        expected = annotation.get_genes_adjacent_to_pham(self.alchemist, 42006)
+
+        self.assertEqual(sorted(adjacent_genes[42006][0]), sorted(expected[0]))
+        self.assertEqual(sorted(adjacent_genes[42006][1]), sorted(expected[1]))
+
+    def test_build_neighbour_index_1(self):
+        """Verify build_neighbour_index() finds GeneID-numbered neighbours."""
+        neighbour_index = annotation.build_neighbour_index(self.alchemist)
+
+        self.assertEqual(neighbour_index["Trixie_CDS_2"],
+                         ("Trixie_CDS_1", "Trixie_CDS_3"))
+        self.assertEqual(neighbour_index["Trixie_CDS_1"][0], None)
+
+    def test_load_neighbour_index_1(self):
+        """Verify load_neighbour_index() reuses a persisted index."""
+        index_file = Path("/tmp", "pdm_utils_tests_neighbour_index.json")
+        if index_file.exists():
+            index_file.unlink()
+
+        neighbour_index = annotation.load_neighbour_index(
+                                        self.alchemist, index_file=index_file)
+        self.assertTrue(index_file.is_file())
+
+        with patch("pdm_utils.functions.annotation.build_neighbour_index") \
+                as build_mock:
+            loaded_index = annotation.load_neighbour_index(
+                                        self.alchemist, index_file=index_file)
+            build_mock.assert_not_called()
+
+        index_file.unlink()
+        self.assertEqual(loaded_index, neighbour_index)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,232 @@
+"""Integration tests for sharing blastp chunks between worker processes."""
+
+import multiprocessing as mp
+import os
+import shutil
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from pdm_utils.functions import blastp_shards
+
+TMPDIR_PREFIX = "pdm_utils_tests_blastp_shards_"
+# Can set TMPDIR_BASE to string such as "/tmp/" to track tmp directory location
+TMPDIR_BASE = "/tmp"
+
+
+def fake_blastp(in_name, db_path, out_name, evalue, query_cov):
+    """Stands in for blastp by reporting a self-hit for every query."""
+    time.sleep(0.05)
+    with open(in_name, "r") as in_handle, open(out_name, "w") as out_handle:
+        for line in in_handle:
+            if line.startswith(">"):
+                geneid = line[1:].rstrip()
+                out_handle.write(f"{geneid}\t{geneid}\t0.0\n")
+    return 0
+
+
+def failed_blastp(in_name, db_path, out_name, evalue, query_cov):
+    """Stands in for a blastp run that exits with an error."""
+    return 2
+
+
+@patch("pdm_utils.functions.phameration.run_blastp", new=fake_blastp)
+class TestBlastpShards(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.tmp = str(self.test_dir)
+
+        self.chunks = dict()
+        for i in range(12):
+            self.chunks[i] = ((f"MKV{'L' * i}", f"Trixie_CDS_{i}"),)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def start_workers(self, count, wait=0):
+        workers = []
+        for i in range(count):
+            worker = mp.Process(target=blastp_shards.shard_worker,
+                                args=(self.tmp, f"worker{i}", wait, 0.05))
+            worker.start()
+            workers.append(worker)
+        return workers
+
+    def read_outputs(self):
+        hits = []
+        for index in self.chunks.keys():
+            output = blastp_shards.get_output_path(self.tmp, index)
+            with open(output, "r") as fh:
+                hits.extend(x.split("\t")[0] for x in fh)
+        return hits
+
+    def test_shard_worker_1(self):
+        """Verify several worker processes search every chunk once."""
+        manifest = blastp_shards.write_manifest(self.chunks, self.tmp,
+                                                "blastdb", 0.001, 0.5)
+        workers = self.start_workers(3)
+        for worker in workers:
+            worker.join(30)
+
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                                self.tmp, manifest, timeout=0)
+        searched_by = []
+        for index in self.chunks.keys():
+            done = blastp_shards.get_done_path(self.tmp, index)
+            searched_by.append(Path(done).read_text())
+        with self.subTest():
+            self.assertEqual((failed, unfinished), ([], []))
+        with self.subTest():
+            self.assertEqual(sorted(self.read_outputs()),
+                             sorted(f"Trixie_CDS_{i}" for i in range(12)))
+        with self.subTest():
+            self.assertGreater(len(set(searched_by)), 1)
+        with self.subTest():
+            self.assertEqual([x for x in os.listdir(self.tmp)
+                              if x.endswith(".part")], [])
+
+    def test_shard_worker_2(self):
+        """Verify workers started before the manifest wait for it."""
+        workers = self.start_workers(2, wait=30)
+        time.sleep(0.2)
+        manifest = blastp_shards.write_manifest(self.chunks, self.tmp,
+                                                "blastdb", 0.001, 0.5)
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                            self.tmp, manifest, poll=0.05,
+                                            timeout=30)
+        for worker in workers:
+            worker.join(30)
+        with self.subTest():
+            self.assertEqual((failed, unfinished), ([], []))
+        with self.subTest():
+            self.assertEqual(len(self.read_outputs()), 12)
+
+    def test_shard_worker_3(self):
+        """Verify a worker gives up if no manifest is written."""
+        searched = blastp_shards.shard_worker(self.tmp, "worker0", wait=0)
+        self.assertEqual(searched, [])
+
+    def test_shard_worker_4(self):
+        """Verify failed searches are reported and not retried."""
+        manifest = blastp_shards.write_manifest({0: self.chunks[0]},
+                                                self.tmp, "blastdb",
+                                                0.001, 0.5)
+        with patch("pdm_utils.functions.phameration.run_blastp",
+                   new=failed_blastp):
+            searched = blastp_shards.shard_worker(self.tmp, "worker0",
+                                                  poll=0.05)
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                                self.tmp, manifest, timeout=0)
+        with self.subTest():
+            self.assertEqual(searched, [])
+        with self.subTest():
+            self.assertEqual((failed, unfinished), ([0], []))
+
+    def test_shard_worker_5(self):
+        """Verify a worker ignores the stale manifest of an interrupted run."""
+        blastp_shards.write_manifest(self.chunks, self.tmp, "blastdb",
+                                     0.001, 0.5)
+        manifest_path = self.test_dir.joinpath(blastp_shards.MANIFEST_NAME)
+        os.utime(manifest_path, (time.time() - 600, time.time() - 600))
+        searched = blastp_shards.shard_worker(self.tmp, "worker0", wait=0.2,
+                                              poll=0.05, stale_after=300)
+        with self.subTest():
+            self.assertEqual(searched, [])
+        with self.subTest():
+            self.assertEqual(os.listdir(self.test_dir.joinpath("done")), [])
+
+    def test_shard_worker_6(self):
+        """Verify a waiting worker exits once the manifest is removed."""
+        blastp_shards.write_manifest(self.chunks, self.tmp, "blastdb",
+                                     0.001, 0.5)
+        for index in self.chunks.keys():
+            blastp_shards.claim_chunk(self.tmp, index, "other")
+        workers = self.start_workers(1)
+        time.sleep(0.2)
+        blastp_shards.remove_manifest(self.tmp)
+        workers[0].join(5)
+        with self.subTest():
+            self.assertFalse(workers[0].is_alive())
+        with self.subTest():
+            self.assertEqual(workers[0].exitcode, 0)
+
+    def test_is_current_run_1(self):
+        """Verify a manifest is only current until it is rewritten."""
+        first = blastp_shards.write_manifest(self.chunks, self.tmp,
+                                             "blastdb", 0.001, 0.5)
+        current = blastp_shards.is_current_run(self.tmp, first)
+        blastp_shards.write_manifest(self.chunks, self.tmp, "blastdb",
+                                     0.001, 0.5)
+        rewritten = blastp_shards.is_current_run(self.tmp, first)
+        self.assertEqual((current, rewritten), (True, False))
+
+    def test_remove_manifest_1(self):
+        """Verify the manifest, locks and markers are removed."""
+        blastp_shards.write_manifest(self.chunks, self.tmp, "blastdb",
+                                     0.001, 0.5)
+        blastp_shards.claim_chunk(self.tmp, 0, "worker0")
+        blastp_shards.remove_manifest(self.tmp)
+        remaining = [x for x in os.listdir(self.tmp)
+                     if not x.startswith("input")]
+        self.assertEqual(remaining, [])
+
+    def test_wait_for_shards_1(self):
+        """Verify waiting goes on past the timeout while a worker touches
+        its lock."""
+        manifest = blastp_shards.write_manifest({0: self.chunks[0]},
+                                                self.tmp, "blastdb",
+                                                0.001, 0.5)
+        blastp_shards.claim_chunk(self.tmp, 0, "worker0")
+        lock = blastp_shards.get_lock_path(self.tmp, 0)
+
+        def search():
+            for _ in range(10):
+                time.sleep(0.05)
+                os.utime(lock)
+            Path(blastp_shards.get_done_path(self.tmp, 0)).touch()
+
+        worker = threading.Thread(target=search)
+        worker.start()
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                    self.tmp, manifest, poll=0.05,
+                                    timeout=0.2)
+        worker.join()
+        self.assertEqual((failed, unfinished), ([], []))
+
+    def test_wait_for_shards_2(self):
+        """Verify waiting stops once no worker has touched a lock for the
+        timeout."""
+        manifest = blastp_shards.write_manifest({0: self.chunks[0]},
+                                                self.tmp, "blastdb",
+                                                0.001, 0.5)
+        blastp_shards.claim_chunk(self.tmp, 0, "worker0")
+        lock = blastp_shards.get_lock_path(self.tmp, 0)
+        os.utime(lock, (time.time() - 600, time.time() - 600))
+        failed, unfinished = blastp_shards.wait_for_shards(
+                                    self.tmp, manifest, poll=0.05,
+                                    timeout=0.2)
+        self.assertEqual((failed, unfinished), ([], [0]))
+
+    def test_claim_chunk_1(self):
+        """Verify a held lock can't be claimed until it goes stale."""
+        blastp_shards.write_manifest(self.chunks, self.tmp, "blastdb",
+                                     0.001, 0.5)
+        lock = blastp_shards.get_lock_path(self.tmp, 0)
+        first = blastp_shards.claim_chunk(self.tmp, 0, "worker0")
+        second = blastp_shards.claim_chunk(self.tmp, 0, "worker1")
+        os.utime(lock, (time.time() - 600, time.time() - 600))
+        third = blastp_shards.claim_chunk(self.tmp, 0, "worker1",
+                                          stale_after=300)
+        with self.subTest():
+            self.assertEqual((first, second, third), (True, False, True))
+        with self.subTest():
+            self.assertEqual(Path(lock).read_text(), "worker1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,8 @@ import unittest
 from pathlib import Path
 
 from Bio import Entrez, SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 
 from pdm_utils.classes.alchemyhandler import AlchemyHandler
 from pdm_utils.classes.filter import Filter
@@ -393,5 +395,61 @@ class TestFeatureTableParser(unittest.TestCase):
         self.assertTrue(len(file_diffs[1]) == 0)
 
 
+class TestWriteSeqRecords(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE).joinpath(TMPDIR_PREFIX + "write")
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+
+        self.records = []
+        for name, seq in [("Trixie", "ATCG"), ("L5", "GGCC"),
+                          ("D29", "TTAA")]:
+            record = SeqRecord(Seq(seq), id=name, name=name, description="")
+            self.records.append(record)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_write_seqrecords_1(self):
+        """Verify records are written to separate files by several
+        processes."""
+        results = fileio.write_seqrecords(self.records, "fasta",
+                                          self.test_dir, threads=2)
+        names = sorted(x.stem for x in self.test_dir.iterdir())
+        record = SeqIO.read(self.test_dir.joinpath("L5.fasta"), "fasta")
+        with self.subTest():
+            self.assertEqual(names, ["D29", "L5", "Trixie"])
+        with self.subTest():
+            self.assertEqual(str(record.seq), "GGCC")
+        with self.subTest():
+            self.assertEqual([x[1] for x in results], [None, None, None])
+
+    def test_write_seqrecords_2(self):
+        """Verify a file that cannot be written is reported without
+        stopping the other files."""
+        self.test_dir.joinpath("L5.fasta").mkdir()
+        results = fileio.write_seqrecords(self.records, "fasta",
+                                          self.test_dir, threads=2)
+        errors = {x[0].stem: x[1] for x in results}
+        with self.subTest():
+            self.assertIsNotNone(errors["L5"])
+        with self.subTest():
+            self.assertIsNone(errors["D29"])
+        with self.subTest():
+            self.assertTrue(self.test_dir.joinpath("D29.fasta").is_file())
+
+    def test_write_seqrecords_3(self):
+        """Verify appended batches extend a concatenated file."""
+        fileio.write_seqrecords(self.records[:2], "fasta", self.test_dir,
+                                export_name="all", concatenate=True)
+        fileio.write_seqrecords(self.records[2:], "fasta", self.test_dir,
+                                export_name="all", concatenate=True,
+                                append=True)
+        records = list(SeqIO.parse(self.test_dir.joinpath("all.fasta"),
+                                   "fasta"))
+        self.assertEqual([x.id for x in records], ["Trixie", "L5", "D29"])
+
+
 if __name__ == "__main__":
     unittest.main()
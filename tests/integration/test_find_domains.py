@@ -0,0 +1,65 @@
+"""Integration tests for the find_domains search journal."""
+
+import shutil
+import unittest
+from pathlib import Path
+
+from pdm_utils.classes.domaincache import hash_translation
+from pdm_utils.pipelines import find_domains
+
+TMPDIR_PREFIX = "pdm_utils_tests_find_domains_"
+# Can set TMPDIR_BASE to string such as "/tmp/" to track tmp directory location
+TMPDIR_BASE = "/tmp"
+
+
+class TestSearchJournal(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.journal_file = Path(self.test_dir, find_domains.JOURNAL_FILE)
+
+        self.hit = {"HitID": "gnl|CDD|1", "DomainID": "cd00001",
+                    "Name": "Name", "Description": "100% description",
+                    "Expect": 1e-10, "QueryStart": 1, "QueryEnd": 50}
+        self.results = [{"Translation": "MKV", "Data": [self.hit]},
+                        {"Translation": "MKL", "Data": []}]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_read_journal_1(self):
+        """Verify journaled results are read back by translation hash."""
+        journal = find_domains.open_journal(self.journal_file, "cdd1", 0.001)
+        find_domains.write_journal(journal, self.results)
+        journal.close()
+        replay = find_domains.read_journal(self.journal_file, "cdd1", 0.001)
+        self.assertEqual(replay, {hash_translation("MKV"): [self.hit],
+                                  hash_translation("MKL"): []})
+
+    def test_read_journal_2(self):
+        """Verify a journal from another CDD version is ignored."""
+        journal = find_domains.open_journal(self.journal_file, "cdd1", 0.001)
+        find_domains.write_journal(journal, self.results)
+        journal.close()
+        replay = find_domains.read_journal(self.journal_file, "cdd2", 0.001)
+        self.assertEqual(replay, {})
+
+    def test_read_journal_3(self):
+        """Verify an incomplete last entry is ignored."""
+        journal = find_domains.open_journal(self.journal_file, "cdd1", 0.001)
+        find_domains.write_journal(journal, self.results[:1])
+        journal.write('{"Hash": "abc", "Da')
+        journal.close()
+        replay = find_domains.read_journal(self.journal_file, "cdd1", 0.001)
+        self.assertEqual(replay, {hash_translation("MKV"): [self.hit]})
+
+    def test_read_journal_4(self):
+        """Verify a missing journal returns no results."""
+        replay = find_domains.read_journal(self.journal_file, "cdd1", 0.001)
+        self.assertEqual(replay, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
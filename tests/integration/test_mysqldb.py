@@ -1001,5 +1001,27 @@ class TestMysqldbFunctions4(unittest.TestCase):
         return_code, msg = mysqldb.execute_transaction(self.engine)
         self.assertEqual(return_code, 0)
 
+    def test_execute_transaction_4(self):
+        """Parameterized bulk statements should be executed with all of
+        their parameters - return code 0."""
+        bulk = ("INSERT INTO phage "
+                "(PhageID, Accession, Name, HostGenus, Sequence, "
+                "Length, GC, Status, DateLastModified, "
+                "RetrieveRecord, AnnotationAuthor,"
+                "Cluster, Subcluster) "
+                "VALUES (%s, 'ABC123', %s, 'Mycobacterium', "
+                "'ATCG', 4, 0.5001, 'final', "
+                f"'{constants.EMPTY_DATE}', 1, 1, 'A', 'A2')")
+        params = [("D29", "D29_Draft"), ("L5", "L5_Draft")]
+        return_code, msg = mysqldb.execute_transaction(self.engine,
+                                                       [(bulk, params)])
+        query = "SELECT COUNT(PhageID) FROM phage"
+        result_list = self.engine.execute(query).fetchall()
+        count = result_list[0][0]
+        with self.subTest():
+            self.assertEqual(count, 3)
+        with self.subTest():
+            self.assertEqual(return_code, 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+"""Integration tests for the pham alignment cache."""
+
+import shutil
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from Bio import SeqIO
+
+from pdm_utils.functions import pham_alignment
+
+TMPDIR_PREFIX = "pdm_utils_tests_pham_alignment_"
+# Can set TMPDIR_BASE to string such as "/tmp/" to track tmp directory location
+TMPDIR_BASE = "/tmp"
+
+
+def fake_clustalo(fasta_path, aln_path):
+    """Stands in for Clustal Omega by gapping the end of each sequence."""
+    records = list(SeqIO.parse(str(fasta_path), "fasta"))
+    with open(aln_path, "w") as filehandle:
+        for record in records:
+            filehandle.write(f">{record.id}\n{str(record.seq)}--\n")
+    return aln_path
+
+
+class TestAlignmentCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.fasta_dir = self.test_dir.joinpath("fastas")
+        self.aln_dir = self.test_dir.joinpath("alns")
+        self.cache_dir = self.test_dir.joinpath("cache")
+        self.fasta_dir.mkdir(parents=True)
+        self.aln_dir.mkdir()
+
+        self.pham_translations = {"MKVLA": ["[A] Trixie_1", "[A] L5_1"],
+                                  "MKVLG": ["[B] D29_1"]}
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write_pham(self, pham_translations):
+        return pham_alignment.write_phams_process(
+                                self.fasta_dir, self.aln_dir, 1,
+                                pham_translations, self.cache_dir)
+
+    @patch("pdm_utils.functions.pham_alignment.run_clustalo")
+    def test_align_with_cache_1(self, run_clustalo_mock):
+        """Verify an unchanged pham reuses its cached alignment."""
+        run_clustalo_mock.side_effect = fake_clustalo
+        self.cache_dir.mkdir()
+        first = self.write_pham(self.pham_translations)
+        second = self.write_pham(self.pham_translations)
+        records = list(SeqIO.parse(str(self.aln_dir.joinpath("1_genes.aln")),
+                                   "fasta"))
+        with self.subTest():
+            self.assertEqual(first[0], "miss")
+        with self.subTest():
+            self.assertEqual(second[0], "hit")
+        with self.subTest():
+            self.assertEqual(run_clustalo_mock.call_count, 1)
+        with self.subTest():
+            self.assertEqual(len(records), 3)
+
+    @patch("pdm_utils.functions.pham_alignment.run_clustalo")
+    def test_align_with_cache_2(self, run_clustalo_mock):
+        """Verify cached alignments are relabeled with current gene names."""
+        run_clustalo_mock.side_effect = fake_clustalo
+        self.cache_dir.mkdir()
+        self.write_pham(self.pham_translations)
+        renamed = {"MKVLA": ["[A] Trixie_2"], "MKVLG": ["[B] D29_1"]}
+        self.write_pham(renamed)
+        records = SeqIO.parse(str(self.aln_dir.joinpath("1_genes.aln")),
+                              "fasta")
+        ids = {record.description: str(record.seq) for record in records}
+        self.assertEqual(ids["[A] Trixie_2"], "MKVLA--")
+
+    @patch("pdm_utils.functions.pham_alignment.run_clustalo")
+    def test_align_with_cache_3(self, run_clustalo_mock):
+        """Verify a pham with changed translations is aligned again."""
+        run_clustalo_mock.side_effect = fake_clustalo
+        self.cache_dir.mkdir()
+        self.write_pham(self.pham_translations)
+        changed = dict(self.pham_translations)
+        changed["MKVLT"] = ["[C] Bxz1_1"]
+        result = self.write_pham(changed)
+        with self.subTest():
+            self.assertEqual(result[0], "miss")
+        with self.subTest():
+            self.assertEqual(run_clustalo_mock.call_count, 2)
+
+    @patch("pdm_utils.functions.pham_alignment.run_clustalo")
+    def test_write_phams_1(self, run_clustalo_mock):
+        """Verify cache hits, misses, and time saved are summarized."""
+        run_clustalo_mock.side_effect = fake_clustalo
+        phams = {1: self.pham_translations, 2: {"MKI": ["[A] Trixie_3"]}}
+        pham_alignment.write_phams(self.fasta_dir, self.aln_dir, phams,
+                                   cores=1, verbose=False,
+                                   cache_dir=self.cache_dir)
+        summary = pham_alignment.write_phams(self.fasta_dir, self.aln_dir,
+                                             phams, cores=1, verbose=False,
+                                             cache_dir=self.cache_dir)
+        with self.subTest():
+            self.assertEqual(summary["hits"], 1)
+        with self.subTest():
+            self.assertEqual(summary["misses"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+"""Integration tests for incremental phameration against saved pham
+profiles and for sharded blastp searches, with the external tools
+mocked."""
+
+import json
+import multiprocessing as mp
+import shutil
+import time
+import unittest
+from functools import partial
+from pathlib import Path
+from unittest.mock import patch
+
+from pdm_utils.functions import blastp_shards
+from pdm_utils.functions import phameration
+from pdm_utils.pipelines import phamerate
+
+TMPDIR_PREFIX = "pdm_utils_tests_phamerate_"
+# Can set TMPDIR_BASE to string such as "/tmp/" to track tmp directory location
+TMPDIR_BASE = "/tmp"
+
+
+def write_header_db(database, geneids):
+    """Writes an MMseqs2 header database with one entry per geneid."""
+    offset = 0
+    with open(f"{database}_h", "wb") as data, \
+            open(f"{database}_h.index", "w") as index:
+        for key, geneid in enumerate(geneids):
+            entry = f"{geneid}\n".encode("utf-8") + b"\x00"
+            data.write(entry)
+            index.write(f"{key}\t{offset}\t{len(entry)}\n")
+            offset += len(entry)
+
+
+def fake_blastp(in_name, db_path, out_name, evalue, query_cov):
+    """Stands in for blastp by reporting a self-hit for every query."""
+    time.sleep(0.05)
+    with open(in_name, "r") as in_handle, open(out_name, "w") as out_handle:
+        for line in in_handle:
+            if line.startswith(">"):
+                geneid = line[1:].rstrip()
+                out_handle.write(f"{geneid}\t{geneid}\t0.0\n")
+    return 0
+
+
+class TestIncrementalPhamerate(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.tmp = str(self.test_dir.joinpath("tmp"))
+        self.profile_dir = str(self.test_dir.joinpath("profiles"))
+        Path(self.tmp).mkdir()
+        Path(self.profile_dir).mkdir()
+
+        # One saved profile per old pham, named by its representative
+        saved_db = f"{self.profile_dir}/profileDB"
+        Path(f"{saved_db}.dbtype").touch()
+        write_header_db(saved_db, ["A_1", "B_1", "C_1"])
+        with open(f"{self.profile_dir}/manifest.json", "w") as fh:
+            json.dump({"database": "Actino_Draft"}, fh)
+
+        self.old_phams = {1: {"A_1", "A_2"}, 2: {"B_1"}, 3: {"C_1"}}
+        self.new_genes = {"F_1", "F_2"}
+        self.genes_and_translations = {"A_1": "MKA", "A_2": "MKB",
+                                       "B_1": "MKC", "C_1": "MKD",
+                                       "F_1": "MKF", "F_2": "MKG"}
+        self.translation_groups = dict()
+        for geneid, translation in self.genes_and_translations.items():
+            self.translation_groups[translation] = [geneid]
+        self.args = {"db": "Actino_Draft", "profile_dir": self.profile_dir}
+
+        # F_1 hits one pham; F_2 bridges phams 2 and 3
+        self.hits = "F_1\tA_1\t1e-50\nF_2\tB_1\t1e-40\nF_2\tC_1\t1e-30\n"
+        self.kept_keys = list()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def convertalis(self, query_db, target_db, align_db, outfile):
+        with open(outfile, "w") as fh:
+            fh.write(self.hits)
+        return 0
+
+    def createsubdb(self, keys_file, source_db, sub_db):
+        with open(keys_file, "r") as fh:
+            self.kept_keys.extend(x.rstrip() for x in fh)
+        return 0
+
+    def concatdbs(self, first_db, second_db, concat_db):
+        Path(f"{concat_db}.dbtype").touch()
+        write_header_db(concat_db, ["A_1", "B_1"])
+        return 0
+
+    def mmseqs_phamerate(self, infile, tmp, args, report=None):
+        return {1: ["B_1", "C_1", "F_2"]}, f"{tmp}/profileDB"
+
+    def incremental_phamerate(self):
+        return phamerate.incremental_phamerate(
+                                self.old_phams, self.new_genes,
+                                self.translation_groups,
+                                self.genes_and_translations, self.tmp,
+                                self.args)
+
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_createdb", return_value=0)
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_search_profiles",
+           return_value=0)
+    def test_incremental_phamerate_1(self, search_mock, createdb_mock):
+        """Verify new genes join or re-cluster phams, and the profiles of
+        re-clustered phams are dropped from the saved profiles."""
+        with patch("pdm_utils.pipelines.phamerate.mmseqs_convertalis",
+                   new=self.convertalis), \
+                patch("pdm_utils.pipelines.phamerate.mmseqs_createsubdb",
+                      new=self.createsubdb), \
+                patch("pdm_utils.pipelines.phamerate.mmseqs_concatdbs",
+                      new=self.concatdbs), \
+                patch("pdm_utils.pipelines.phamerate.mmseqs_phamerate",
+                      new=self.mmseqs_phamerate):
+            new_phams = self.incremental_phamerate()
+
+        saved = phameration.parse_mmseqs_headers(
+                                        f"{self.profile_dir}/profileDB")
+        with self.subTest():
+            self.assertEqual(new_phams, {1: {"A_1", "A_2", "F_1"},
+                                         2: {"B_1", "C_1", "F_2"}})
+        with self.subTest():
+            self.assertEqual(self.kept_keys, ["0"])
+        with self.subTest():
+            self.assertEqual(saved, {"0": "A_1", "1": "B_1"})
+
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_convertalis")
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_createdb", return_value=0)
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_search_profiles",
+           return_value=1)
+    def test_incremental_phamerate_2(self, search_mock, createdb_mock,
+                                     convertalis_mock):
+        """Verify a failed profile search falls back to full phameration."""
+        new_phams = self.incremental_phamerate()
+        with self.subTest():
+            self.assertIsNone(new_phams)
+        with self.subTest():
+            convertalis_mock.assert_not_called()
+
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_convertalis",
+           return_value=1)
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_createdb", return_value=0)
+    @patch("pdm_utils.pipelines.phamerate.mmseqs_search_profiles",
+           return_value=0)
+    def test_incremental_phamerate_3(self, search_mock, createdb_mock,
+                                     convertalis_mock):
+        """Verify failing to convert profile hits falls back to full
+        phameration."""
+        self.assertIsNone(self.incremental_phamerate())
+
+
+@patch("pdm_utils.functions.phameration.run_blastp", new=fake_blastp)
+@patch("pdm_utils.functions.blastp_shards.wait_for_shards",
+       new=partial(blastp_shards.wait_for_shards, poll=0.05))
+class TestSearchShards(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+        self.tmp = str(self.test_dir)
+
+        translation_groups = dict()
+        for i in range(12):
+            translation_groups[f"MKV{'L' * i}"] = [f"Trixie_CDS_{i}"]
+        self.args = {"threads": 0, "e_value": 0.001, "query_cov": 0.5,
+                     "shard_timeout": 30}
+        self.chunks = phameration.chunk_translations(
+                                translation_groups, chunksize=2,
+                                workers=max(1, self.args["threads"]))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read_hits(self):
+        hits = list()
+        for index in self.chunks.keys():
+            output = blastp_shards.get_output_path(self.tmp, index)
+            with open(output, "r") as fh:
+                hits.extend(x.split("\t")[0] for x in fh)
+        return sorted(hits)
+
+    def test_search_shards_1(self):
+        """Verify a run with no threads of its own only coordinates
+        external workers."""
+        worker = mp.Process(target=blastp_shards.shard_worker,
+                            args=(self.tmp, "external", 30, 0.05))
+        worker.start()
+        failed, unfinished = phamerate.search_shards(self.chunks, self.tmp,
+                                                     "blastdb", self.args)
+        worker.join(30)
+
+        with self.subTest():
+            self.assertEqual((failed, unfinished), ([], []))
+        with self.subTest():
+            self.assertEqual(len(self.chunks), 6)
+        with self.subTest():
+            self.assertEqual(self.read_hits(),
+                             sorted(f"Trixie_CDS_{i}" for i in range(12)))
+        with self.subTest():
+            self.assertFalse(self.test_dir.joinpath(
+                                    blastp_shards.MANIFEST_NAME).exists())
+
+    def test_search_shards_2(self):
+        """Verify local workers search every chunk, and the manifest and
+        markers are removed afterwards."""
+        self.args["threads"] = 2
+        failed, unfinished = phamerate.search_shards(self.chunks, self.tmp,
+                                                     "blastdb", self.args)
+        with self.subTest():
+            self.assertEqual((failed, unfinished), ([], []))
+        with self.subTest():
+            self.assertEqual(self.read_hits(),
+                             sorted(f"Trixie_CDS_{i}" for i in range(12)))
+        with self.subTest():
+            self.assertFalse(self.test_dir.joinpath("done").exists())
+
+    def test_search_shards_3(self):
+        """Verify a run without live workers gives up after the timeout."""
+        self.args["shard_timeout"] = 0.2
+        failed, unfinished = phamerate.search_shards(self.chunks, self.tmp,
+                                                     "blastdb", self.args)
+        with self.subTest():
+            self.assertEqual((failed, unfinished),
+                             ([], list(self.chunks.keys())))
+        with self.subTest():
+            self.assertFalse(self.test_dir.joinpath(
+                                    blastp_shards.MANIFEST_NAME).exists())
+
+
+class TestParseMmseqsHeaders(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_parse_mmseqs_headers_1(self):
+        """Verify each key is mapped to the identifier in its header."""
+        database = str(self.test_dir.joinpath("profileDB"))
+        write_header_db(database, ["Trixie_CDS_1", "L5_CDS_2 extra"])
+        headers = phameration.parse_mmseqs_headers(database)
+        self.assertEqual(headers, {"0": "Trixie_CDS_1", "1": "L5_CDS_2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
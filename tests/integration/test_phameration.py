@@ -0,0 +1,98 @@
+"""Integration tests for the built-in Markov clustering of blastp output."""
+
+import importlib.util
+import shutil
+import unittest
+from pathlib import Path
+
+from pdm_utils.functions import phameration
+
+TMPDIR_PREFIX = "pdm_utils_tests_phameration_"
+# Can set TMPDIR_BASE to string such as "/tmp/" to track tmp directory location
+TMPDIR_BASE = "/tmp"
+
+
+@unittest.skipIf(importlib.util.find_spec("scipy") is None,
+                 "SciPy is not installed")
+class TestSparseMarkovCluster(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(TMPDIR_BASE, TMPDIR_PREFIX)
+        if self.test_dir.is_dir():
+            shutil.rmtree(self.test_dir)
+        self.test_dir.mkdir()
+
+        self.family_a = [f"Trixie_CDS_{i}" for i in range(1, 6)]
+        self.family_b = [f"L5_CDS_{i}" for i in range(1, 5)]
+
+        lines = []
+        for family in (self.family_a, self.family_b):
+            for query in family:
+                for subject in family:
+                    lines.append(f"{query}\t{subject}\t1e-50\n")
+        # A weak hit between the families should not join them
+        lines.append("Trixie_CDS_1\tL5_CDS_1\t1e-4\n")
+        # Identical sequences have an evalue of 0
+        lines.append("D29_CDS_1\tD29_CDS_1\t0.0\n")
+
+        self.outfiles = []
+        for i, index in enumerate(range(0, len(lines), 20)):
+            outfile = self.test_dir.joinpath(f"output{i}.tsv")
+            with outfile.open("w") as fh:
+                fh.writelines(lines[index:index + 20])
+            self.outfiles.append(str(outfile))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_sparse_markov_cluster_1(self):
+        """Verify hits from every output file are clustered into phams,
+        largest first."""
+        phams = phameration.sparse_markov_cluster(self.outfiles, 5.0)
+        with self.subTest():
+            self.assertEqual(list(phams.keys()), [1, 2, 3])
+        with self.subTest():
+            self.assertEqual(set(phams[1]), set(self.family_a))
+        with self.subTest():
+            self.assertEqual(set(phams[2]), set(self.family_b))
+        with self.subTest():
+            self.assertEqual(phams[3], ["D29_CDS_1"])
+
+    def test_sparse_markov_cluster_2(self):
+        """Verify no phams are made without blastp hits."""
+        outfile = self.test_dir.joinpath("empty.tsv")
+        outfile.touch()
+        phams = phameration.sparse_markov_cluster([str(outfile)], 5.0)
+        self.assertEqual(phams, {})
+
+    def test_build_blastp_matrix_1(self):
+        """Verify edges are mirrored, capped and keep the heaviest hit."""
+        outfile = self.test_dir.joinpath("hits.tsv")
+        outfile.write_text("lcl|A_1\tlcl|B_1\t1e-10\n"
+                           "B_1\tA_1\t1e-20\n"
+                           "A_1\tA_1\t0.0\n")
+        genes, matrix = phameration.build_blastp_matrix([str(outfile)])
+        matrix = matrix.toarray()
+        with self.subTest():
+            self.assertEqual(genes, ["A_1", "B_1"])
+        with self.subTest():
+            self.assertAlmostEqual(matrix[0][1], 20)
+        with self.subTest():
+            self.assertAlmostEqual(matrix[1][0], 20)
+        with self.subTest():
+            self.assertAlmostEqual(matrix[0][0], 200)
+
+    def test_prune_columns_1(self):
+        """Verify small flows and all but the largest flows are dropped."""
+        from scipy import sparse
+
+        matrix = sparse.csc_matrix([[0.5, 0.0001],
+                                    [0.3, 0.9999],
+                                    [0.2, 0.0]])
+        pruned = phameration.prune_columns(matrix, 0.001, 2).toarray()
+        self.assertEqual(pruned.tolist(), [[0.5, 0.0],
+                                           [0.3, 0.9999],
+                                           [0.0, 0.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1130,6 +1130,91 @@ class TestFindDomains5(unittest.TestCase):
             self.assertEqual(domain_status2, 1)
 
 
+class TestFindDomains7(unittest.TestCase):
+    def setUp(self):
+        test_db_utils.create_empty_test_db()
+        test_db_utils.insert_data(PHAGE, test_data_utils.get_trixie_phage_data())
+
+        cds1 = test_data_utils.get_trixie_gene_data() # GeneID = "TRIXIE_0001"
+        cds2 = test_data_utils.get_trixie_gene_data()
+        cds2["GeneID"] = "TRIXIE_0002"
+        test_db_utils.insert_data(GENE, cds1)
+        test_db_utils.insert_data(GENE, cds2)
+        stmt = get_gene_update_statement(0)
+        test_db_utils.execute(stmt)
+
+        self.alchemist = AlchemyHandler(database=DB, username=USER, password=PWD)
+        self.alchemist.build_engine()
+        self.engine = self.alchemist.engine
+
+        domain_data = test_data_utils.get_trixie_domain_data()
+        gene_domain_data = test_data_utils.get_trixie_gene_domain_data()
+        self.hit = {**domain_data, **gene_domain_data}
+        self.hit.pop("GeneID")
+
+    def tearDown(self):
+        test_db_utils.remove_db()
+        self.engine.dispose()
+
+    def test_insert_bulk_domain_data_1(self):
+        """Verify domain data shared by two genes is inserted once, and
+        both genes get gene_domain rows and DomainStatus = 1."""
+        logging.info("test_insert_bulk_domain_data_1")
+        cds_trans_dict = {"MKV": {"TRIXIE_0001", "TRIXIE_0002"}}
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                    cds_trans_dict, {"MKV": [self.hit]})
+        rolled_back = find_domains.insert_bulk_domain_data(
+                                    self.engine, domain_txn, gene_txns)
+
+        domain_table_results = test_db_utils.get_data(test_db_utils.domain_table_query)
+        gene_domain_table_results = test_db_utils.get_data(test_db_utils.gene_domain_table_query)
+        gene_table_results = test_db_utils.get_data(test_db_utils.gene_table_query)
+
+        with self.subTest():
+            self.assertEqual(rolled_back, 0)
+        with self.subTest():
+            self.assertEqual(len(domain_table_results), 1)
+        with self.subTest():
+            self.assertEqual(len(gene_domain_table_results), 2)
+        with self.subTest():
+            self.assertEqual(count_status(gene_table_results, 1), 2)
+
+    def test_insert_bulk_domain_data_2(self):
+        """Verify descriptions containing '%' are inserted unchanged."""
+        logging.info("test_insert_bulk_domain_data_2")
+        self.hit["Description"] = "Contains 100% of a domain"
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                    {"MKV": {"TRIXIE_0001"}},
+                                    {"MKV": [self.hit]})
+        find_domains.insert_bulk_domain_data(self.engine, domain_txn,
+                                             gene_txns)
+
+        domain_table_results = test_db_utils.get_data(test_db_utils.domain_table_query)
+        description = domain_table_results[0]["Description"]
+        if isinstance(description, bytes):
+            description = description.decode("utf-8")
+        self.assertEqual(description, "Contains 100% of a domain")
+
+    def test_insert_bulk_domain_data_3(self):
+        """Verify a failed gene transaction is rolled back entirely."""
+        logging.info("test_insert_bulk_domain_data_3")
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                    {"MKV": {"TRIXIE_0001"}},
+                                    {"MKV": [self.hit]})
+        # Invalid column name in the DomainStatus update
+        gene_txns[0][1] = (gene_txns[0][1][0].replace("DomainStatus",
+                                                      "Invalid"),
+                           gene_txns[0][1][1])
+        rolled_back = find_domains.insert_bulk_domain_data(
+                                    self.engine, domain_txn, gene_txns)
+
+        gene_domain_table_results = test_db_utils.get_data(test_db_utils.gene_domain_table_query)
+        with self.subTest():
+            self.assertEqual(rolled_back, 1)
+        with self.subTest():
+            self.assertEqual(len(gene_domain_table_results), 0)
+
+
 class TestFindDomains6(unittest.TestCase):
     def setUp(self):
         test_folder.mkdir()
@@ -197,6 +197,20 @@ class TestPhamerationFunctions(unittest.TestCase):
         # Check that database file was made
         self.assertTrue(os.path.exists(db_file))
 
+    def test_12_load_gene_data(self):
+        """Verify the single-pass loader matches the per-query functions"""
+        gs_to_ts, ts_to_gs, old_phams, new_genes = load_gene_data(self.engine)
+
+        with self.subTest():
+            self.assertEqual(gs_to_ts,
+                             get_geneids_and_translations(self.engine))
+        with self.subTest():
+            self.assertEqual(ts_to_gs, get_translation_groups(self.engine))
+        with self.subTest():
+            self.assertEqual(old_phams, get_pham_geneids(self.engine))
+        with self.subTest():
+            self.assertEqual(new_genes, get_new_geneids(self.engine))
+
 
 def refresh_tempdir(tmpdir):
     """
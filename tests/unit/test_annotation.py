@@ -75,6 +75,119 @@ class TestAnnotationRetrieval(unittest.TestCase):
         mock_get_relative_gene.assert_any_call(
                                    self.mock_alchemist, "Trixie_CDS_2", -1)
 
+    @patch("pdm_utils.functions.annotation.querying.execute")
+    def test_get_phams_from_genes_1(self, mock_execute):
+        """Verify get_phams_from_genes() uses one query for all genes."""
+        mock_execute.return_value = [("Trixie_CDS_1", 1, b"terminase"),
+                                     ("Trixie_CDS_2", 2, None)]
+
+        phams = annotation.get_phams_from_genes(
+                        self.mock_alchemist,
+                        ["Trixie_CDS_2", "Trixie_CDS_1", "Trixie_CDS_3"])
+
+        mock_execute.assert_called_once()
+        self.assertEqual(phams, [2, 1, None])
+
+    @patch("pdm_utils.functions.annotation.querying.execute")
+    def test_get_annotations_from_genes_1(self, mock_execute):
+        """Verify get_annotations_from_genes() decodes annotations."""
+        mock_execute.return_value = [("Trixie_CDS_1", 1, b"terminase"),
+                                     ("Trixie_CDS_2", 2, None)]
+
+        annotations = annotation.get_annotations_from_genes(
+                        self.mock_alchemist, ["Trixie_CDS_1", "Trixie_CDS_2"])
+
+        self.assertEqual(annotations, ["terminase", None])
+
+    @patch("pdm_utils.functions.annotation.querying.execute")
+    def test_get_count_annotations_in_phams_1(self, mock_execute):
+        """Verify get_count_annotations_in_phams() counts each pham."""
+        mock_execute.return_value = [(1, "Trixie_CDS_1", b"terminase"),
+                                     (1, "D29_CDS_1", b"terminase"),
+                                     (2, "Trixie_CDS_2", None)]
+
+        counts = annotation.get_count_annotations_in_phams(
+                                                self.mock_alchemist, [1, 2, 3])
+
+        mock_execute.assert_called_once()
+        self.assertEqual(counts, {1: {"terminase": 2}, 2: {None: 1}, 3: {}})
+
+    @patch("pdm_utils.functions.annotation.querying.first_column")
+    def test_get_relative_genes_1(self, mock_first_column):
+        """Verify get_relative_genes() checks all genes with one query."""
+        mock_first_column.return_value = ["Trixie_CDS_1"]
+
+        rel_genes = annotation.get_relative_genes(
+                        self.mock_alchemist, ["Trixie_CDS_2", "Trixie_CDS_1"],
+                        -1)
+
+        mock_first_column.assert_called_once()
+        self.assertEqual(rel_genes, ["Trixie_CDS_1", None])
+
+    @patch("pdm_utils.functions.annotation.get_relative_genes")
+    @patch("pdm_utils.functions.annotation.get_pham_gene_data")
+    def test_get_genes_adjacent_to_phams_1(self, mock_get_pham_gene_data,
+                                           mock_get_relative_genes):
+        """Verify get_genes_adjacent_to_phams() separates neighbours by pham."""
+        mock_get_pham_gene_data.return_value = {
+                                    1: [("Trixie_CDS_2", None)],
+                                    2: [("Trixie_CDS_1", None)]}
+        mock_get_relative_genes.side_effect = [
+                                    ["Trixie_CDS_1", None],
+                                    ["Trixie_CDS_3", "Trixie_CDS_2"]]
+
+        adjacent_genes = annotation.get_genes_adjacent_to_phams(
+                                                    self.mock_alchemist, [1, 2])
+
+        self.assertEqual(adjacent_genes,
+                         {1: (["Trixie_CDS_1"], ["Trixie_CDS_3"]),
+                          2: ([], ["Trixie_CDS_2"])})
+
+    @patch("pdm_utils.functions.annotation.mysqldb_basic.query_iter")
+    def test_build_neighbour_index_1(self, mock_query_iter):
+        """Verify build_neighbour_index() orders genes by Start per genome."""
+        mock_query_iter.return_value = iter([("Trixie", "Trixie_CDS_3", 900),
+                                             ("Trixie", "Trixie_CDS_1", 10),
+                                             ("D29", "D29_gp7", 50),
+                                             ("Trixie", "Trixie_CDS_2", 400)])
+
+        neighbour_index = annotation.build_neighbour_index(
+                                                        self.mock_alchemist)
+
+        mock_query_iter.assert_called_once()
+        self.assertEqual(neighbour_index,
+                         {"Trixie_CDS_1": (None, "Trixie_CDS_2"),
+                          "Trixie_CDS_2": ("Trixie_CDS_1", "Trixie_CDS_3"),
+                          "Trixie_CDS_3": ("Trixie_CDS_2", None),
+                          "D29_gp7": (None, None)})
+
+    @patch("pdm_utils.functions.annotation.get_relative_gene")
+    def test_get_adjacent_genes_2(self, mock_get_relative_gene):
+        """Verify get_adjacent_genes() uses a neighbour index if given."""
+        neighbour_index = {"D29_gp7": ("D29_gp6", None)}
+
+        adjacent_genes = annotation.get_adjacent_genes(
+                                            self.mock_alchemist, "D29_gp7",
+                                            neighbour_index=neighbour_index)
+
+        mock_get_relative_gene.assert_not_called()
+        self.assertEqual(adjacent_genes, ("D29_gp6", None))
+
+    @patch("pdm_utils.functions.annotation.get_relative_genes")
+    @patch("pdm_utils.functions.annotation.get_pham_gene_data")
+    def test_get_genes_adjacent_to_phams_2(self, mock_get_pham_gene_data,
+                                           mock_get_relative_genes):
+        """Verify get_genes_adjacent_to_phams() uses a neighbour index."""
+        mock_get_pham_gene_data.return_value = {1: [("D29_gp7", None)]}
+        neighbour_index = {"D29_gp7": ("D29_gp6", "D29_gp8")}
+
+        adjacent_genes = annotation.get_genes_adjacent_to_phams(
+                                            self.mock_alchemist, [1],
+                                            neighbour_index=neighbour_index)
+
+        mock_get_relative_genes.assert_not_called()
+        self.assertEqual(adjacent_genes, {1: (["D29_gp6"], ["D29_gp8"])})
+
 
 if __name__ == "__main__":
     unittest.main()
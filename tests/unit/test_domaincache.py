@@ -0,0 +1,65 @@
+"""Unit tests for the DomainCache class."""
+
+import unittest
+
+from pdm_utils.classes.domaincache import DomainCache
+
+
+class TestDomainCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = DomainCache(":memory:", "cdd1", 0.001)
+        self.cache.open()
+        self.hit = {"HitID": "gnl|CDD|1", "DomainID": "cd00001",
+                    "Name": "Name", "Description": "A description",
+                    "Expect": 1e-10, "QueryStart": 1, "QueryEnd": 50}
+        self.results = [{"Translation": "MKV", "Data": [self.hit]},
+                        {"Translation": "MKL", "Data": []}]
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_get_many_1(self):
+        """Verify stored results are returned unchanged."""
+        self.cache.put_many(self.results)
+        cached = self.cache.get_many(["MKV", "MKL", "MKI"])
+        with self.subTest():
+            self.assertEqual(cached, {"MKV": [self.hit], "MKL": []})
+        with self.subTest():
+            self.assertEqual(self.cache.hits, 2)
+        with self.subTest():
+            self.assertEqual(self.cache.misses, 1)
+
+    def test_get_many_2(self):
+        """Verify results from another CDD version are not returned."""
+        self.cache.put_many(self.results)
+        self.cache.cdd_version = "cdd2"
+        cached = self.cache.get_many(["MKV", "MKL"])
+        self.assertEqual(cached, {})
+
+    def test_get_many_3(self):
+        """Verify results for another evalue are not returned."""
+        self.cache.put_many(self.results)
+        self.cache.evalue = 0.01
+        cached = self.cache.get_many(["MKV", "MKL"])
+        self.assertEqual(cached, {})
+
+    def test_evict_1(self):
+        """Verify nothing is evicted while the cache fits."""
+        self.cache.put_many(self.results)
+        self.assertEqual(self.cache.evict(), 0)
+
+    def test_evict_2(self):
+        """Verify least recently used results are evicted first."""
+        self.cache.put_many(self.results[:1])
+        self.cache.put_many(self.results[1:])
+        self.cache.max_size = self.cache.get_size() - 1
+        evicted = self.cache.evict()
+        cached = self.cache.get_many(["MKV", "MKL"])
+        with self.subTest():
+            self.assertEqual(evicted, 1)
+        with self.subTest():
+            self.assertEqual(cached, {"MKL": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -43,6 +43,8 @@ class TestExportMain(unittest.TestCase):
         self.mock_raw_bytes = Mock()
 
         self.mock_concatenate = Mock()
+        self.mock_batch_size = Mock()
+        self.mock_aln_cache = Mock()
 
         type(self.mock_args).pipeline = PropertyMock(
                                     return_value=self.mock_pipeline)
@@ -89,6 +91,10 @@ class TestExportMain(unittest.TestCase):
 
         type(self.mock_args).concatenate = PropertyMock(
                                     return_value=self.mock_concatenate)
+        type(self.mock_args).batch_size = PropertyMock(
+                                    return_value=self.mock_batch_size)
+        type(self.mock_args).aln_cache = PropertyMock(
+                                    return_value=self.mock_aln_cache)
 
     @patch("pdm_utils.pipelines.revise.configfile.build_complete_config")
     @patch("pdm_utils.pipelines.export_db.execute_export")
@@ -130,7 +136,151 @@ class TestExportMain(unittest.TestCase):
                             verbose=self.mock_verbose, dump=self.mock_dump,
                             force=self.mock_force, threads=self.mock_threads,
                             db_name=self.mock_db_name, 
-                            phams_out=self.mock_phams_out)
+                            phams_out=self.mock_phams_out,
+                            batch_size=self.mock_batch_size,
+                            aln_cache=self.mock_aln_cache)
+
+
+class TestGetCdsDomains(unittest.TestCase):
+    def setUp(self):
+        self.alchemist = Mock()
+
+    @patch("pdm_utils.pipelines.export_db.querying")
+    def test_get_cds_domains_1(self, querying_mock):
+        """Verify domain rows from one chunked query are grouped by GeneID."""
+        querying_mock.execute.return_value = [
+                            {"GeneID": "A_1", "Name": "Name1"},
+                            {"GeneID": "B_1", "Name": "Name2"},
+                            {"GeneID": "A_1", "Name": "Name3"}]
+        cds_domains = export_db.get_cds_domains(self.alchemist,
+                                                ["A_1", "B_1", "C_1"])
+        with self.subTest():
+            querying_mock.execute.assert_called_once()
+        with self.subTest():
+            self.assertEqual(querying_mock.execute.call_args[1]["values"],
+                             ["A_1", "B_1", "C_1"])
+        with self.subTest():
+            self.assertEqual(cds_domains, {"A_1": [{"Name": "Name1"},
+                                                   {"Name": "Name3"}],
+                                           "B_1": [{"Name": "Name2"}]})
+
+    @patch("pdm_utils.pipelines.export_db.querying")
+    def test_get_cds_domains_2(self, querying_mock):
+        """Verify nothing is queried without GeneIDs."""
+        cds_domains = export_db.get_cds_domains(self.alchemist, [])
+        with self.subTest():
+            self.assertEqual(cds_domains, {})
+        with self.subTest():
+            querying_mock.execute.assert_not_called()
+
+
+class TestGetGenomes(unittest.TestCase):
+    def setUp(self):
+        self.alchemist = Mock()
+
+    @patch("pdm_utils.pipelines.export_db.mysqldb.parse_genome_data")
+    def test_get_genomes_1(self, parse_genome_data_mock):
+        """Verify only uncached genomes are retrieved, in one query."""
+        parse_genome_data_mock.return_value = [Mock(id="Trixie")]
+        data_cache = {"L5": Mock(id="L5")}
+        export_db.get_genomes(self.alchemist, ["Trixie", "L5", "Trixie"],
+                              data_cache=data_cache)
+        with self.subTest():
+            parse_genome_data_mock.assert_called_once()
+        with self.subTest():
+            self.assertEqual(
+                    parse_genome_data_mock.call_args[1]["phage_id_list"],
+                    ["Trixie"])
+        with self.subTest():
+            self.assertEqual(set(data_cache.keys()), {"Trixie", "L5"})
+
+    @patch("pdm_utils.pipelines.export_db.mysqldb.parse_genome_data")
+    def test_get_genomes_2(self, parse_genome_data_mock):
+        """Verify nothing is queried when every genome is cached."""
+        data_cache = {"L5": Mock(id="L5")}
+        export_db.get_genomes(self.alchemist, ["L5"], data_cache=data_cache)
+        parse_genome_data_mock.assert_not_called()
+
+    @patch("pdm_utils.pipelines.export_db.mysqldb.parse_genome_data")
+    def test_get_genomes_3(self, parse_genome_data_mock):
+        """Verify features are retrieved with the genomes when requested."""
+        parse_genome_data_mock.return_value = [Mock(id="Trixie")]
+        export_db.get_genomes(self.alchemist, ["Trixie"], get_features=True)
+        self.assertEqual(parse_genome_data_mock.call_args[1]["gene_query"],
+                         export_db.GENE_QUERY)
+
+
+class TestIterSeqrecords(unittest.TestCase):
+    def setUp(self):
+        self.alchemist = Mock()
+        self.values = ["Trixie", "L5", "D29", "Alice", "Bob"]
+
+    @patch("pdm_utils.pipelines.export_db.get_genome_seqrecords")
+    def test_iter_seqrecords_1(self, get_genome_seqrecords_mock):
+        """Verify genomes are converted in batches, one cache per batch."""
+        get_genome_seqrecords_mock.side_effect = (
+                                lambda alchemist, batch, data_cache: batch)
+        batches = list(export_db.iter_seqrecords(self.alchemist, self.values,
+                                                 "phage", batch_size=2))
+        caches = [x[1]["data_cache"] for x in
+                  get_genome_seqrecords_mock.call_args_list]
+        with self.subTest():
+            self.assertEqual(batches, [["Trixie", "L5"], ["D29", "Alice"],
+                                       ["Bob"]])
+        with self.subTest():
+            self.assertIsNot(caches[0], caches[1])
+
+    @patch("pdm_utils.pipelines.export_db.get_genome_seqrecords")
+    def test_iter_seqrecords_2(self, get_genome_seqrecords_mock):
+        """Verify batches are converted lazily."""
+        get_genome_seqrecords_mock.return_value = []
+        batches = export_db.iter_seqrecords(self.alchemist, self.values,
+                                            "phage", batch_size=2)
+        with self.subTest():
+            get_genome_seqrecords_mock.assert_not_called()
+        next(batches)
+        with self.subTest():
+            get_genome_seqrecords_mock.assert_called_once()
+
+    @patch("pdm_utils.pipelines.export_db.get_cds_seqrecords")
+    def test_iter_seqrecords_3(self, get_cds_seqrecords_mock):
+        """Verify genes use the default gene batch size."""
+        get_cds_seqrecords_mock.return_value = []
+        list(export_db.iter_seqrecords(self.alchemist, self.values, "gene"))
+        get_cds_seqrecords_mock.assert_called_once()
+
+
+class TestExecuteFfxExport(unittest.TestCase):
+    @patch("pdm_utils.pipelines.export_db.fileio.write_seqrecords")
+    @patch("pdm_utils.pipelines.export_db.iter_seqrecords")
+    def test_execute_ffx_export_1(self, iter_seqrecords_mock,
+                                  write_seqrecords_mock):
+        """Verify each batch is written, appending after the first."""
+        record = Mock(annotations={"comment": ()})
+        iter_seqrecords_mock.return_value = iter([[record], [record]])
+        write_seqrecords_mock.return_value = []
+        export_db.execute_ffx_export(Mock(), Mock(), Mock(), ["Trixie"], "gb",
+                                     {"Version": 1, "SchemaVersion": 10},
+                                     "phage", concatenate=True)
+        appends = [x[1]["append"] for x in write_seqrecords_mock.call_args_list]
+        self.assertEqual(appends, [False, True])
+
+
+class TestIterDecodedResults(unittest.TestCase):
+    def test_iter_decoded_results_1(self):
+        """Verify bytes columns are decoded as results are generated."""
+        notes = Mock()
+        notes.name = "Notes"
+        notes.type.python_type = bytes
+        gene_id = Mock()
+        gene_id.name = "GeneID"
+        gene_id.type.python_type = str
+        results = iter([{"GeneID": "A_1", "Notes": b"helicase"},
+                        {"GeneID": "A_2", "Notes": None}])
+        decoded = export_db.iter_decoded_results(results, [gene_id, notes])
+        self.assertEqual(list(decoded), [{"GeneID": "A_1",
+                                          "Notes": "helicase"},
+                                         {"GeneID": "A_2", "Notes": None}])
 
 
 if __name__ == "__main__":
@@ -297,6 +297,84 @@ class TestFilter(unittest.TestCase):
         check_mock.assert_called()
         build_distinct_mock.assert_not_called()
 
+    @patch("pdm_utils.classes.filter.Filter.build_pairs")
+    @patch("pdm_utils.classes.filter.Filter.get_columns")
+    @patch("pdm_utils.classes.filter.Filter.check")
+    def test_retrieve_2(self, check_mock, get_columns_mock, build_pairs_mock):
+        """Verify that retrieve() groups data from one query per column.
+        """
+        column = Mock(spec=Column)
+        column.name = "Cluster"
+        get_columns_mock.return_value = [column]
+        build_pairs_mock.return_value = [("Trixie", "A"), ("Myrna", "C"),
+                                         ("trixie", "A")]
+
+        self.db_filter._values = ["Trixie", "Myrna", "D29"]
+        data = self.db_filter.retrieve("phage.Cluster")
+
+        build_pairs_mock.assert_called_once()
+        self.assertEqual(data, {"Trixie": {"Cluster": ["A"]},
+                                "Myrna": {"Cluster": ["C"]},
+                                "D29": {"Cluster": []}})
+
+    @patch("pdm_utils.classes.filter.Filter.build_pairs")
+    @patch("pdm_utils.classes.filter.Filter.transpose")
+    @patch("pdm_utils.classes.filter.Filter.get_column")
+    @patch("pdm_utils.classes.filter.Filter.check")
+    def test_group_1(self, check_mock, get_column_mock, transpose_mock,
+                     build_pairs_mock):
+        """Verify that group() separates values from a single query.
+        """
+        get_column_mock.return_value = Mock(spec=Column)
+        transpose_mock.return_value = ["A", "C"]
+        build_pairs_mock.return_value = [("Trixie", "A"), ("Myrna", "C"),
+                                         ("D29", "a")]
+
+        self.db_filter._values = ["Trixie", "Myrna", "D29"]
+        group_results = self.db_filter.group("phage.Cluster")
+
+        build_pairs_mock.assert_called_once()
+        self.assertEqual(group_results, {"A": ["Trixie", "D29"],
+                                         "C": ["Myrna"]})
+
+    @patch("pdm_utils.classes.filter.q.execute")
+    @patch("pdm_utils.classes.filter.q.build_distinct")
+    @patch("pdm_utils.classes.filter.Filter.check")
+    def test_build_pairs_1(self, check_mock, build_distinct_mock,
+                           execute_mock):
+        """Verify that build_pairs() conditions one query on all values.
+        """
+        column = Mock(spec=Column)
+        execute_mock.return_value = [("Trixie", "A")]
+
+        self.db_filter._values = ["Trixie", "Myrna"]
+        pairs = self.db_filter.build_pairs(column)
+
+        build_distinct_mock.assert_called_once_with(
+                                            self.mock_graph,
+                                            [self.mock_key, column],
+                                            where=[])
+        execute_mock.assert_called_once_with(
+                            self.mock_engine, build_distinct_mock.return_value,
+                            in_column=self.mock_key,
+                            values=["Trixie", "Myrna"], limit=8000,
+                            return_dict=False)
+        self.assertEqual(pairs, [("Trixie", "A")])
+
+    @patch("pdm_utils.classes.filter.q.execute")
+    @patch("pdm_utils.classes.filter.q.build_distinct")
+    @patch("pdm_utils.classes.filter.Filter.check")
+    def test_build_pairs_2(self, check_mock, build_distinct_mock,
+                           execute_mock):
+        """Verify that build_pairs() queries NULL values separately.
+        """
+        execute_mock.return_value = []
+
+        self.db_filter._values = ["Trixie", None]
+        self.db_filter.build_pairs(Mock(spec=Column))
+
+        self.assertEqual(execute_mock.call_count, 2)
+
     @patch("pdm_utils.classes.filter.Filter.check")
     @patch("pdm_utils.classes.filter.Filter.build_values")
     def test_refresh_1(self, build_values_mock, check_mock):
@@ -0,0 +1,275 @@
+"""Unit tests for pure-python functions in the find_domains pipeline."""
+
+import multiprocessing as mp
+import queue
+import unittest
+from unittest.mock import Mock, patch
+
+from pdm_utils.pipelines import find_domains
+
+
+class TestSearchUniqueTranslations(unittest.TestCase):
+    def setUp(self):
+        self.translations = ["MKV", "MKL", "MKI", "MKA", "MKT"]
+
+    @patch("pdm_utils.pipelines.find_domains.parallelize")
+    def test_search_unique_translations_1(self, parallelize_mock):
+        """Verify translations are split into chunks, one job per chunk."""
+        parallelize_mock.return_value = []
+        find_domains.search_unique_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, self.translations,
+                    chunk_size=2)
+        jobs = parallelize_mock.call_args[0][0]
+        with self.subTest():
+            self.assertEqual(len(jobs), 3)
+        with self.subTest():
+            self.assertEqual(jobs[0][5], ["MKV", "MKL"])
+        with self.subTest():
+            self.assertEqual(jobs[2][5], ["MKT"])
+
+    @patch("pdm_utils.pipelines.find_domains.parallelize")
+    def test_search_unique_translations_2(self, parallelize_mock):
+        """Verify spare threads are handed to each rpsblast process."""
+        parallelize_mock.return_value = []
+        find_domains.search_unique_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 8, self.translations,
+                    chunk_size=3)
+        jobs = parallelize_mock.call_args[0][0]
+        self.assertEqual(jobs[0][6], 4)
+
+    @patch("pdm_utils.pipelines.find_domains.parallelize")
+    def test_search_unique_translations_3(self, parallelize_mock):
+        """Verify per-chunk results are flattened."""
+        parallelize_mock.return_value = [
+                            [{"Translation": "MKV", "Data": []}],
+                            [{"Translation": "MKL", "Data": []},
+                             {"Translation": "MKI", "Data": []}]]
+        results = find_domains.search_unique_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, self.translations,
+                    chunk_size=2)
+        self.assertEqual([x["Translation"] for x in results],
+                         ["MKV", "MKL", "MKI"])
+
+    @patch("pdm_utils.pipelines.find_domains.parallelize")
+    def test_search_unique_translations_4(self, parallelize_mock):
+        """Verify nothing is searched without translations."""
+        results = find_domains.search_unique_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, [])
+        with self.subTest():
+            self.assertEqual(results, [])
+        with self.subTest():
+            parallelize_mock.assert_not_called()
+
+
+class TestProcessRpsRecord(unittest.TestCase):
+    def setUp(self):
+        self.hsp1 = Mock(expect=1e-10, query_start=1, query_end=50)
+        self.hsp2 = Mock(expect=1.0, query_start=60, query_end=90)
+        self.align = Mock(hit_id="gnl|CDD|1",
+                          hit_def="cd00001, Name, A description",
+                          hsps=[self.hsp1, self.hsp2])
+        self.record = Mock(alignments=[self.align])
+
+    def test_process_rps_record_1(self):
+        """Verify only hits below the evalue cutoff are returned."""
+        results = find_domains.process_rps_record(self.record, 0.001)
+        with self.subTest():
+            self.assertEqual(len(results), 1)
+        with self.subTest():
+            self.assertEqual(results[0]["HitID"], "gnl|CDD|1")
+        with self.subTest():
+            self.assertEqual(results[0]["DomainID"], "cd00001")
+        with self.subTest():
+            self.assertEqual(results[0]["QueryEnd"], 50)
+
+
+class TestSearchTranslations(unittest.TestCase):
+    @patch("pdm_utils.pipelines.find_domains.insert_bulk_domain_data")
+    @patch("pdm_utils.pipelines.find_domains.search_unique_translations")
+    def test_search_translations_1(self, search_mock, insert_mock):
+        """Verify cached translations are not searched again."""
+        cache = Mock()
+        cache.get_many.return_value = {"MKV": []}
+        search_mock.return_value = [{"Translation": "MKL", "Data": []}]
+        insert_mock.return_value = 0
+        find_domains.search_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, Mock(),
+                    ["MKV", "MKL"], {"MKV": {"A_1"}, "MKL": {"A_2"}},
+                    cache=cache)
+        gene_txns = insert_mock.call_args[0][2]
+        with self.subTest():
+            self.assertEqual(search_mock.call_args[0][5], ["MKL"])
+        with self.subTest():
+            cache.put_many.assert_called_with(
+                                [{"Translation": "MKL", "Data": []}])
+        with self.subTest():
+            self.assertEqual(set(gene_txns[0][1][1][0]), {"A_1", "A_2"})
+
+
+class TestConstructBulkTxns(unittest.TestCase):
+    def setUp(self):
+        self.hit1 = {"HitID": "gnl|CDD|1", "DomainID": "cd00001",
+                     "Name": "Name1", "Description": "100% description",
+                     "Expect": 1e-10, "QueryStart": 1, "QueryEnd": 50}
+        self.hit2 = {"HitID": "gnl|CDD|2", "DomainID": "cd00002",
+                     "Name": "Name2", "Description": "Description",
+                     "Expect": 1e-5, "QueryStart": 60, "QueryEnd": 90}
+        self.cds_trans_dict = {"MKV": {"A_1", "B_1"}, "MKL": {"C_1"},
+                               "MKI": {"D_1"}}
+        self.results = {"MKV": [self.hit1, self.hit2],
+                        "MKL": [self.hit1],
+                        "MKI": []}
+
+    def test_construct_bulk_txns_1(self):
+        """Verify shared domain rows are only inserted once."""
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                        self.cds_trans_dict, self.results)
+        with self.subTest():
+            self.assertEqual(len(domain_txn), 1)
+        with self.subTest():
+            self.assertEqual(domain_txn[0][1],
+                             [("gnl|CDD|1", "cd00001", "Name1",
+                               "100% description"),
+                              ("gnl|CDD|2", "cd00002", "Name2",
+                               "Description")])
+
+    def test_construct_bulk_txns_2(self):
+        """Verify every gene gets its gene_domain rows and an update."""
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                        self.cds_trans_dict, self.results)
+        gene_domain_rows = gene_txns[0][0][1]
+        updated = gene_txns[0][1][1][0]
+        with self.subTest():
+            self.assertEqual(len(gene_txns), 1)
+        with self.subTest():
+            self.assertEqual(len(gene_domain_rows), 5)
+        with self.subTest():
+            self.assertEqual(set(updated), {"A_1", "B_1", "C_1", "D_1"})
+        with self.subTest():
+            self.assertEqual(gene_txns[0][1][0].count("%s"), 4)
+
+    def test_construct_bulk_txns_3(self):
+        """Verify genes are split into batches, one transaction each."""
+        domain_txn, gene_txns = find_domains.construct_bulk_txns(
+                                        self.cds_trans_dict, self.results,
+                                        batch_size=3)
+        with self.subTest():
+            self.assertEqual(len(gene_txns), 2)
+        with self.subTest():
+            self.assertEqual(len(gene_txns[1][1][1][0]), 1)
+
+
+class TestSearchBatch(unittest.TestCase):
+    @patch("pdm_utils.pipelines.find_domains.search_unique_translations")
+    def test_search_batch_1(self, search_mock):
+        """Verify translations in the replayed journal are not searched."""
+        hit = {"HitID": "gnl|CDD|1", "DomainID": "cd00001",
+               "Name": "Name", "Description": "Description",
+               "Expect": 1e-10, "QueryStart": 1, "QueryEnd": 50}
+        replay = {find_domains.hash_translation("MKV"): [hit]}
+        search_mock.return_value = [{"Translation": "MKL", "Data": []}]
+        domain_txn, gene_txns = find_domains.search_batch(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, ["MKV", "MKL"],
+                    {"MKV": {"A_1"}, "MKL": {"A_2"}}, replay=replay)
+        with self.subTest():
+            self.assertEqual(search_mock.call_args[0][5], ["MKL"])
+        with self.subTest():
+            self.assertEqual(len(domain_txn[0][1]), 1)
+        with self.subTest():
+            self.assertEqual(set(gene_txns[0][1][1][0]), {"A_1", "A_2"})
+
+
+class TestPipelineTranslations(unittest.TestCase):
+    def setUp(self):
+        self.cds_trans_dict = {"MKV": {"A_1"}, "MKL": {"B_1"},
+                               "MKI": {"C_1"}}
+        self.hit = {"HitID": "gnl|CDD|1", "DomainID": "cd00001",
+                    "Name": "Name", "Description": "Description",
+                    "Expect": 1e-10, "QueryStart": 1, "QueryEnd": 50}
+
+        # Inserts run in the writer process, which reports back here
+        self.inserted = mp.Queue()
+
+    def search(self, *args, **kwargs):
+        return [{"Translation": x, "Data": [self.hit]} for x in args[5]]
+
+    def insert(self, engine, domain_txn, gene_txns):
+        for txn in gene_txns:
+            for gene_id in txn[1][1][0]:
+                self.inserted.put(gene_id)
+        return 0
+
+    @patch("pdm_utils.pipelines.find_domains.insert_bulk_domain_data")
+    @patch("pdm_utils.pipelines.find_domains.search_unique_translations")
+    def test_pipeline_translations_1(self, search_mock, insert_mock):
+        """Verify every batch is searched and inserted."""
+        search_mock.side_effect = self.search
+        insert_mock.side_effect = self.insert
+        rolled_back = find_domains.pipeline_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, Mock(),
+                    ["MKV", "MKL", "MKI"], self.cds_trans_dict, 2)
+        inserted = {self.inserted.get(timeout=5) for _ in range(3)}
+        with self.subTest():
+            self.assertEqual(rolled_back, 0)
+        with self.subTest():
+            self.assertEqual(search_mock.call_count, 2)
+        with self.subTest():
+            self.assertEqual(inserted, {"A_1", "B_1", "C_1"})
+
+    @patch("pdm_utils.pipelines.find_domains.insert_bulk_domain_data")
+    @patch("pdm_utils.pipelines.find_domains.search_unique_translations")
+    def test_pipeline_translations_2(self, search_mock, insert_mock):
+        """Verify rolled back transactions are summed across batches."""
+        search_mock.side_effect = self.search
+        insert_mock.return_value = 1
+        rolled_back = find_domains.pipeline_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, Mock(),
+                    ["MKV", "MKL", "MKI"], self.cds_trans_dict, 1)
+        self.assertEqual(rolled_back, 3)
+
+    @patch("pdm_utils.pipelines.find_domains.write_worker")
+    @patch("pdm_utils.pipelines.find_domains.search_unique_translations")
+    def test_pipeline_translations_3(self, search_mock, write_worker_mock):
+        """Verify a writer that exits early stops the pipeline."""
+        search_mock.side_effect = self.search
+        write_worker_mock.side_effect = SystemExit(1)
+        with self.assertRaises(RuntimeError):
+            find_domains.pipeline_translations(
+                    "rpsblast", "Cdd", "/tmp", 0.001, 1, Mock(),
+                    ["MKV", "MKL", "MKI"], self.cds_trans_dict, 1,
+                    queue_size=1)
+
+    @patch("pdm_utils.pipelines.find_domains.insert_bulk_domain_data")
+    def test_write_worker_1(self, insert_mock):
+        """Verify the worker drains the queue and records its progress."""
+        insert_mock.return_value = 0
+        domain_txn = [("stmt", [(1,), (2,)])]
+        gene_txns = [[("stmt", [(1,), (2,), (3,)]), ("stmt", [(1,)])]]
+        write_queue = queue.Queue()
+        write_queue.put((5, domain_txn, gene_txns))
+        write_queue.put((5, domain_txn, gene_txns))
+        write_queue.put(None)
+        totals = find_domains.create_totals()
+        find_domains.write_worker(Mock(), write_queue, totals)
+        self.assertEqual({key: x.value for key, x in totals.items()},
+                         {"translations": 10, "rows": 10, "rolled_back": 0})
+
+    @patch("pdm_utils.pipelines.find_domains.insert_bulk_domain_data")
+    def test_write_worker_2(self, insert_mock):
+        """Verify an insertion error rolls back the batch but not the worker."""
+        insert_mock.side_effect = [Exception("Lost connection"), 0]
+        gene_txns = [[("stmt", []), ("stmt", [])]] * 2
+        write_queue = queue.Queue()
+        write_queue.put((1, [("stmt", [])], gene_txns))
+        write_queue.put((1, [("stmt", [])], gene_txns))
+        write_queue.put(None)
+        totals = find_domains.create_totals()
+        find_domains.write_worker(Mock(), write_queue, totals)
+        with self.subTest():
+            self.assertEqual(totals["rolled_back"].value, 3)
+        with self.subTest():
+            self.assertEqual(insert_mock.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
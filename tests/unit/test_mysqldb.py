@@ -456,5 +456,91 @@ class TestMysqldbFunctions2(unittest.TestCase):
                         self.genome1, tkt_type="add")
         self.assertEqual(len(statements), 7)
 
+
+class TestParseGenomeData(unittest.TestCase):
+    def setUp(self):
+        self.phage_data = [{"PhageID": "Trixie", "Length": 4},
+                           {"PhageID": "L5", "Length": 5}]
+        self.gene_data = [{"PhageID": "Trixie", "GeneID": "Trixie_1"},
+                          {"PhageID": "L5", "GeneID": "L5_1"},
+                          {"PhageID": "trixie", "GeneID": "Trixie_2"}]
+
+    def retrieve_data(self, engine, column=None, query=None, id_list=None):
+        if query == "phage":
+            return self.phage_data
+        elif query == "gene":
+            return self.gene_data
+        return []
+
+    @patch("pdm_utils.functions.mysqldb.mysqldb_basic.retrieve_data")
+    def test_parse_genome_data_1(self, retrieve_data_mock):
+        """Verify features of every genome are retrieved with one query
+        per feature table and grouped by genome."""
+        retrieve_data_mock.side_effect = self.retrieve_data
+        genome_list = mysqldb.parse_genome_data(
+                            Mock(), phage_id_list=["Trixie", "L5"],
+                            phage_query="phage", gene_query="gene",
+                            trna_query="trna")
+        trixie_genes = [x.id for x in genome_list[0].cds_features]
+        with self.subTest():
+            self.assertEqual(retrieve_data_mock.call_count, 3)
+        with self.subTest():
+            self.assertEqual(retrieve_data_mock.call_args_list[1][1]["id_list"],
+                             ["Trixie", "L5"])
+        with self.subTest():
+            self.assertEqual(trixie_genes, ["Trixie_1", "Trixie_2"])
+        with self.subTest():
+            self.assertEqual(genome_list[1].cds_features[0].genome_length, 5)
+        with self.subTest():
+            self.assertEqual(genome_list[1].trna_features, [])
+        with self.subTest():
+            self.assertEqual(genome_list[1].tmrna_features, [])
+
+    @patch("pdm_utils.functions.mysqldb.mysqldb_basic.retrieve_data")
+    def test_parse_genome_data_2(self, retrieve_data_mock):
+        """Verify feature queries are unconditioned when all genomes are
+        retrieved."""
+        retrieve_data_mock.side_effect = self.retrieve_data
+        mysqldb.parse_genome_data(Mock(), phage_query="phage",
+                                  gene_query="gene")
+        self.assertIsNone(retrieve_data_mock.call_args_list[1][1]["id_list"])
+
+    @patch("pdm_utils.functions.mysqldb.mysqldb_basic.retrieve_data")
+    def test_parse_grouped_feature_data_1(self, retrieve_data_mock):
+        """Verify PhageIDs are split into chunks, one query per chunk."""
+        retrieve_data_mock.return_value = []
+        mysqldb.parse_grouped_feature_data(
+                            Mock(), "cds", phage_id_list=["A", "B", "C"],
+                            query="gene", limit=2)
+        id_lists = [x[1]["id_list"] for x in
+                    retrieve_data_mock.call_args_list]
+        self.assertEqual(id_lists, [["A", "B"], ["C"]])
+
+
+
+class TestExecuteTransaction(unittest.TestCase):
+    def setUp(self):
+        self.connection = Mock()
+        self.connection.execute.side_effect = [Mock(rowcount=3),
+                                               Mock(rowcount=2)]
+        self.engine = Mock()
+        self.engine.connect.return_value = self.connection
+
+    def test_execute_transaction_1(self):
+        """Verify the rows matched by each statement are recorded."""
+        rowcounts = []
+        result, msg = mysqldb.execute_transaction(
+                            self.engine, ["UPDATE pham SET Color = 'A'",
+                                          ("INSERT INTO pham VALUES (%s)",
+                                           [(1,), (2,)])],
+                            rowcounts=rowcounts)
+        with self.subTest():
+            self.assertEqual(result, 0)
+        with self.subTest():
+            self.assertEqual(rowcounts, [3, 2])
+        with self.subTest():
+            self.connection.begin.return_value.commit.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 from pathlib import Path
 import sys
 import unittest
+from unittest.mock import MagicMock
 
 from pdm_utils.functions import mysqldb_basic
 
@@ -64,6 +65,26 @@ class TestMysqldbBasic1(unittest.TestCase):
         self.assertEqual(value, "NULL")
 
 
+class TestMysqldbBasic2(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = MagicMock()
+        self.connection = self.engine.connect.return_value.__enter__.return_value
+        self.proxy = self.connection.execution_options.return_value\
+                                    .execute.return_value
+        self.proxy.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+    def test_query_iter_1(self):
+        """Verify all batches of rows are yielded."""
+        rows = list(mysqldb_basic.query_iter(self.engine, "SELECT 1", size=2))
+        self.assertEqual(rows, [(1,), (2,), (3,)])
+
+    def test_query_iter_2(self):
+        """Verify a server-side cursor is requested."""
+        list(mysqldb_basic.query_iter(self.engine, "SELECT 1", size=2))
+        self.connection.execution_options.assert_called_with(
+                                                    stream_results=True)
+
 
 if __name__ == '__main__':
     unittest.main()
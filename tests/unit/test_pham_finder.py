@@ -0,0 +1,75 @@
+"""Tests the functionality of unique functions in the pham_finder pipeline
+"""
+import unittest
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from pdm_utils.pipelines import pham_finder
+
+
+class TestFindPhams(unittest.TestCase):
+    def setUp(self):
+        self.a_filter = Mock()
+        self.a_filter.values = [1, 2, 3, 4]
+        self.b_filter = Mock()
+
+        self.a_index = {"1": ["Trixie_CDS_1", "D29_CDS_1"],
+                        "2": ["Trixie_CDS_2", "D29_CDS_2", "L5_CDS_2",
+                              "Myrna_CDS_2"],
+                        "3": ["Trixie_CDS_3"],
+                        "4": ["Alice_CDS_4"]}
+        self.b_index = {"trixie_cds_1": [1], "d29_cds_1": [1],
+                        "trixie_cds_2": [5], "d29_cds_2": [5],
+                        "l5_cds_2": [5], "myrna_cds_2": [6],
+                        "trixie_cds_3": [7]}
+
+    def test_find_phams_1(self):
+        """Verify find_phams() maps changed phams and skips unchanged phams.
+        """
+        mapped_phams = pham_finder.find_phams(self.a_filter, self.b_filter,
+                                              a_index=self.a_index,
+                                              b_index=self.b_index)
+
+        self.assertEqual(mapped_phams, {2: "5;6", 3: "7", 4: "None"})
+
+    def test_find_phams_2(self):
+        """Verify find_phams() reports the percent of genes in each pham.
+        """
+        mapped_phams = pham_finder.find_phams(self.a_filter, self.b_filter,
+                                              show_per=True,
+                                              a_index=self.a_index,
+                                              b_index=self.b_index)
+
+        self.assertEqual(mapped_phams[2], "5(75.0%);6(25.0%)")
+
+    @patch("pdm_utils.pipelines.pham_finder.mysqldb_basic.query_iter")
+    def test_build_pham_genes_1(self, query_iter_mock):
+        """Verify build_pham_genes() groups genes by pham with one query.
+        """
+        query_iter_mock.return_value = iter([("Trixie_CDS_1", 1),
+                                             ("D29_CDS_1", 1),
+                                             ("Trixie_CDS_2", None),
+                                             ("Trixie_CDS_3", 2)])
+
+        pham_genes = pham_finder.build_pham_genes(Mock())
+
+        query_iter_mock.assert_called_once()
+        self.assertEqual(pham_genes, {"1": ["Trixie_CDS_1", "D29_CDS_1"],
+                                      "2": ["Trixie_CDS_3"]})
+
+    @patch("pdm_utils.pipelines.pham_finder.mysqldb_basic.query_iter")
+    def test_build_gene_phams_1(self, query_iter_mock):
+        """Verify build_gene_phams() maps genes to phams with one query.
+        """
+        query_iter_mock.return_value = iter([("SEA_TRIXIE_1", 1),
+                                             ("SEA_TRIXIE_1", 2),
+                                             (None, 3)])
+
+        gene_phams = pham_finder.build_gene_phams(Mock(), key="LocusTag")
+
+        query_iter_mock.assert_called_once()
+        self.assertEqual(gene_phams, {"sea_trixie_1": [1, 2]})
+
+
+if __name__ == "__main__":
+    unittest.main()
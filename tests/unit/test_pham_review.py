@@ -5,6 +5,9 @@ from unittest.mock import Mock
 from unittest.mock import patch
 from unittest.mock import PropertyMock
 
+from sqlalchemy import Column
+from sqlalchemy import LargeBinary
+
 from pdm_utils.pipelines import pham_review
 
 
@@ -31,6 +34,7 @@ class TestMain(unittest.TestCase):
         self.mock_config = Mock()
         self.mock_force = Mock()
         self.mock_production = Mock()
+        self.mock_neighbour_index = Mock()
 
         type(self.args).database = PropertyMock(
                                         return_value=self.mock_database)
@@ -62,6 +66,8 @@ class TestMain(unittest.TestCase):
                                         return_value=False)
         type(self.args).production = PropertyMock(
                                         return_value=self.mock_production)
+        type(self.args).neighbour_index = PropertyMock(
+                                        return_value=self.mock_neighbour_index)
 
     @patch("pdm_utils.pipelines.pham_review.configfile.build_complete_config")
     @patch("pdm_utils.pipelines.pham_review.execute_pham_review")
@@ -96,7 +102,42 @@ class TestMain(unittest.TestCase):
                             psr_reports=self.mock_pham_summary_report,
                             s_report=self.mock_summary_report,
                             verbose=self.mock_verbose,
-                            production=self.mock_production)
+                            production=self.mock_production,
+                            neighbour_index_file=self.mock_neighbour_index)
+
+
+class TestReviewPhams(unittest.TestCase):
+    def setUp(self):
+        self.db_filter = Mock()
+        self.db_filter.values = [40481, 39854, 42415]
+        self.db_filter.get_column.return_value = Column("Notes", LargeBinary)
+
+    @patch("pdm_utils.pipelines.pham_review.querying.first_column")
+    @patch("pdm_utils.pipelines.pham_review.querying.build_select")
+    def test_review_phams_1(self, build_select_mock, first_column_mock):
+        """Verify review_phams() reviews all phams with one grouped query.
+        """
+        first_column_mock.return_value = [42415, 40481]
+
+        pham_review.review_phams(self.db_filter, limit=2)
+
+        build_select_mock.assert_called_once()
+        first_column_mock.assert_called_once_with(
+                                self.db_filter.engine,
+                                build_select_mock.return_value,
+                                in_column=self.db_filter.key,
+                                values=[40481, 39854, 42415], limit=2)
+        self.assertEqual(self.db_filter.values, [40481, 42415])
+
+    @patch("pdm_utils.pipelines.pham_review.querying.first_column")
+    def test_review_phams_2(self, first_column_mock):
+        """Verify review_phams() does not query without phams.
+        """
+        self.db_filter.values = []
+
+        pham_review.review_phams(self.db_filter)
+
+        first_column_mock.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+"""Unit tests for pure-python functions in phameration.py"""
+
+import unittest
+from unittest.mock import Mock, mock_open, patch
+
+from pdm_utils.functions import phameration
+
+
+class TestPreservePhams(unittest.TestCase):
+    def setUp(self):
+        self.old_phams = {10: {"A_1", "A_2"},
+                          11: {"B_1", "B_2"},
+                          12: {"C_1", "C_2", "C_3"},
+                          13: {"D_1"},
+                          14: {"E_1"}}
+        self.old_colors = {10: "#111111", 11: "#222222", 12: "#333333",
+                           13: "#FFFFFF", 14: "#FFFFFF"}
+
+    def test_index_pham_genes_1(self):
+        """Verify every gene is mapped to its pham and phams are ordered."""
+        gene_index, pham_order = phameration.index_pham_genes(
+                                    {5: {"A_1", "A_2"}, 2: {"B_1"}})
+        with self.subTest():
+            self.assertEqual(gene_index, {"A_1": 5, "A_2": 5, "B_1": 2})
+        with self.subTest():
+            self.assertEqual(pham_order, {5: 0, 2: 1})
+
+    def test_preserve_phams_1(self):
+        """Verify identical phams keep their names and colors."""
+        new_phams = {1: {"B_1", "B_2"}, 2: {"A_1", "A_2"}}
+        final_phams, final_colors = phameration.preserve_phams(
+                            {10: self.old_phams[10], 11: self.old_phams[11]},
+                            new_phams, self.old_colors, set())
+        with self.subTest():
+            self.assertEqual(final_phams, {10: {"A_1", "A_2"},
+                                           11: {"B_1", "B_2"}})
+        with self.subTest():
+            self.assertEqual(final_colors, {10: "#111111", 11: "#222222"})
+
+    def test_preserve_phams_2(self):
+        """Verify a pham that grew only by new genes keeps its name."""
+        new_phams = {1: {"A_1", "A_2", "F_1"}}
+        final_phams, final_colors = phameration.preserve_phams(
+                            {10: self.old_phams[10]}, new_phams,
+                            self.old_colors, {"F_1"})
+        with self.subTest():
+            self.assertEqual(final_phams, {10: {"A_1", "A_2", "F_1"}})
+        with self.subTest():
+            self.assertEqual(final_colors, {10: "#111111"})
+
+    def test_preserve_phams_3(self):
+        """Verify joined phams get a new name and a non-white color."""
+        new_phams = {1: {"D_1", "E_1"}}
+        final_phams, final_colors = phameration.preserve_phams(
+                            {13: self.old_phams[13], 14: self.old_phams[14]},
+                            new_phams, self.old_colors, set())
+        with self.subTest():
+            self.assertEqual(final_phams, {1: {"D_1", "E_1"}})
+        with self.subTest():
+            self.assertNotEqual(final_colors[1], "#FFFFFF")
+
+    def test_preserve_phams_4(self):
+        """Verify split phams get names above the highest preserved pham."""
+        new_phams = {1: {"C_1", "C_2"}, 2: {"A_1", "A_2"}, 3: {"C_3"}}
+        final_phams, final_colors = phameration.preserve_phams(
+                            {10: self.old_phams[10], 12: self.old_phams[12]},
+                            new_phams, self.old_colors, set())
+        with self.subTest():
+            self.assertEqual(final_phams, {10: {"A_1", "A_2"},
+                                           11: {"C_1", "C_2"},
+                                           12: {"C_3"}})
+        with self.subTest():
+            self.assertEqual(final_colors[12], "#FFFFFF")
+
+    def test_preserve_phams_5(self):
+        """Verify the first overlapping new pham decides the outcome."""
+        new_phams = {1: {"C_1", "C_2", "C_3"}, 2: {"A_1", "A_2"}}
+        old_phams = {10: self.old_phams[10], 12: self.old_phams[12]}
+        final_phams, final_colors = phameration.preserve_phams(
+                            old_phams, new_phams, self.old_colors, set())
+        self.assertEqual(final_phams, old_phams)
+
+
+class TestIncrementalPhameration(unittest.TestCase):
+    def setUp(self):
+        self.translation_groups = {"MKV": ["A_1", "F_1"],
+                                   "MKL": ["F_2"],
+                                   "MKI": ["F_3", "G_1"],
+                                   "MKA": ["A_2"]}
+        self.gene_index = {"A_1": 10, "A_2": 10, "B_1": 11, "C_1": 12}
+
+    def test_get_new_translations_1(self):
+        """Verify only translations found solely in new genes are kept."""
+        new_translations = phameration.get_new_translations(
+                        self.translation_groups, {"F_1", "F_2", "F_3", "G_1"})
+        self.assertEqual(new_translations, ["MKL", "MKI"])
+
+    def test_assign_new_translations_1(self):
+        """Verify queries hitting one pham are assigned to it."""
+        hits = {"F_2": {"A_1", "A_2"}, "F_3": {"A_2"}}
+        assignments, affected, unassigned = \
+            phameration.assign_new_translations(["F_2", "F_3"], hits,
+                                                self.gene_index)
+        with self.subTest():
+            self.assertEqual(assignments, {10: ["F_2", "F_3"]})
+        with self.subTest():
+            self.assertEqual(affected, set())
+        with self.subTest():
+            self.assertEqual(unassigned, [])
+
+    def test_assign_new_translations_2(self):
+        """Verify queries bridging phams mark them as affected."""
+        hits = {"F_2": {"A_1", "B_1"}}
+        assignments, affected, unassigned = \
+            phameration.assign_new_translations(["F_2"], hits,
+                                                self.gene_index)
+        with self.subTest():
+            self.assertEqual(assignments, {})
+        with self.subTest():
+            self.assertEqual(affected, {10, 11})
+        with self.subTest():
+            self.assertEqual(unassigned, ["F_2"])
+
+    def test_assign_new_translations_3(self):
+        """Verify queries without hits to current phams are unassigned."""
+        hits = {"F_3": {"Deleted_CDS_1"}}
+        assignments, affected, unassigned = \
+            phameration.assign_new_translations(["F_2", "F_3"], hits,
+                                                self.gene_index)
+        with self.subTest():
+            self.assertEqual(assignments, {})
+        with self.subTest():
+            self.assertEqual(affected, set())
+        with self.subTest():
+            self.assertEqual(unassigned, ["F_2", "F_3"])
+
+    def test_get_kept_profile_keys_1(self):
+        """Verify profiles of affected or deleted phams are dropped."""
+        headers = {"0": "A_1", "1": "B_1", "2": "C_1", "3": "Deleted_CDS_1"}
+        keys = phameration.get_kept_profile_keys(headers, self.gene_index,
+                                                 {11})
+        self.assertEqual(keys, ["0", "2"])
+
+
+class TestLoadGeneData(unittest.TestCase):
+    @patch("pdm_utils.functions.phameration.mysqldb_basic.query_iter")
+    def test_load_gene_data_1(self, query_iter_mock):
+        """Verify all four mappings are built from one query."""
+        query_iter_mock.return_value = iter([("A_1", 1, "MKV"),
+                                             ("A_2", 1, "MKL"),
+                                             ("B_1", None, "MKV"),
+                                             ("B_2", 2, "MKI")])
+        engine = Mock()
+        gs_to_ts, ts_to_gs, old_phams, new_genes = \
+            phameration.load_gene_data(engine)
+
+        with self.subTest():
+            query_iter_mock.assert_called_once()
+        with self.subTest():
+            self.assertEqual(gs_to_ts, {"A_1": "MKV", "A_2": "MKL",
+                                        "B_1": "MKV", "B_2": "MKI"})
+        with self.subTest():
+            self.assertEqual(ts_to_gs, {"MKV": ["A_1", "B_1"],
+                                        "MKL": ["A_2"], "MKI": ["B_2"]})
+        with self.subTest():
+            self.assertEqual(old_phams, {1: {"A_1", "A_2"}, 2: {"B_2"}})
+        with self.subTest():
+            self.assertEqual(new_genes, {"B_1"})
+
+
+class TestUpdateTables(unittest.TestCase):
+    @patch("pdm_utils.functions.phameration.mysqldb.execute_transaction")
+    def test_update_pham_table_1(self, execute_transaction_mock):
+        """Verify phams are cleared and then inserted in one bulk statement."""
+        engine = Mock()
+        phameration.update_pham_table({1: "#FFFFFF", 2: "#ABCDEF"}, engine)
+        commands = execute_transaction_mock.call_args[0][1]
+        with self.subTest():
+            self.assertEqual(commands[0], "DELETE FROM pham")
+        with self.subTest():
+            self.assertEqual(len(commands), 2)
+        with self.subTest():
+            self.assertEqual(commands[1][1], [(1, "#FFFFFF"), (2, "#ABCDEF")])
+
+    @patch("pdm_utils.functions.phameration.mysqldb.execute_transaction")
+    def test_update_gene_table_1(self, execute_transaction_mock):
+        """Verify gene assignments are bulk loaded and joined once."""
+        engine = Mock()
+        phameration.update_gene_table({1: {"A_1"}, 2: {"B_1"}}, engine)
+        commands = execute_transaction_mock.call_args[0][1]
+        bulk = [x for x in commands if isinstance(x, tuple)]
+        updates = [x for x in commands if isinstance(x, str) and
+                   x.startswith("UPDATE")]
+        with self.subTest():
+            self.assertEqual(len(bulk), 1)
+        with self.subTest():
+            self.assertEqual(sorted(bulk[0][1]), [("A_1", 1), ("B_1", 2)])
+        with self.subTest():
+            self.assertEqual(len(updates), 1)
+        with self.subTest():
+            self.assertIn("DEFAULT CHARSET=latin1", commands[1])
+
+    @patch("pdm_utils.functions.phameration.mysqldb.execute_transaction")
+    def test_fix_colored_orphams_1(self, execute_transaction_mock):
+        """Verify colored orphams are whitened by one joined UPDATE in a
+        transaction."""
+        def execute_transaction(engine, commands, rowcounts=None):
+            rowcounts.append(2)
+            return 0, ""
+
+        execute_transaction_mock.side_effect = execute_transaction
+        engine = Mock()
+        with patch("builtins.print") as print_mock:
+            phameration.fix_colored_orphams(engine)
+        commands = execute_transaction_mock.call_args[0][1]
+        with self.subTest():
+            engine.execute.assert_not_called()
+        with self.subTest():
+            self.assertEqual(len(commands), 1)
+        with self.subTest():
+            self.assertTrue(commands[0].startswith("UPDATE pham"))
+        with self.subTest():
+            print_mock.assert_called_with("Found 2 non-white orphams...")
+
+
+class TestParseMmseqsClusters(unittest.TestCase):
+    @patch("builtins.open", new_callable=mock_open,
+           read_data="A_1\tA_1\nA_1\tB_1\nC_1\tC_1\nA_1\tD_1\n\n")
+    def test_parse_mmseqs_clusters_1(self, open_mock):
+        """Verify members are grouped under their representative's pham."""
+        phams = phameration.parse_mmseqs_clusters("clusters.tsv")
+        self.assertEqual(phams, {1: ["A_1", "B_1", "D_1"], 2: ["C_1"]})
+
+
+class TestParseSequenceName(unittest.TestCase):
+    def test_parse_sequence_name_1(self):
+        """Verify database tags are removed from sequence names."""
+        with self.subTest():
+            self.assertEqual(phameration.parse_sequence_name("lcl|Trixie_1"),
+                             "Trixie_1")
+        with self.subTest():
+            self.assertEqual(phameration.parse_sequence_name("Trixie_1"),
+                             "Trixie_1")
+
+
+class TestChunkTranslations(unittest.TestCase):
+    def setUp(self):
+        lengths = [900, 850, 400, 300, 120, 110, 100, 90, 80, 60]
+        self.translation_groups = dict()
+        for i, length in enumerate(lengths):
+            self.translation_groups["M" * length + str(i)] = [f"A_{i}"]
+
+    def residues(self, chunk):
+        return sum(len(x[0]) for x in chunk)
+
+    def test_chunk_translations_1(self):
+        """Verify chunks are numbered without gaps and keep every
+        translation once."""
+        chunks = phameration.chunk_translations(self.translation_groups,
+                                                chunksize=3)
+        geneids = sorted(x[1] for chunk in chunks.values() for x in chunk)
+        with self.subTest():
+            self.assertEqual(list(chunks.keys()), [0, 1, 2, 3])
+        with self.subTest():
+            self.assertEqual(geneids, sorted(f"A_{i}" for i in range(10)))
+
+    def test_chunk_translations_2(self):
+        """Verify chunks are balanced by residues and heaviest first."""
+        chunks = phameration.chunk_translations(self.translation_groups,
+                                                chunksize=5)
+        residues = [self.residues(chunk) for chunk in chunks.values()]
+        with self.subTest():
+            self.assertEqual(residues, sorted(residues, reverse=True))
+        with self.subTest():
+            self.assertLess(residues[0] - residues[-1], 100)
+
+    def test_chunk_translations_3(self):
+        """Verify no chunks are made without translations."""
+        self.assertEqual(phameration.chunk_translations({}), {})
+
+    def test_chunk_translations_4(self):
+        """Verify the number of chunks is a multiple of workers, but
+        never more than the number of translations."""
+        chunks_1 = phameration.chunk_translations(self.translation_groups,
+                                                  chunksize=5, workers=3)
+        chunks_2 = phameration.chunk_translations(self.translation_groups,
+                                                  chunksize=5, workers=16)
+        with self.subTest():
+            self.assertEqual(len(chunks_1), 3)
+        with self.subTest():
+            self.assertEqual(len(chunks_2), 10)
+
+    def test_chunk_translations_5(self):
+        """Verify fewer than one worker is treated as one worker."""
+        for workers in (0, -1):
+            with self.subTest(workers=workers):
+                chunks = phameration.chunk_translations(
+                            self.translation_groups, chunksize=5,
+                            workers=workers)
+                self.assertEqual(len(chunks), 2)
+
+    def test_estimate_chunk_cost_1(self):
+        """Verify cost scales with the chunk's residues."""
+        cost = phameration.estimate_chunk_cost((("MKV", "A_1"),
+                                                ("MK", "A_2")))
+        self.assertEqual(cost, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
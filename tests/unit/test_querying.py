@@ -874,6 +874,51 @@ class TestExecute(unittest.TestCase):
             querying.execute(self.mock_engine, self.mock_executable,
                              values=self.values)
 
+    def test_execute_iter_1(self):
+        """Verify execute_iter() streams rows in batches from the server.
+        """
+        engine = MagicMock()
+        connection = engine.connect.return_value.__enter__.return_value
+        proxy = connection.execution_options.return_value.execute.return_value
+        proxy.fetchmany.side_effect = [[self.data_dict, self.data_dict],
+                                       [self.data_dict], []]
+
+        results = querying.execute_iter(engine, self.mock_executable, size=2)
+
+        with self.subTest():
+            engine.connect.assert_not_called()
+        with self.subTest():
+            self.assertEqual(list(results), [self.data_dict] * 3)
+        with self.subTest():
+            connection.execution_options.assert_called_with(
+                                                    stream_results=True)
+        with self.subTest():
+            proxy.fetchmany.assert_called_with(2)
+
+    def test_execute_iter_2(self):
+        """Verify execute_iter() runs one query for each chunk of values.
+        """
+        engine = MagicMock()
+        connection = engine.connect.return_value.__enter__.return_value
+        proxy = connection.execution_options.return_value.execute.return_value
+        proxy.fetchmany.return_value = []
+
+        list(querying.execute_iter(engine, self.mock_executable,
+                                   in_column=self.mock_in_column,
+                                   values=self.values, limit=2))
+
+        with self.subTest():
+            self.assertEqual(self.mock_executable.where.call_count, 2)
+        with self.subTest():
+            self.mock_in_column.in_.assert_called_with(["Myrna"])
+
+    def test_execute_iter_3(self):
+        """Verify execute_iter() raises ValueError with lacking instruction.
+        """
+        with self.assertRaises(ValueError):
+            list(querying.execute_iter(self.mock_engine, self.mock_executable,
+                                       values=self.values))
+
     def test_execute_value_subqueries_1(self):
         """Verify execute_value_subqueries() raises ValueError from bad column.
         """
@@ -0,0 +1,87 @@
+"""Unit tests for the StageReport class."""
+
+import json
+import unittest
+
+from pdm_utils.classes import stagereport
+from pdm_utils.classes.stagereport import StageReport
+
+
+class TestStageReport(unittest.TestCase):
+    def setUp(self):
+        self.report = StageReport(pipeline="mmseqs")
+
+    def test_stage_1(self):
+        """Verify a stage records its sizes, tools and resource use."""
+        with self.report.stage("cluster", {"bytes": 100}):
+            self.report.record_tool("mmseqs cluster", 0)
+            self.report.set_outputs(phams=5)
+        stage = self.report.stages[0]
+        with self.subTest():
+            self.assertEqual(stage["Inputs"], {"bytes": 100})
+        with self.subTest():
+            self.assertEqual(stage["Outputs"], {"phams": 5})
+        with self.subTest():
+            self.assertEqual(stage["Tools"], [{"Tool": "mmseqs cluster",
+                                               "ReturnCode": 0}])
+        with self.subTest():
+            self.assertGreaterEqual(stage["WallTime"], 0)
+        with self.subTest():
+            self.assertGreater(stage["PeakRSS"], 0)
+
+    def test_stage_2(self):
+        """Verify tools are recorded by the innermost open stage."""
+        with self.report.stage("outer"):
+            with self.report.stage("inner"):
+                self.report.record_tool("mmseqs createdb", 0)
+            self.report.record_tool("mmseqs concatdbs", 0)
+        tools = [[x["Tool"] for x in stage["Tools"]]
+                 for stage in self.report.stages]
+        self.assertEqual(tools, [["mmseqs concatdbs"], ["mmseqs createdb"]])
+
+    def test_stage_3(self):
+        """Verify a stage that raises an error is still timed."""
+        with self.assertRaises(ValueError):
+            with self.report.stage("parse"):
+                raise ValueError
+        self.assertIn("WallTime", self.report.stages[0])
+
+    def test_get_failed_tools_1(self):
+        """Verify only tools with a non-zero exit status are returned."""
+        with self.report.stage("search"):
+            self.report.record_tool("mmseqs search", 0)
+            self.report.record_tool("mmseqs convertalis", 1)
+        self.assertEqual(self.report.get_failed_tools(),
+                         [("search", "mmseqs convertalis", 1)])
+
+    def test_to_dict_1(self):
+        """Verify the report can be serialized to JSON."""
+        with self.report.stage("DB load"):
+            self.report.set_outputs(genes=10)
+        report = json.loads(json.dumps(self.report.to_dict()))
+        with self.subTest():
+            self.assertEqual(report["Pipeline"], "mmseqs")
+        with self.subTest():
+            self.assertEqual(report["Stages"][0]["Outputs"], {"genes": 10})
+
+    def test_format_table_1(self):
+        """Verify the table has a header and one line per stage."""
+        with self.report.stage("DB load"):
+            self.report.set_outputs(genes=10, phams=2)
+        with self.report.stage("createdb"):
+            self.report.record_tool("mmseqs createdb", 0)
+        lines = self.report.format_table().split("\n")
+        with self.subTest():
+            self.assertEqual(len(lines), 3)
+        with self.subTest():
+            self.assertIn("10 genes, 2 phams", lines[1])
+        with self.subTest():
+            self.assertIn("mmseqs createdb=0", lines[2])
+
+    def test_format_sizes_1(self):
+        """Verify missing sizes are left blank."""
+        self.assertEqual(stagereport.format_sizes(None), "")
+
+
+if __name__ == "__main__":
+    unittest.main()